@@ -1,19 +1,64 @@
 from collections import namedtuple
-from ctypes import c_void_p
+from ctypes import c_void_p, memmove
 import logging
 
-from OpenGL.GL import (GL_ARRAY_BUFFER, GL_FLOAT, GL_STATIC_DRAW,
-                       glBindBuffer, glBufferData, glDeleteBuffers,
-                       glGenBuffers, glVertexAttribPointer)
+import numpy
+from OpenGL.GL import (GL_ARRAY_BUFFER, GL_ELEMENT_ARRAY_BUFFER, GL_FLOAT,
+                       GL_MAP_INVALIDATE_RANGE_BIT,
+                       GL_MAP_UNSYNCHRONIZED_BIT, GL_MAP_WRITE_BIT,
+                       GL_STATIC_DRAW, GL_STREAM_DRAW, GL_UNIFORM_BUFFER,
+                       GL_UNSIGNED_INT, GL_UNSIGNED_SHORT, glBindBuffer,
+                       glBindBufferBase, glBufferData,
+                       glBufferSubData, glDeleteBuffers,
+                       glEnableVertexAttribArray, glGenBuffers,
+                       glMapBufferRange, glUnmapBuffer,
+                       glVertexAttribDivisor, glVertexAttribPointer)
+
+from bel.versions import VersionCounter
+from bel.vertex_array_object import VertexArrayObject
+
+# Number of uploads a streaming buffer holds before it wraps around
+# and orphans its storage
+STREAM_RING_SIZE = 4
+
+# Alignment in bytes of each upload within a streaming buffer
+STREAM_ALIGNMENT = 256
+
+# Partial updates upload each run of consecutive changed rows
+# separately. Past this many runs a single span covering all of them
+# is uploaded instead.
+MAX_UPLOAD_RANGES = 8
+
+# Size in bytes of the attribute component types
+_GLTYPE_SIZES = {
+    GL_FLOAT: 4,
+}
+
+# Source of BufferObject.generation values, unique across all buffers
+_GENERATIONS = VersionCounter()
+
+
+def latest_generation():
+    """|BufferObject.generation| of the most recently changed buffer."""
+    return _GENERATIONS.latest
+
 
 class BufferObject:
     _BoundBufferObjects = {
-        GL_ARRAY_BUFFER: 0
+        GL_ARRAY_BUFFER: 0,
+        GL_ELEMENT_ARRAY_BUFFER: 0,
+        GL_UNIFORM_BUFFER: 0
     }
 
     def __init__(self, kind):
         self._kind = kind
         self._hnd = glGenBuffers(1)
+        # Size in bytes of the allocated storage
+        self._capacity = 0
+        # Changes whenever attribute pointers into this buffer must be
+        # set up again; vertex array objects record it to know when
+        # their recorded bindings are stale
+        self.generation = next(_GENERATIONS)
 
         logging.info('glGenBuffers(1) -> %d', self._hnd)
         if self._hnd == 0:
@@ -29,21 +74,49 @@ class BufferObject:
             self._BoundBufferObjects[self._kind] = self._hnd
 
     def set_data(self, data, usage=None):
+        """Replace the buffer contents with the numpy array |data|.
+
+        The storage is only reallocated if |data| doesn't fit in it.
+        """
         if usage is None:
             usage = GL_STATIC_DRAW
 
         self.bind()
-        glBufferData(self._kind, data, usage)
+        if data.nbytes <= self._capacity:
+            glBufferSubData(self._kind, 0, data.nbytes, data)
+        else:
+            glBufferData(self._kind, data, usage)
+            self._capacity = data.nbytes
+
+    def set_sub_data(self, data, offset_in_bytes):
+        """Overwrite part of the buffer with the numpy array |data|."""
+        if offset_in_bytes + data.nbytes > self._capacity:
+            raise ValueError('range outside buffer', offset_in_bytes,
+                             data.nbytes, self._capacity)
+        self.bind()
+        glBufferSubData(self._kind, offset_in_bytes, data.nbytes, data)
 
     def bind_to_attribute(self, attr_index, buffer_view):
         self.bind()
 
-        glVertexAttribPointer(attr_index,
-                              buffer_view.components,
-                              buffer_view.gltype,
-                              buffer_view.normalized,
-                              buffer_view.stride_in_bytes,
-                              c_void_p(buffer_view.offset_in_bytes))
+        bytes_per_column = buffer_view.components * _GLTYPE_SIZES[
+            buffer_view.gltype]
+        for column in range(buffer_view.columns):
+            offset = (self._base_offset() + buffer_view.offset_in_bytes +
+                      column * bytes_per_column)
+            glEnableVertexAttribArray(attr_index + column)
+            glVertexAttribPointer(attr_index + column,
+                                  buffer_view.components,
+                                  buffer_view.gltype,
+                                  buffer_view.normalized,
+                                  buffer_view.stride_in_bytes,
+                                  c_void_p(offset))
+            glVertexAttribDivisor(attr_index + column, buffer_view.divisor)
+
+    def _base_offset(self):
+        """Offset in bytes of the current data within the buffer."""
+        # pylint: disable=no-self-use
+        return 0
 
 
 class ArrayBufferObject(BufferObject):
@@ -51,19 +124,186 @@ class ArrayBufferObject(BufferObject):
         super().__init__(GL_ARRAY_BUFFER)
 
 
+class StreamRing:
+    """Sub-allocator for a ring of uploads in one buffer.
+
+    Each upload gets a new aligned region after the previous one, so
+    the GPU can keep reading the regions of earlier frames while the
+    next one is written. When the ring is full it starts again at
+    zero on fresh (orphaned) storage.
+
+    No fences are used. Regions are written through unsynchronized
+    mappings, and orphaning the storage on wrap-around is the only
+    protection: a region must not be reused while a draw may still be
+    reading it, which holds as long as fewer than |ring_size| uploads
+    happen per frame.
+    """
+    def __init__(self, ring_size=STREAM_RING_SIZE,
+                 alignment=STREAM_ALIGNMENT):
+        self.ring_size = ring_size
+        self.alignment = alignment
+        self.capacity = 0
+        self.offset = 0
+        self._cursor = 0
+
+    def _aligned(self, nbytes):
+        return -(-nbytes // self.alignment) * self.alignment
+
+    def allocate(self, nbytes):
+        """Reserve |nbytes| for the next upload.
+
+        Returns (offset, new_storage). If new_storage is true the
+        caller must (re)allocate the buffer with |capacity| bytes
+        before writing at |offset|.
+        """
+        new_storage = False
+        if nbytes > self.capacity:
+            self.capacity = self._aligned(max(nbytes, 1)) * self.ring_size
+            self._cursor = 0
+            new_storage = True
+        elif self._cursor + nbytes > self.capacity:
+            self._cursor = 0
+            new_storage = True
+        self.offset = self._cursor
+        self._cursor = self.offset + self._aligned(max(nbytes, 1))
+        return self.offset, new_storage
+
+
+class StreamingArrayBufferObject(ArrayBufferObject):
+    """Array buffer for data that is replaced every frame.
+
+    Uploads go to successive regions of a ring (see |StreamRing|)
+    through an unsynchronized mapping, so writing never waits for the
+    GPU to finish with the previous frame's data. Attribute bindings
+    point at the region written last.
+
+    A copy of the data is kept so partial updates can be written as a
+    whole new region; the region being read by earlier draws is never
+    modified.
+    """
+    def __init__(self):
+        super().__init__()
+        self._ring = StreamRing()
+        # Bytes of the region written last
+        self._data = numpy.empty(0, numpy.uint8)
+
+    def set_data(self, data, usage=None):
+        data = numpy.ascontiguousarray(data)
+        self._upload(numpy.frombuffer(data.tobytes(), numpy.uint8))
+
+    def set_sub_data(self, data, offset_in_bytes):
+        """Write a new region with part of the data replaced."""
+        data = numpy.ascontiguousarray(data)
+        end = offset_in_bytes + data.nbytes
+        if end > len(self._data):
+            raise ValueError('range outside buffer', offset_in_bytes,
+                             data.nbytes, len(self._data))
+        patched = self._data.copy()
+        patched[offset_in_bytes:end] = numpy.frombuffer(data.tobytes(),
+                                                        numpy.uint8)
+        self._upload(patched)
+
+    def _upload(self, data):
+        """Write the uint8 array |data| to the next region of the ring."""
+        offset, new_storage = self._ring.allocate(data.nbytes)
+        self.bind()
+        if new_storage:
+            # Orphan the old storage; the driver keeps it alive until
+            # pending draws are done with it
+            glBufferData(self._kind, self._ring.capacity, None,
+                         GL_STREAM_DRAW)
+            self._capacity = self._ring.capacity
+        self._data = data
+        # The data moved, so attribute pointers must be updated
+        self.generation = next(_GENERATIONS)
+        if data.nbytes == 0:
+            return
+        ptr = glMapBufferRange(self._kind, offset, data.nbytes,
+                               GL_MAP_WRITE_BIT |
+                               GL_MAP_INVALIDATE_RANGE_BIT |
+                               GL_MAP_UNSYNCHRONIZED_BIT)
+        memmove(ptr, data.ctypes.data, data.nbytes)
+        glUnmapBuffer(self._kind)
+
+    def _base_offset(self):
+        return self._ring.offset
+
+
+class ElementArrayBufferObject(BufferObject):
+    def __init__(self):
+        super().__init__(GL_ELEMENT_ARRAY_BUFFER)
+
+    def bind(self):
+        # The element array binding is part of the bound vertex array
+        # object's state, so the cached binding can't be trusted
+        glBindBuffer(self._kind, self._hnd)
+        self._BoundBufferObjects[self._kind] = self._hnd
+
+    def set_data(self, data, usage=None):
+        # Binding to upload would replace the element array recorded
+        # in whichever vertex array object is bound
+        VertexArrayObject.unbind()
+        super().set_data(data, usage)
+
+
+class UniformBufferObject(BufferObject):
+    def __init__(self):
+        super().__init__(GL_UNIFORM_BUFFER)
+
+    def bind_base(self, binding):
+        """Attach the buffer to uniform block binding point |binding|."""
+        glBindBufferBase(self._kind, binding, self._hnd)
+        # Also binds to the generic uniform buffer target
+        self._BoundBufferObjects[self._kind] = self._hnd
+
+
+def index_array(indices, num_verts):
+    """Convert |indices| to the smallest suitable index type.
+
+    16-bit indices are used if every vertex index fits, otherwise
+    32-bit. Returns (array, gltype).
+    """
+    if num_verts <= 1 << 16:
+        return (numpy.ascontiguousarray(indices, numpy.uint16),
+                GL_UNSIGNED_SHORT)
+    return numpy.ascontiguousarray(indices, numpy.uint32), GL_UNSIGNED_INT
+
+
+def upload_ranges(rows):
+    """Get (start, stop) ranges covering the sorted unique |rows|."""
+    if len(rows) == 0:
+        return []
+    breaks = numpy.flatnonzero(numpy.diff(rows) > 1) + 1
+    if len(breaks) >= MAX_UPLOAD_RANGES:
+        return [(int(rows[0]), int(rows[-1]) + 1)]
+    starts = rows[numpy.concatenate(([0], breaks))]
+    stops = rows[numpy.concatenate((breaks - 1, [len(rows) - 1]))] + 1
+    return list(zip(starts.tolist(), stops.tolist()))
+
+
+# divisor: 0 for per-vertex data, N to advance once every N instances
+#
+# columns: number of consecutive attribute locations, each reading
+#          |components| values, e.g. 4 for a mat4 attribute
 ArrayBufferView = namedtuple('ArrayBufferView',
                              ('components',
                               'gltype',
                               'normalized',
                               'stride_in_bytes',
-                              'offset_in_bytes'))
+                              'offset_in_bytes',
+                              'divisor',
+                              'columns'))
 
 def float_array_buffer_view(components,
                             stride_in_bytes=0,
-                            offset_in_bytes=0):
+                            offset_in_bytes=0,
+                            divisor=0,
+                            columns=1):
     return ArrayBufferView(
         components=components,
         gltype=GL_FLOAT,
         normalized=False,
         stride_in_bytes=stride_in_bytes,
-        offset_in_bytes=offset_in_bytes)
+        offset_in_bytes=offset_in_bytes,
+        divisor=divisor,
+        columns=columns)
@@ -0,0 +1,18 @@
+"""Location of bel's on-disk caches."""
+
+import os
+
+
+def cache_subdir(name):
+    """Directory of the cache called |name|, e.g. 'meshes'.
+
+    Caches live under $BEL_CACHE_DIR if set, otherwise under
+    $XDG_CACHE_HOME/bel (defaulting to ~/.cache/bel), each in its own
+    subdirectory.
+    """
+    root = os.environ.get('BEL_CACHE_DIR')
+    if not root:
+        cache_home = (os.environ.get('XDG_CACHE_HOME') or
+                      os.path.join(os.path.expanduser('~'), '.cache'))
+        root = os.path.join(cache_home, 'bel')
+    return os.path.join(root, name)
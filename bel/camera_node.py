@@ -1,14 +1,14 @@
 # TODO
-import numpy
-from pyrr.matrix44 import create_perspective_projection_matrix
-
 from bel.scene_node import SceneNode
-from cgmath.matrix import mat4_look_at
+from cgmath.matrix import mat4_look_at, mat4_perspective
 from cgmath.vector import vec3
 
 class CameraNode(SceneNode):
     def __init__(self):
         super().__init__()
+        # Nothing to hit, and moving the camera shouldn't update the
+        # pick index
+        self.pickable = False
         self._field_of_view_y = 90
         self._near = 0.001
         self._far = 100.0
@@ -26,13 +26,10 @@ class CameraNode(SceneNode):
             return
 
         self._aspect_ratio = aspect_ratio
-        # TODO
-        pmat = create_perspective_projection_matrix(
-            self._field_of_view_y,
-            aspect_ratio,
-            self._near,
-            self._far)
-        self._projection_matrix = numpy.array(pmat).reshape((4, 4))
+        self._projection_matrix = mat4_perspective(self._field_of_view_y,
+                                                   aspect_ratio,
+                                                   self._near,
+                                                   self._far)
 
     # TODO(nicholasbishop): this doesn't yet account for any parent
     # node transforms
@@ -42,6 +39,17 @@ class CameraNode(SceneNode):
                             self._target,
                             vec3(0, 1, 0))
 
+    def clip_matrix(self):
+        """Get projection * view acting on column vectors.
+
+        The projection and view matrices are stored transposed (as
+        uploaded to the shaders), this undoes that. Returns None if
+        the projection isn't known yet.
+        """
+        if self._projection_matrix is None:
+            return None
+        return self._projection_matrix.T.dot(self.view_matrix().T)
+
     def draw(self, draw_state):
         draw_state.update_matrix_uniform('projection',
                                          self._projection_matrix)
@@ -131,7 +131,12 @@ def frag_shader(gs_out: GsOut) -> FsOut:
     return FsOut(fs_color=color)
 
 
-def default_material():
+def translate():
+    """Translate the default material to GLSL.
+
+    Use |shader_cache.cached_material| instead, it only imports this
+    module (and shaderdef) when the translation isn't cached.
+    """
     sdef = ShaderDef(vert_shader=vert_shader,
                      geom_shader=geom_shader,
                      frag_shader=frag_shader)
@@ -24,4 +24,19 @@ class DrawCommand:
         self.uniforms = {}
         self.vert_range = (0, 0)
         self.primitive = self.Points
+        # Optional element array buffer uid; if set, vert_range is a
+        # range of indices of type index_type (e.g. GL_UNSIGNED_SHORT)
+        self.index_buffer = None
+        self.index_type = None
+        # Optional number of instances for an instanced draw
+        self.instance_count = None
+        # Set when the object is outside the view, the draw is skipped
+        self.culled = False
         self.vao = VertexArrayObject()
+        # Set when attributes or index_buffer may have changed, the
+        # attribute setup is then recorded into vao again
+        self.attributes_changed = True
+        # Uniforms of the program resolved by
+        # ShaderProgram.resolve_uniforms, None when the program or the
+        # uniform maps may have changed
+        self.uniform_bindings = None
@@ -0,0 +1,47 @@
+"""Ordering of draw commands and per-frame state change counts."""
+
+import attr
+
+
+@attr.s
+class DrawStats:
+    """State changes issued and skipped while drawing one frame."""
+    draws = attr.ib(default=0)
+    program_binds = attr.ib(default=0)
+    program_binds_skipped = attr.ib(default=0)
+    uniform_sets = attr.ib(default=0)
+    uniform_sets_skipped = attr.ib(default=0)
+    # Uniforms with a new version whose value had to be compared to
+    # the one last set
+    uniform_compares = attr.ib(default=0)
+    # Vertex array objects whose attribute setup was (re)recorded
+    vao_records = attr.ib(default=0)
+    # Commands skipped because they were culled
+    culled = attr.ib(default=0)
+
+    @property
+    def state_changes_saved(self):
+        return self.program_binds_skipped + self.uniform_sets_skipped
+
+
+def draw_sort_key(command):
+    """Key grouping commands that share state.
+
+    Commands are ordered by program, then vertex array object, then
+    the buffers they read, so consecutive draws change as little
+    state as possible.
+    """
+    buffers = sorted(set(data['buffer']
+                         for data in command.attributes.values()))
+    return (command.material_name,
+            command.vao.handle,
+            command.index_buffer or '',
+            tuple(buffers))
+
+
+def compile_draw_list(commands):
+    """Get the non-empty |commands| in state-sorted order."""
+    return sorted((command for command in commands
+                   if command.vert_range[1] != 0 and
+                   command.instance_count != 0),
+                  key=draw_sort_key)
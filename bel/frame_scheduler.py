@@ -0,0 +1,128 @@
+"""Decides when a window has to draw a frame."""
+
+import time
+
+import attr
+
+# Weight of the newest sample in the smoothed frame timings
+TIMING_SMOOTHING = 0.1
+
+
+@attr.s
+class FrameTimings:
+    """Timing statistics of drawn frames, in seconds."""
+    frames = attr.ib(default=0)
+    # Wakeups (events or timeouts) that didn't need a frame
+    skipped_wakeups = attr.ib(default=0)
+    # Time spent drawing the last frame
+    last_draw_time = attr.ib(default=0.0)
+    # Smoothed draw time and time between frame starts
+    draw_time = attr.ib(default=0.0)
+    frame_interval = attr.ib(default=0.0)
+
+    @property
+    def fps(self):
+        if self.frame_interval == 0:
+            return 0.0
+        return 1.0 / self.frame_interval
+
+
+def _smoothed(average, sample):
+    if average == 0:
+        return sample
+    return average + (sample - average) * TIMING_SMOOTHING
+
+
+class FrameScheduler:
+    """Redraw only when needed, at most at |target_fps|.
+
+    A frame is due when a version source (see |add_version_source|)
+    changed since the last frame, after |request_redraw| for changes
+    no source tracks, or every frame while |continuous| is set (for
+    animation). |wait_timeout| tells the event loop how long it may
+    block waiting for events.
+    """
+    def __init__(self, target_fps=60.0, clock=time.perf_counter):
+        """Create a scheduler.
+
+        target_fps: maximum frame rate, None for no limit
+
+        clock: callable returning the current time in seconds
+        """
+        self.target_fps = target_fps
+        self.continuous = False
+        self.timings = FrameTimings()
+        self._clock = clock
+        self._redraw = True
+        self._frame_start = None
+        self._version_sources = []
+        # Values of the sources when the last frame ended
+        self._seen_versions = None
+
+    def add_version_source(self, source):
+        """Redraw whenever |source| returns a new value.
+
+        source: callable returning a version, e.g. a counter that is
+                incremented on every change. It is called on each
+                event loop wakeup, so it must be cheap.
+        """
+        self._version_sources.append(source)
+        self._seen_versions = None
+
+    def _versions(self):
+        return tuple(source() for source in self._version_sources)
+
+    def request_redraw(self):
+        """Draw a frame at the next opportunity.
+
+        Any number of requests before that frame result in a single
+        frame.
+        """
+        self._redraw = True
+
+    def needs_draw(self):
+        if self._redraw or self.continuous:
+            return True
+        return self._versions() != self._seen_versions
+
+    def wait_timeout(self):
+        """Seconds the event loop may wait for events.
+
+        None means wait until an event arrives, 0 means don't wait.
+        """
+        if not self.needs_draw():
+            return None
+        return self._time_to_next_frame()
+
+    def _time_to_next_frame(self):
+        if not self.target_fps or self._frame_start is None:
+            return 0.0
+        next_frame = self._frame_start + 1.0 / self.target_fps
+        return max(next_frame - self._clock(), 0.0)
+
+    def frame_due(self):
+        """Check whether to draw now, counting wakeups that don't."""
+        if self.needs_draw() and self._time_to_next_frame() == 0:
+            return True
+        self.timings.skipped_wakeups += 1
+        return False
+
+    def begin_frame(self):
+        now = self._clock()
+        timings = self.timings
+        if self._frame_start is not None:
+            timings.frame_interval = _smoothed(timings.frame_interval,
+                                               now - self._frame_start)
+        self._frame_start = now
+        # Requests made while drawing are for the next frame
+        self._redraw = False
+
+    def end_frame(self):
+        timings = self.timings
+        timings.frames += 1
+        timings.last_draw_time = self._clock() - self._frame_start
+        timings.draw_time = _smoothed(timings.draw_time,
+                                      timings.last_draw_time)
+        # Changes made while drawing (e.g. uploads) are part of this
+        # frame
+        self._seen_versions = self._versions()
@@ -1,24 +1,41 @@
 from collections import OrderedDict
+from ctypes import c_void_p
 from logging import getLogger
 
 import attr
+import numpy
 from OpenGL.GL import (GL_COLOR_BUFFER_BIT,
                        GL_DEPTH_BUFFER_BIT,
                        GL_DEPTH_TEST,
+                       GL_STATIC_DRAW,
+                       GL_STREAM_DRAW,
+                       GL_UNSIGNED_INT,
+                       GL_UNSIGNED_SHORT,
                        glClear,
                        glClearColor,
                        glDrawArrays,
+                       glDrawArraysInstanced,
+                       glDrawElements,
+                       glDrawElementsInstanced,
                        glEnable,
                        glViewport)
 
-from bel.buffer_object import ArrayBufferObject
+from bel.buffer_object import (ArrayBufferObject, ElementArrayBufferObject,
+                               StreamingArrayBufferObject,
+                               UniformBufferObject)
 from bel.color import Color
 from bel.draw_command import DrawCommand
-from bel.uniform import MatrixUniform, VectorUniform
+from bel.draw_list import DrawStats, compile_draw_list
+from bel.uniform import VIEW_BLOCK, MatrixUniform, VectorUniform
 
 
 LOG = getLogger(__name__)
 
+_INDEX_SIZES = {
+    GL_UNSIGNED_SHORT: 2,
+    GL_UNSIGNED_INT: 4,
+}
+
 @attr.s
 class DrawState:
     # pylint: disable=unsubscriptable-object,unsupported-membership-test
@@ -28,60 +45,166 @@ class DrawState:
     _draw_commands = attr.ib(default=OrderedDict())
     _materials = attr.ib(default=OrderedDict())
     _uniforms = attr.ib(default=OrderedDict())
+    # State changes of the last drawn frame
+    stats = attr.ib(default=attr.Factory(DrawStats))
+    # Sorted draw commands, None when commands may have changed
+    _draw_list = attr.ib(default=None)
+    # Uniform buffer holding VIEW_BLOCK and the data last written to it
+    _view_buffer = attr.ib(default=None)
+    _view_data = attr.ib(default=None)
+
+    def update_buffer(self, uid, array, usage=GL_STATIC_DRAW):
+        """Replace the contents of vertex buffer |uid|.
+
+        usage: GL usage hint, the buffer is created as a streaming
+               buffer if this is GL_STREAM_DRAW
+        """
+        buffer_object = self._buffer_objects.get(uid)
+        if buffer_object is None:
+            if usage == GL_STREAM_DRAW:
+                buffer_object = StreamingArrayBufferObject()
+            else:
+                buffer_object = ArrayBufferObject()
+            self._buffer_objects[uid] = buffer_object
+        buffer_object.set_data(array, usage)
+
+    def update_buffer_range(self, uid, array, offset_in_bytes):
+        """Overwrite part of the existing buffer |uid|."""
+        self._buffer_objects[uid].set_sub_data(array, offset_in_bytes)
 
-    def update_buffer(self, uid, array):
+    def update_index_buffer(self, uid, array):
         buffer_object = self._buffer_objects.get(uid)
         if buffer_object is None:
-            buffer_object = ArrayBufferObject()
+            buffer_object = ElementArrayBufferObject()
             self._buffer_objects[uid] = buffer_object
         buffer_object.set_data(array)
 
     def get_or_create_draw_command(self, handle):
+        """Get the draw command for |handle| in order to modify it."""
+        self._draw_list = None
         draw_command = self._draw_commands.get(handle.uid)
         if draw_command is None:
             draw_command = DrawCommand()
             self._draw_commands[handle.uid] = draw_command
+        draw_command.attributes_changed = True
+        draw_command.uniform_bindings = None
         return draw_command
 
-    # TODO(nicholasbishop): actually update instead of add
+    def set_draw_culled(self, handle, culled):
+        """Skip (or stop skipping) the draw command of |handle|."""
+        draw_command = self._draw_commands.get(handle.uid)
+        if draw_command is not None:
+            draw_command.culled = culled
+
     def update_shader_program(self, uid, shader_program):
-        if uid in self._materials:
-            raise NotImplementedError()
+        """Add material |uid| or replace its program.
+
+        A replaced program is deleted.
+        """
+        old_program = self._materials.get(uid)
         self._materials[uid] = shader_program
+        if old_program is None or old_program is shader_program:
+            return
+        old_program.delete()
+        # Attribute locations may differ and the new program may reuse
+        # the old handle, so the recorded VAO setup can't be trusted
+        for draw_command in self._draw_commands.values():
+            if draw_command.material_name == uid:
+                draw_command.attributes_changed = True
+                draw_command.uniform_bindings = None
 
-    # TODO(nicholasbishop): actually update instead of add
     def update_matrix_uniform(self, uid, matrix):
-        self._uniforms[uid] = MatrixUniform(matrix)
+        self._update_uniform(uid, MatrixUniform, matrix)
 
-    # TODO(nicholasbishop): actually update instead of add
     def update_vector_uniform(self, uid, vec):
-        self._uniforms[uid] = VectorUniform(vec)
+        self._update_uniform(uid, VectorUniform, vec)
+
+    def _update_uniform(self, uid, uniform_class, value):
+        # The uniform object is kept so that an unchanged value keeps
+        # its version and programs skip it cheaply
+        uniform = self._uniforms.get(uid)
+        if uniform is None:
+            self._uniforms[uid] = uniform_class(value)
+            # Rare (once per name), but programs may use the new name
+            for draw_command in self._draw_commands.values():
+                draw_command.uniform_bindings = None
+        else:
+            uniform.set(value)
+
+    def _update_view_block(self):
+        """Write the per-frame uniforms to the View uniform buffer."""
+        values = {name: uniform.value
+                  for name, uniform in self._uniforms.items()}
+        data = VIEW_BLOCK.pack(values)
+        if self._view_buffer is None:
+            self._view_buffer = UniformBufferObject()
+        elif numpy.array_equal(data, self._view_data):
+            return
+        self._view_buffer.set_data(data)
+        self._view_buffer.bind_base(VIEW_BLOCK.binding)
+        self._view_data = data
+
+    def _record_vao(self, item, material):
+        """Record the attribute setup of |item| into its bound VAO.
+
+        Nothing is done if the recorded setup is still valid: same
+        program, same buffer generations and no attribute changes.
+        """
+        buffers = self._buffer_objects
+        key = (material.handle,
+               tuple(buffers[data['buffer']].generation
+                     for data in item.attributes.values()))
+        if not item.attributes_changed and item.vao.recorded_key == key:
+            return
+        material.bind_attributes(buffers, item.attributes)
+        if item.index_buffer is not None:
+            buffers[item.index_buffer].bind()
+        item.vao.recorded_key = key
+        item.attributes_changed = False
+        self.stats.vao_records += 1
 
     def _draw_one(self, item):
         first, count = item.vert_range
 
-        # Skip empty draws
-        if count == 0:
-            return
-
-        item.vao.bind()
-
         material_uid = item.material_name
         if material_uid not in self._materials:
             LOG.error('unknown material: %r', material_uid)
             return
 
-        material = self._materials[material_uid]
-        with material.bind():
-            material.bind_attributes(self._buffer_objects, item.attributes)
-            uniforms = dict(item.uniforms)
-            # TODO
-            uniforms.update(self._uniforms)
-            # TODO
-            material.bind_uniforms(uniforms)
+        item.vao.bind()
 
-        with material.bind():
-            glDrawArrays(item.primitive, first, count)
+        stats = self.stats
+        material = self._materials[material_uid]
+        if material.use():
+            stats.program_binds += 1
+        else:
+            stats.program_binds_skipped += 1
+        self._record_vao(item, material)
+        if item.uniform_bindings is None:
+            item.uniform_bindings = material.resolve_uniforms(
+                self._uniforms, item.uniforms)
+        num_set, num_skipped, num_compared = material.bind_uniforms(
+            item.uniform_bindings)
+        stats.uniform_sets += num_set
+        stats.uniform_sets_skipped += num_skipped
+        stats.uniform_compares += num_compared
+
+        stats.draws += 1
+        instances = item.instance_count
+        if item.index_buffer is None:
+            if instances is None:
+                glDrawArrays(item.primitive, first, count)
+            else:
+                glDrawArraysInstanced(item.primitive, first, count,
+                                      instances)
+        else:
+            offset = c_void_p(first * _INDEX_SIZES[item.index_type])
+            if instances is None:
+                glDrawElements(item.primitive, count, item.index_type,
+                               offset)
+            else:
+                glDrawElementsInstanced(item.primitive, count,
+                                        item.index_type, offset, instances)
 
     def aspect_ratio(self):
         height = self.fb_size[1]
@@ -94,10 +217,21 @@ class DrawState:
         glViewport(0, 0, *self.fb_size)
 
         self.update_vector_uniform('fb_size', self.fb_size)
+        self._update_view_block()
 
         glClearColor(*self.clear_color.as_tuple())
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
         glEnable(GL_DEPTH_TEST)
 
-        for comm in self._draw_commands.values():
-            self._draw_one(comm)
+        if self._draw_list is None:
+            self._draw_list = compile_draw_list(
+                self._draw_commands.values())
+
+        self.stats = DrawStats()
+        for comm in self._draw_list:
+            if comm.culled:
+                self.stats.culled += 1
+            else:
+                self._draw_one(comm)
+        LOG.debug('%d draws, %d state changes saved', self.stats.draws,
+                  self.stats.state_changes_saved)
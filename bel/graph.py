@@ -0,0 +1,113 @@
+"""Graph algorithms on CSR adjacency arrays."""
+
+from heapq import heappop, heappush
+from math import inf
+
+import numpy
+
+
+def adjacency_lists(offsets, neighbors, weights):
+    """Convert CSR adjacency arrays to Python lists.
+
+    The searches visit nodes one at a time, plain Python lists are
+    much faster than numpy scalars for that. Callers that search the
+    same graph repeatedly should convert it once and use
+    |dijkstra_settled|.
+    """
+    return (numpy.asarray(offsets).tolist(),
+            numpy.asarray(neighbors).tolist(),
+            numpy.asarray(weights, numpy.float64).tolist())
+
+
+def dijkstra(offsets, neighbors, weights, sources, max_dist=inf,
+             targets=None):
+    """Single or multi-source shortest paths.
+
+    offsets, neighbors, weights: CSR adjacency, the nodes adjacent to
+                                 node n are neighbors[offsets[n]:
+                                 offsets[n + 1]] and weights holds the
+                                 (non-negative) length of each of those
+                                 arcs. Either arrays or the lists of
+                                 |adjacency_lists|
+
+    sources: node index or sequence of node indices at distance zero
+
+    max_dist: stop once the nearest unsettled node is farther than
+              this
+
+    targets: optional sequence of node indices, stop once all of them
+             are settled
+
+    Returns (dist, prev) arrays. dist is the shortest distance to
+    each node from the nearest source and prev is the previous node
+    on that path (-1 for sources). Nodes that were not reached, or
+    not settled before stopping early, have dist inf and prev -1.
+    """
+    # pylint: disable=too-many-arguments
+    num_nodes = len(offsets) - 1
+    if not (isinstance(offsets, list) and isinstance(neighbors, list) and
+            isinstance(weights, list)):
+        offsets, neighbors, weights = adjacency_lists(offsets, neighbors,
+                                                      weights)
+    dist, prev = dijkstra_settled(offsets, neighbors, weights, sources,
+                                  max_dist, targets)
+
+    dist_array = numpy.full(num_nodes, inf)
+    prev_array = numpy.full(num_nodes, -1, numpy.int64)
+    if dist:
+        nodes = list(dist)
+        dist_array[nodes] = [dist[node] for node in nodes]
+        prev_array[nodes] = [prev[node] for node in nodes]
+    return dist_array, prev_array
+
+
+def dijkstra_settled(offsets, neighbors, weights, sources, max_dist=inf,
+                     targets=None):
+    """Like |dijkstra|, but only touching the nodes it searches.
+
+    offsets, neighbors, weights: lists, see |adjacency_lists|
+
+    Returns (dist, prev) dicts with an entry for each settled node, in
+    no particular order. The cost depends on the part of the graph
+    searched rather than its size, so searches bounded by |max_dist|
+    or |targets| are cheap on large graphs.
+    """
+    # pylint: disable=too-many-arguments,too-many-locals
+    # Tentative distance and previous node of reached nodes
+    reached_dist = {}
+    reached_prev = {}
+    dist = {}
+    prev = {}
+    remaining = (None if targets is None else
+                 set(numpy.ravel(targets).tolist()))
+
+    heap = []
+    for source in numpy.ravel(sources).tolist():
+        reached_dist[source] = 0.0
+        reached_prev[source] = -1
+        heap.append((0.0, source))
+
+    # Lazy deletion: a node may be pushed once per improvement, stale
+    # entries are skipped when popped
+    while heap:
+        node_dist, node = heappop(heap)
+        if node in dist:
+            continue
+        if node_dist > max_dist:
+            break
+        dist[node] = node_dist
+        prev[node] = reached_prev[node]
+        if remaining is not None:
+            remaining.discard(node)
+            if not remaining:
+                break
+
+        for arc in range(offsets[node], offsets[node + 1]):
+            other = neighbors[arc]
+            other_dist = node_dist + weights[arc]
+            if other_dist < reached_dist.get(other, inf):
+                reached_dist[other] = other_dist
+                reached_prev[other] = node
+                heappush(heap, (other_dist, other))
+
+    return dist, prev
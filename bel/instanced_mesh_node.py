@@ -0,0 +1,265 @@
+from math import inf
+
+import numpy
+
+from bel.buffer_object import float_array_buffer_view, upload_ranges
+from bel.mesh_node import MeshNode, VertBufHandle
+from bel.pick_index import local_ray
+from cgmath.bvh import BVH
+from cgmath.frustum import transform_boxes
+
+# Floats per instance: a 4x4 model matrix followed by an RGBA color
+INSTANCE_ROW_FLOATS = 20
+
+
+class InstanceArray:
+    """Packed per-instance model matrices and colors.
+
+    Each instance is one row of |array|, rows past |count| are unused
+    capacity. Edits are tracked so that only the changed rows need to
+    be uploaded.
+    """
+    def __init__(self):
+        self.array = numpy.zeros((0, INSTANCE_ROW_FLOATS), numpy.float32)
+        self.count = 0
+        # Set when |array| was reallocated, the whole array must then
+        # be uploaded
+        self.reallocated = True
+        # Incremented on every change, unlike the changed rows it is
+        # never reset
+        self.version = 0
+        self._changed_rows = set()
+
+    def _check_index(self, index):
+        if not 0 <= index < self.count:
+            raise IndexError('instance index out of range', index)
+
+    def add(self, matrix, color):
+        """Add an instance and return its index."""
+        if self.count == len(self.array):
+            array = numpy.zeros((max(2 * self.count, 16),
+                                 INSTANCE_ROW_FLOATS), numpy.float32)
+            array[:self.count] = self.array[:self.count]
+            self.array = array
+            self.reallocated = True
+        self.count += 1
+        self.version += 1
+        index = self.count - 1
+        self.set_matrix(index, matrix)
+        self.set_color(index, color)
+        return index
+
+    def remove(self, index):
+        """Remove an instance; the last instance takes its index."""
+        self._check_index(index)
+        last = self.count - 1
+        if index != last:
+            self.array[index] = self.array[last]
+            self._changed_rows.add(index)
+        self._changed_rows.discard(last)
+        self.count -= 1
+        self.version += 1
+
+    def set_matrix(self, index, matrix):
+        """Set the model matrix of an instance.
+
+        The matrix is stored in the memory order a matrix uniform is
+        uploaded in.
+        """
+        self._set(index, slice(0, 16), matrix)
+
+    def set_color(self, index, color):
+        self._set(index, slice(16, 20), color)
+
+    def _set(self, index, columns, value):
+        self._check_index(index)
+        value = numpy.asarray(value, numpy.float32).ravel()
+        row = self.array[index, columns]
+        # Skip writes that don't change anything, so they don't cause
+        # uploads
+        if not numpy.array_equal(row, value):
+            row[:] = value
+            self._changed_rows.add(index)
+            self.version += 1
+
+    def matrices(self):
+        """Get the N x 4 x 4 model matrices acting on column vectors."""
+        rows = self.array[:self.count, :16].astype(numpy.float64)
+        # Stored in upload order, i.e. each row of 4 is a column
+        return rows.reshape(-1, 4, 4).transpose(0, 2, 1)
+
+    def take_changes(self):
+        """Get the changes since the last call and forget them.
+
+        Returns (reallocated, rows) where rows are the sorted indices
+        of the changed instances. If reallocated is true the whole
+        array has to be uploaded.
+        """
+        changes = (self.reallocated,
+                   numpy.array(sorted(self._changed_rows), numpy.int64))
+        self.reallocated = False
+        self._changed_rows.clear()
+        return changes
+
+
+class InstancedMeshNode(MeshNode):
+    """Draws many copies of one mesh with a single instanced draw.
+
+    All instances share the vertex buffer of the mesh. Each instance
+    has its own model matrix (applied after the node's transform) and
+    color, packed into an instance attribute buffer of which only the
+    changed rows are uploaded.
+
+    The bounds cover the mesh under every instance matrix. Picking
+    tests the mesh of the instances whose boxes the ray passes near,
+    each with the ray moved into the instance's space.
+    """
+
+    def __init__(self, mesh=None):
+        super().__init__(mesh)
+        self._instances = InstanceArray()
+        self._instance_buf = VertBufHandle()
+        self._material_uid = 'instanced'
+        # (instances version, mesh bounds, matrices, instance boxes,
+        # bounds) of the last |_instance_boxes| call
+        self._instance_cache = None
+        # BVH over the instance boxes, built when first picked
+        self._instance_bvh = None
+
+    @property
+    def num_instances(self):
+        return self._instances.count
+
+    def add_instance(self, matrix=None, color=(1.0, 1.0, 1.0, 1.0)):
+        """Add a copy of the mesh and return its instance index.
+
+        matrix: model matrix of the instance, default identity
+        """
+        if matrix is None:
+            matrix = numpy.identity(4)
+        index = self._instances.add(matrix, color)
+        self._triangle_draw.needs_update = True
+        self.mark_changed()
+        return index
+
+    def remove_instance(self, index):
+        """Remove an instance, the last instance takes its index."""
+        self._instances.remove(index)
+        self._triangle_draw.needs_update = True
+        self.mark_changed()
+
+    def set_instance_matrix(self, index, matrix):
+        version = self._instances.version
+        self._instances.set_matrix(index, matrix)
+        if self._instances.version != version:
+            self.mark_changed()
+
+    def set_instance_color(self, index, color):
+        version = self._instances.version
+        self._instances.set_color(index, color)
+        if self._instances.version != version:
+            self.mark_changed()
+
+    def _update_instance_buf(self, draw_state):
+        instances = self._instances
+        reallocated, rows = instances.take_changes()
+        uid = self._instance_buf.uid
+        if reallocated:
+            # The whole capacity is uploaded so the buffer grows along
+            # with the array
+            draw_state.update_buffer(uid, instances.array)
+            return
+        row_bytes = instances.array.itemsize * INSTANCE_ROW_FLOATS
+        for start, stop in upload_ranges(rows):
+            draw_state.update_buffer_range(uid, instances.array[start:stop],
+                                           start * row_bytes)
+
+    def _update_draw_cmd(self, draw_state):
+        super()._update_draw_cmd(draw_state)
+        bytes_per_float32 = 4
+        stride = bytes_per_float32 * INSTANCE_ROW_FLOATS
+        dcom = draw_state.get_or_create_draw_command(self._triangle_draw)
+        dcom.attributes.update({
+            'inst_model': {
+                'buffer': self._instance_buf.uid,
+                'buffer_view': float_array_buffer_view(
+                    components=4,
+                    stride_in_bytes=stride,
+                    offset_in_bytes=0,
+                    divisor=1,
+                    columns=4),
+            },
+            'inst_col': {
+                'buffer': self._instance_buf.uid,
+                'buffer_view': float_array_buffer_view(
+                    components=4,
+                    stride_in_bytes=stride,
+                    offset_in_bytes=bytes_per_float32 * 16,
+                    divisor=1),
+            },
+        })
+        dcom.material_name = self._material_uid
+        dcom.instance_count = self._instances.count
+
+    def draw(self, draw_state):
+        self._update_instance_buf(draw_state)
+        super().draw(draw_state)
+
+    def _instance_boxes(self):
+        """Get (matrices, boxes, bounds) of the instances.
+
+        matrices: see |InstanceArray.matrices|
+
+        boxes: (box_min, box_max) N x 3 node-space boxes around each
+               instance, None if there are no instances or the mesh
+               is empty
+
+        bounds: (min, max) box around all of them, or None
+
+        Cached until the instances or the mesh bounds change.
+        """
+        mesh_box = self._mesh.bounds()
+        cache = self._instance_cache
+        if (cache is None or cache[0] != self._instances.version or
+                cache[1] is not mesh_box):
+            matrices = self._instances.matrices()
+            boxes = None
+            bounds = None
+            if mesh_box is not None and len(matrices) != 0:
+                count = len(matrices)
+                boxes = transform_boxes(
+                    matrices, numpy.tile(mesh_box[0], (count, 1)),
+                    numpy.tile(mesh_box[1], (count, 1)))
+                bounds = (boxes[0].min(axis=0), boxes[1].max(axis=0))
+            cache = (self._instances.version, mesh_box, matrices, boxes,
+                     bounds)
+            self._instance_cache = cache
+            self._instance_bvh = None
+        return cache[2:]
+
+    def bounds(self):
+        return self._instance_boxes()[2]
+
+    def ray_intersect(self, ray):
+        """Distance along |ray| to the nearest instance, or inf."""
+        matrices, boxes, _ = self._instance_boxes()
+        if boxes is None:
+            return inf
+        if self._instance_bvh is None:
+            self._instance_bvh = BVH(boxes[0], boxes[1], max_leaf_size=2)
+
+        def intersect_instances(indices, max_t):
+            best = None
+            for index in indices.tolist():
+                dist = self._mesh.ray_intersect(local_ray(matrices[index],
+                                                          ray))
+                if dist < max_t:
+                    max_t = dist
+                    best = (dist, index)
+            return best
+
+        hit = self._instance_bvh.intersect(ray.origin, ray.direction,
+                                           intersect_instances)
+        if hit is None:
+            return inf
+        return hit[0]
@@ -1,31 +1,181 @@
-"""Simple but flexible Mesh data structure."""
+"""Simple but flexible Mesh data structure.
 
-from pqdict import minpq
+Mesh data is stored as a struct of arrays: vertex locations and
+colors, edge endpoints and face corners each live in one contiguous
+numpy array. |Vert|, |Edge| and |Face| objects returned by the mesh
+are lightweight views of a single row of those arrays.
+"""
 
-from cgmath.ray_triangle_intersect import ray_triangle_intersect
-from cgmath.vector import distance, distance_squared, vec3, vec4
+from collections import deque, namedtuple
+from collections.abc import Sequence
+from math import inf
 
-def _obj_remove_comment(line):
-    """Strip "#" comment from a line."""
-    ind = line.find('#')
-    if ind != -1:
-        line = line[:ind].rstrip()
-    return line
+import numpy
+
+from bel import graph, mesh_cache
+from bel.obj import read_obj
+from cgmath.bvh import BVH
+from cgmath.point_tree import PointTree
+from cgmath.ray_triangle_intersect import ray_triangles_intersect
+from cgmath.vector import distance, vec3, vec4
+
+DEFAULT_VERT_COL = (0.9, 0.8, 0.8, 1.0)
+
+# Number of vertex edits remembered for |Mesh.changed_verts_since|.
+# Consumers further behind than this fall back to a full update.
+VERT_CHANGE_LOG_SIZE = 64
+
+# Triangles per leaf of the ray intersection BVH. Leaves are tested
+# with a single batched intersection call, so fairly large leaves
+# are cheaper than a deeper tree.
+RAY_BVH_LEAF_SIZE = 32
+
+# Result of |Mesh.ray_hit|. The hit point is
+# (1 - u - v) * tri[0] + u * tri[1] + v * tri[2] where tri are the
+# locations of the triangle's vert_indices.
+RayHit = namedtuple('RayHit', ('distance', 'face_index', 'vert_indices',
+                               'uv'))
+
+
+def _grow(array, length):
+    """Get |array| with capacity for at least |length| rows.
+
+    Capacity is doubled so that repeated appends are amortized O(1).
+    The first len(array) rows are preserved.
+    """
+    if len(array) >= length:
+        return array
+    capacity = max(length, 2 * len(array), 8)
+    grown = numpy.empty((capacity,) + array.shape[1:], array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+def _edge_keys(vi0, vi1):
+    """Hashable int64 keys for the unordered vertex pairs (vi0, vi1)."""
+    vi0 = numpy.asarray(vi0, numpy.int64)
+    vi1 = numpy.asarray(vi1, numpy.int64)
+    return (numpy.minimum(vi0, vi1) << 32) | numpy.maximum(vi0, vi1)
+
+
+def _csr_from_groups(groups, values, num_groups):
+    """Group |values| by |groups| into a CSR (offsets, values) pair.
+
+    The order of values within a group is preserved.
+    """
+    order = numpy.argsort(groups, kind='stable')
+    offsets = numpy.zeros(num_groups + 1, numpy.int32)
+    numpy.cumsum(numpy.bincount(groups, minlength=num_groups),
+                 out=offsets[1:])
+    return offsets, numpy.asarray(values, numpy.int32)[order]
+
+
+def _csr_rows(offsets, values, rows):
+    """Concatenation of the CSR |values| of each of |rows|."""
+    rows = numpy.asarray(rows, numpy.int64)
+    counts = offsets[rows + 1] - offsets[rows]
+    starts = numpy.repeat(offsets[rows], counts)
+    within = (numpy.arange(counts.sum()) -
+              numpy.repeat(numpy.cumsum(counts) - counts, counts))
+    return values[starts + within]
 
 
 class Vert:
-    """Mesh vertex."""
-    def __init__(self, loc=None):
-        self.loc = vec3() if loc is None else loc
-        self.edge_indices = []
-        self.col = vec4(0.9, 0.8, 0.8, 1.0)
+    """Mesh vertex.
+
+    A |Vert| created directly owns its location and color; those
+    returned by |Mesh| are views of one row of the mesh's arrays.
+    Assigning |loc| or |col| notifies the mesh. In-place modification
+    (e.g. vert.col[0] = 1) writes to the mesh arrays but doesn't, the
+    caller must then call |Mesh.locs_changed| or |Mesh.cols_changed|
+    so cached data and uploads are brought up to date.
+    """
+    __slots__ = ('_mesh', '_index', '_loc', '_col')
+
+    def __init__(self, loc=None, col=None):
+        self._mesh = None
+        self._index = None
+        self._loc = vec3() if loc is None else loc
+        self._col = vec4(*DEFAULT_VERT_COL) if col is None else col
+
+    @classmethod
+    def view(cls, mesh, vert_index):
+        """Create a view of the vertex at |vert_index| in |mesh|."""
+        vert = cls.__new__(cls)
+        vert._mesh = mesh
+        vert._index = vert_index
+        return vert
+
+    @property
+    def loc(self):
+        """Location (vec3)."""
+        if self._mesh is None:
+            return self._loc
+        return self._mesh.locs[self._index]
+
+    @loc.setter
+    def loc(self, val):
+        if self._mesh is None:
+            self._loc = val
+        else:
+            self._mesh.locs[self._index] = val
+            self._mesh.locs_changed(self._index)
+
+    @property
+    def col(self):
+        """Color (vec4)."""
+        if self._mesh is None:
+            return self._col
+        return self._mesh.cols[self._index]
+
+    @col.setter
+    def col(self, val):
+        if self._mesh is None:
+            self._col = val
+        else:
+            self._mesh.cols[self._index] = val
+            self._mesh.cols_changed(self._index)
+
+    @property
+    def edge_indices(self):
+        """Indices of edges adjacent to this vertex."""
+        if self._mesh is None:
+            return []
+        return self._mesh.vert_edge_indices(self._index)
 
 
 class Edge:
     """Mesh edge."""
+    __slots__ = ('_mesh', '_index', '_vert_indices', '_face_indices')
+
     def __init__(self, vi0, vi1, face_indices=None):
-        self.vert_indices = (vi0, vi1)
-        self.face_indices = [] if face_indices is None else face_indices
+        self._mesh = None
+        self._index = None
+        self._vert_indices = (vi0, vi1)
+        self._face_indices = [] if face_indices is None else face_indices
+
+    @classmethod
+    def view(cls, mesh, edge_index):
+        """Create a view of the edge at |edge_index| in |mesh|."""
+        edge = cls.__new__(cls)
+        edge._mesh = mesh
+        edge._index = edge_index
+        return edge
+
+    @property
+    def vert_indices(self):
+        """Pair of vertex indices."""
+        if self._mesh is None:
+            return self._vert_indices
+        vi0, vi1 = self._mesh.edge_vert_indices[self._index]
+        return (int(vi0), int(vi1))
+
+    @property
+    def face_indices(self):
+        """Indices of faces adjacent to this edge."""
+        if self._mesh is None:
+            return self._face_indices
+        return self._mesh.edge_face_indices(self._index)
 
     def contains(self, vi0):
         """Return whether the edge's vertices include |vi0|."""
@@ -36,25 +186,48 @@ class Edge:
 
         |vi0| must be one of the vertex indices in the edge.
         """
-        assert vi0 in self.vert_indices
-        if self.vert_indices[0] == vi0:
-            return self.vert_indices[1]
+        vert_indices = self.vert_indices
+        assert vi0 in vert_indices
+        if vert_indices[0] == vi0:
+            return vert_indices[1]
         else:
-            return self.vert_indices[0]
+            return vert_indices[0]
 
     def __eq__(self, other):
         return (self.vert_indices == other.vert_indices and
-                self.face_indices == other.face_indices)
+                list(self.face_indices) == list(other.face_indices))
 
     def __repr__(self):
-        return 'Edge({}, {})'.format(self.vert_indices[0],
-                                     self.vert_indices[1])
+        vert_indices = self.vert_indices
+        return 'Edge({}, {})'.format(vert_indices[0], vert_indices[1])
 
 
 class Face:
     """Mesh polygon."""
+    __slots__ = ('_mesh', '_index', '_vert_indices')
+
     def __init__(self, vert_indices):
-        self.vert_indices = vert_indices
+        self._mesh = None
+        self._index = None
+        self._vert_indices = vert_indices
+
+    @classmethod
+    def view(cls, mesh, face_index):
+        """Create a view of the face at |face_index| in |mesh|."""
+        face = cls.__new__(cls)
+        face._mesh = mesh
+        face._index = face_index
+        return face
+
+    @property
+    def vert_indices(self):
+        """Sequence of vertex indices, one per corner."""
+        if self._mesh is None:
+            return self._vert_indices
+        offsets = self._mesh.face_offsets
+        start = offsets[self._index]
+        end = offsets[self._index + 1]
+        return self._mesh.face_vert_indices[start:end]
 
     def iter_vert_pairs(self):
         """Iterator of adjacent pairs of vertex indices.
@@ -62,13 +235,14 @@ class Face:
         For example, a triangle with indices (2, 4, 6) will yield:
         (2, 4), (4, 6), (6, 2)
         """
-        num_verts = len(self.vert_indices)
-        for corner_index, vert_index in enumerate(self.vert_indices):
+        vert_indices = self.vert_indices
+        num_verts = len(vert_indices)
+        for corner_index, vert_index in enumerate(vert_indices):
             next_corner_index = corner_index + 1
             if next_corner_index == num_verts:
                 next_corner_index = 0
 
-            next_vert_index = self.vert_indices[next_corner_index]
+            next_vert_index = vert_indices[next_corner_index]
             yield (vert_index, next_vert_index)
 
     def iter_triangle_fan(self):
@@ -80,54 +254,405 @@ class Face:
         For example, a quad with indices (2, 4, 6, 8) will yield:
         (2, 4, 6), (2, 6, 8).
         """
-        for corner in range(1, len(self.vert_indices) - 1):
-            yield (self.vert_indices[0],
-                   self.vert_indices[corner],
-                   self.vert_indices[corner + 1])
+        vert_indices = self.vert_indices
+        for corner in range(1, len(vert_indices) - 1):
+            yield (vert_indices[0],
+                   vert_indices[corner],
+                   vert_indices[corner + 1])
+
+
+class MeshElements(Sequence):
+    """Read-only sequence of |Vert|, |Edge| or |Face| views."""
+    def __init__(self, mesh, count, view):
+        self._mesh = mesh
+        self._count = count
+        self._view = view
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if index < 0 or index >= self._count:
+            raise IndexError(index)
+        return self._view(self._mesh, index)
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+def _pack_faces(faces):
+    """Convert a sequence of |Face| to corner and offset arrays."""
+    sizes = numpy.fromiter((len(face.vert_indices) for face in faces),
+                           numpy.int32, len(faces))
+    face_offsets = numpy.zeros(len(faces) + 1, numpy.int32)
+    numpy.cumsum(sizes, out=face_offsets[1:])
+    face_verts = numpy.empty(face_offsets[-1], numpy.int32)
+    for face, start, end in zip(faces, face_offsets[:-1], face_offsets[1:]):
+        face_verts[start:end] = face.vert_indices
+    return face_verts, face_offsets
 
 
 class Mesh:
-    """Simple but flexible Mesh data structure."""
+    """Simple but flexible Mesh data structure.
+
+    Storage (V verts, E edges, F faces, C face corners):
+      locs: V x 3 float32 vertex locations
+      cols: V x 4 float32 vertex colors
+      edge_vert_indices: E x 2 int32 edge endpoints, lowest first
+      face_vert_indices: C int32 vertex indices of all face corners
+      face_offsets: F + 1 int32, face i's corners are
+          face_vert_indices[face_offsets[i]:face_offsets[i + 1]]
+    """
     def __init__(self, verts=None, faces=None, path=None):
+        verts = () if verts is None else verts
+        faces = () if faces is None else faces
+
+        locs = numpy.empty((len(verts), 3), numpy.float32)
+        cols = numpy.empty((len(verts), 4), numpy.float32)
+        for vert_index, vert in enumerate(verts):
+            locs[vert_index] = vert.loc
+            cols[vert_index] = vert.col
+
+        face_vert_indices, face_offsets = _pack_faces(faces)
+        self._init_arrays(locs, cols, face_vert_indices, face_offsets, path)
+
+    @classmethod
+    def from_arrays(cls, locs, face_vert_indices=None, face_offsets=None,
+                    cols=None, path=None):
+        """Create a |Mesh| directly from arrays.
+
+        See the |Mesh| class docstring for the array layouts. If
+        |cols| is None all vertices get the default color.
+        """
+        mesh = cls.__new__(cls)
+        locs = numpy.asarray(locs, numpy.float32).reshape(-1, 3)
+        if cols is None:
+            cols = numpy.empty((len(locs), 4), numpy.float32)
+            cols[:] = DEFAULT_VERT_COL
+        if face_vert_indices is None:
+            face_vert_indices = numpy.empty(0, numpy.int32)
+            face_offsets = numpy.zeros(1, numpy.int32)
+        mesh._init_arrays(locs,
+                          numpy.asarray(cols, numpy.float32),
+                          numpy.asarray(face_vert_indices, numpy.int32),
+                          numpy.asarray(face_offsets, numpy.int32),
+                          path)
+        return mesh
+
+    @classmethod
+    def from_array_dict(cls, arrays, path=None):
+        """Create a |Mesh| from the output of |to_arrays|.
+
+        The arrays are used as-is (not copied) and the precomputed
+        edge topology is used instead of rebuilding it.
+        """
+        mesh = cls.__new__(cls)
+        mesh._init_arrays(arrays['locs'], arrays['cols'],
+                          arrays['face_vert_indices'],
+                          arrays['face_offsets'], path,
+                          update_edges=False)
+        mesh._num_edges = len(arrays['edge_vert_indices'])
+        mesh._edge_vert_indices = arrays['edge_vert_indices']
+        mesh._corner_edge_indices = arrays['corner_edge_indices']
+        mesh._edge_index_by_key = None
+        mesh._vert_edges = (arrays['vert_edge_offsets'],
+                            arrays['vert_edge_indices'])
+        mesh._edge_faces = (arrays['edge_face_offsets'],
+                            arrays['edge_face_indices'])
+        return mesh
+
+    def _init_arrays(self, locs, cols, face_vert_indices, face_offsets,
+                     path, update_edges=True):
+        # pylint: disable=too-many-arguments
         self._original_path = path
-        self._verts = [] if verts is None else verts
-        self._faces = [] if faces is None else faces
-        self._edges = None
-        self._update_edges()
+        self._num_verts = len(locs)
+        self._locs = locs
+        self._cols = cols
+        self._face_vert_indices = face_vert_indices
+        self._face_offsets = face_offsets
+        self._locs_version = 0
+        self._topology_version = 0
+        self._vert_change_count = 0
+        self._vert_change_log = deque(maxlen=VERT_CHANGE_LOG_SIZE)
+        self._change_listeners = []
+        self._triangles = None
+        self._bvh = None
+        self._vert_tree = None
+        self._edge_lengths = None
+        self._bounds = None
+        self._vert_vert_adjacency = None
+        self._vert_graph = None
+        if update_edges:
+            self._update_edges()
+
+    def to_arrays(self):
+        """Get a dict of all the mesh arrays, including edge topology.
+
+        See |bel.mesh_cache| for the keys.
+        """
+        vert_edge_offsets, vert_edge_indices = self.vert_edge_adjacency
+        edge_face_offsets, edge_face_indices = self.edge_face_adjacency
+        return {
+            'locs': self.locs,
+            'cols': self.cols,
+            'face_vert_indices': self._face_vert_indices,
+            'face_offsets': self._face_offsets,
+            'edge_vert_indices': self.edge_vert_indices,
+            'corner_edge_indices': self._corner_edge_indices,
+            'vert_edge_offsets': vert_edge_offsets,
+            'vert_edge_indices': vert_edge_indices,
+            'edge_face_offsets': edge_face_offsets,
+            'edge_face_indices': edge_face_indices,
+        }
+
+    def save(self, path):
+        """Write the mesh to a binary mesh file."""
+        mesh_cache.write_mesh_file(path, self.to_arrays())
+
+    @classmethod
+    def load(cls, path):
+        """Open a mesh file written by |save|.
+
+        The file is memory-mapped, data is read from disk on demand.
+        Changes to the mesh are not written back to the file.
+        """
+        return cls.from_array_dict(mesh_cache.read_mesh_file(path), path)
+
+    @property
+    def num_verts(self):
+        """Number of vertices."""
+        return self._num_verts
+
+    @property
+    def num_edges(self):
+        """Number of edges."""
+        return self._num_edges
+
+    @property
+    def num_faces(self):
+        """Number of faces."""
+        return len(self._face_offsets) - 1
+
+    @property
+    def locs(self):
+        """V x 3 array of vertex locations."""
+        return self._locs[:self._num_verts]
+
+    @property
+    def cols(self):
+        """V x 4 array of vertex colors."""
+        return self._cols[:self._num_verts]
+
+    @property
+    def edge_vert_indices(self):
+        """E x 2 array of edge vertex indices."""
+        return self._edge_vert_indices[:self._num_edges]
+
+    @property
+    def face_vert_indices(self):
+        """Vertex indices of all face corners."""
+        return self._face_vert_indices
+
+    @property
+    def face_offsets(self):
+        """Start of each face in |face_vert_indices|, plus the total length."""
+        return self._face_offsets
+
+    @property
+    def face_sizes(self):
+        """Number of corners in each face."""
+        return numpy.diff(self._face_offsets)
+
+    @property
+    def locs_version(self):
+        """Counter incremented whenever vertex locations change."""
+        return self._locs_version
+
+    @property
+    def topology_version(self):
+        """Counter incremented whenever verts, edges or faces change."""
+        return self._topology_version
+
+    @property
+    def vert_change_count(self):
+        """Counter incremented by every vertex location/color edit.
+
+        Pass a previously read value to |changed_verts_since| to find
+        out what changed in between.
+        """
+        return self._vert_change_count
+
+    def add_change_listener(self, listener):
+        """Call |listener| with no arguments after every change.
+
+        It is called whenever |vert_change_count| is incremented, i.e.
+        for vertex location, color and topology changes.
+        """
+        self._change_listeners.append(listener)
+
+    def locs_changed(self, vert_indices=None):
+        """Notify the mesh that vertex locations have been modified.
+
+        vert_indices: the modified vertices, or None if unknown
+
+        Assigning |Vert.loc| does this automatically, it is only
+        needed after modifying |locs| in place. Cached data derived
+        from locations (such as the ray intersection hierarchy) is
+        invalidated.
+        """
+        self._locs_version += 1
+        self._log_vert_change(vert_indices)
+
+    def cols_changed(self, vert_indices=None):
+        """Notify the mesh that vertex colors have been modified.
+
+        vert_indices: the modified vertices, or None if unknown
+
+        Assigning |Vert.col| does this automatically, it is only
+        needed after modifying |cols| in place.
+        """
+        self._log_vert_change(vert_indices)
+
+    def _log_vert_change(self, vert_indices):
+        if vert_indices is not None:
+            vert_indices = numpy.atleast_1d(
+                numpy.asarray(vert_indices, numpy.int64))
+        self._vert_change_count += 1
+        self._vert_change_log.append((self._vert_change_count,
+                                      vert_indices))
+        for listener in self._change_listeners:
+            listener()
+
+    def changed_verts_since(self, change_count):
+        """Get the vertices edited since |vert_change_count| was read.
+
+        change_count: an earlier value of |vert_change_count|
+
+        Returns a sorted array of vertex indices, or None if the
+        changes are unknown (an edit didn't say which vertices it
+        touched, the topology changed, or the change is too old to be
+        remembered). None should be treated as "everything changed".
+        """
+        if change_count == self._vert_change_count:
+            return numpy.empty(0, numpy.int64)
+        log = self._vert_change_log
+        if not log or log[0][0] > change_count + 1:
+            return None
+        changed = []
+        for count, vert_indices in reversed(log):
+            if count <= change_count:
+                break
+            if vert_indices is None:
+                return None
+            changed.append(vert_indices)
+        return numpy.unique(numpy.concatenate(changed))
+
+    def _topology_changed(self):
+        self._topology_version += 1
+        self._locs_version += 1
+        self._log_vert_change(None)
 
     @property
     def verts(self):
         """Mesh vertices."""
-        return self._verts
+        return MeshElements(self, self._num_verts, Vert.view)
 
     @property
     def edges(self):
         """Mesh edges."""
-        assert self._edges != None
-        return self._edges
+        return MeshElements(self, self._num_edges, Edge.view)
 
     @property
     def faces(self):
         """Mesh faces."""
-        return self._faces
+        return MeshElements(self, self.num_faces, Face.view)
 
     def vert(self, vert_index):
         """Get the |Vert| at |vertex_index|."""
-        return self._verts[vert_index]
+        return self.verts[vert_index]
 
     def verts_from_indices(self, vert_indices):
         """Vertex iterator for the given vertex indices."""
         for vert_index in vert_indices:
-            yield self._verts[vert_index]
+            yield self.vert(vert_index)
 
     def edge(self, edge_index):
         """Get the |Edge| at |edge_index|."""
-        return self._edges[edge_index]
+        return self.edges[edge_index]
+
+    @property
+    def corner_edge_indices(self):
+        """Index of the edge leaving each face corner.
+
+        Corner i of a face is connected to corner i + 1 (wrapping
+        around) by edge corner_edge_indices[face_offsets[face] + i].
+        """
+        return self._corner_edge_indices
+
+    @property
+    def vert_edge_adjacency(self):
+        """Vertex to edge adjacency as a CSR (offsets, edge_indices) pair.
+
+        The edges adjacent to vertex v are
+        edge_indices[offsets[v]:offsets[v + 1]].
+        """
+        if self._vert_edges is None:
+            self._vert_edges = self._build_vert_edges()
+        return self._vert_edges
+
+    @property
+    def edge_face_adjacency(self):
+        """Edge to face adjacency as a CSR (offsets, face_indices) pair.
+
+        The faces adjacent to edge e are
+        face_indices[offsets[e]:offsets[e + 1]].
+        """
+        if self._edge_faces is None:
+            self._edge_faces = self._build_edge_faces()
+        return self._edge_faces
+
+    def _build_vert_edges(self):
+        edge_indices = numpy.repeat(
+            numpy.arange(self._num_edges, dtype=numpy.int32), 2)
+        return _csr_from_groups(self.edge_vert_indices.ravel(),
+                                edge_indices, self._num_verts)
+
+    def _build_edge_faces(self):
+        corner_faces = numpy.repeat(
+            numpy.arange(self.num_faces, dtype=numpy.int32),
+            self.face_sizes)
+        return _csr_from_groups(self._corner_edge_indices, corner_faces,
+                                self._num_edges)
+
+    def vert_edge_indices(self, vert_index):
+        """Indices of the edges adjacent to the vertex |vert_index|."""
+        offsets, edge_indices = self.vert_edge_adjacency
+        return edge_indices[offsets[vert_index]:offsets[vert_index + 1]]
+
+    def edge_face_indices(self, edge_index):
+        """Indices of the faces adjacent to the edge |edge_index|."""
+        offsets, face_indices = self.edge_face_adjacency
+        return face_indices[offsets[edge_index]:offsets[edge_index + 1]]
 
     def add_vert(self):
         """Append a new vertex, return its index."""
-        vert_index = len(self._verts)
-        self._verts.append(Vert())
+        vert_index = self._num_verts
+        self._locs = _grow(self._locs, vert_index + 1)
+        self._cols = _grow(self._cols, vert_index + 1)
+        self._locs[vert_index] = 0
+        self._cols[vert_index] = DEFAULT_VERT_COL
+        self._vert_edges = None
+        self._num_verts += 1
+        self._topology_changed()
         return vert_index
 
     def add_edge(self, vi0, vi1, face_indices=None):
@@ -135,38 +660,59 @@ class Mesh:
 
         vi0, vi1: vertex indices
 
-        face_indices: adjacent face indices
+        face_indices: adjacent face indices. Edges of faces always
+                      exist already, so this must be empty unless the
+                      edge is found.
 
-        Returns the index of the new edge.
+        Returns the index of the new edge (or of the existing edge if
+        there already is one between |vi0| and |vi1|).
         """
         edge_index = self.edge_index_between(vi0, vi1)
-        if edge_index is None:
-            edge_index = len(self._edges)
-            # TODO(nicholasbishop): verify face_indices here
-            self._edges.append(Edge(vi0, vi1, face_indices))
+        if edge_index is not None:
+            return edge_index
+        if face_indices:
+            raise ValueError('new edge cannot be adjacent to faces',
+                             vi0, vi1, face_indices)
+
+        edge_index = self._num_edges
+        self._edge_vert_indices = _grow(self._edge_vert_indices,
+                                        edge_index + 1)
+        self._edge_vert_indices[edge_index] = sorted((vi0, vi1))
+        self._num_edges += 1
+        if self._edge_index_by_key is not None:
+            self._edge_index_by_key[int(_edge_keys(vi0, vi1))] = edge_index
+        self._vert_edges = None
+        self._edge_faces = None
+        self._topology_changed()
+        return edge_index
 
     def edge_index_between(self, vi0, vi1):
         """Get the edge index between |vi0| and |vi1|.
 
         Returns None if no such edge is found."""
-        for ei0 in self.vert(vi0).edge_indices:
-            edge = self.edge(ei0)
-            if edge.contains(vi1):
-                return ei0
-        return None
+        if self._edge_index_by_key is None:
+            # Built on first use, it costs far more memory than the
+            # edge arrays themselves
+            keys = _edge_keys(self.edge_vert_indices[:, 0],
+                              self.edge_vert_indices[:, 1])
+            self._edge_index_by_key = dict(zip(keys.tolist(),
+                                               range(self._num_edges)))
+        return self._edge_index_by_key.get(int(_edge_keys(vi0, vi1)))
 
     def edge_between(self, vi0, vi1):
         return self.edge(self.edge_index_between(vi0, vi1))
 
     def adj_vert_edge(self, vi0):
         """Edges adjacent to the vertex |vi0|."""
-        for ei0 in self.vert(vi0).edge_indices:
+        for ei0 in self.vert_edge_indices(vi0).tolist():
             yield self.edge(ei0)
 
     def adj_vert_vert(self, vi0):
         """Vertex indices adjacent to the vertex |vi0|."""
-        for edge in self.adj_vert_edge(vi0):
-            yield edge.other_vert_index(vi0)
+        edge_indices = self.vert_edge_indices(vi0)
+        pairs = self._edge_vert_indices[edge_indices]
+        # One of each pair is vi0, so the sum minus vi0 is the other
+        yield from (pairs.sum(axis=1) - vi0).tolist()
 
     def edge_verts(self, edge):
         """Get the pair of |Vert|s in the edge."""
@@ -175,25 +721,38 @@ class Mesh:
 
     def edge_length(self, edge):
         """Get the distance between the edge's vertices."""
-        pair = self.edge_verts(edge)
-        return distance(pair[0].loc, pair[1].loc)
+        vi0, vi1 = edge.vert_indices
+        return distance(self._locs[vi0], self._locs[vi1])
+
+    def _vert_point_tree(self):
+        """Get the (cached) spatial index over vertex locations."""
+        if (self._vert_tree is None or
+                self._vert_tree[0] != self._locs_version):
+            self._vert_tree = (self._locs_version, PointTree(self.locs))
+        return self._vert_tree[1]
 
     def nearest_vert(self, loc):
         """Get the index of the vertex closest to |loc|.
 
         Returns a pair of (vertex_index, distance_squared)
+        """
+        return self._vert_point_tree().nearest(loc)
+
+    def nearest_verts(self, loc, count):
+        """Get the |count| vertices closest to |loc|.
+
+        Returns (vert_indices, distances_squared) arrays sorted by
+        distance.
+        """
+        return self._vert_point_tree().k_nearest(loc, count)
 
-        TODO(nicholasbishop): use a spatial hierarchy to make this
-        faster.
+    def verts_within_radius(self, loc, radius):
+        """Get the vertices within |radius| of |loc|.
+
+        Returns (vert_indices, distances_squared) arrays sorted by
+        distance.
         """
-        best_vert_index = None
-        best_dist_squared = float('inf')
-        for index, vert in enumerate(self._verts):
-            dist_squared = distance_squared(loc, vert.loc)
-            if dist_squared < best_dist_squared:
-                best_vert_index = index
-                best_dist_squared = dist_squared
-        return (best_vert_index, best_dist_squared)
+        return self._vert_point_tree().within_radius(loc, radius)
 
     class DijkstraResult:
         """A list of |DijkstraResult| is returned by |dijkstra|."""
@@ -213,101 +772,267 @@ class Mesh:
 
         dist_func: callable that takes two adjacent vertex indices and
                    returns a number indicating the distance between
-                   them.
+                   them. It is called once per edge, so it must be
+                   symmetric.
 
-        Returns a list of |DijkstraResult|.
+        Returns a list of |DijkstraResult|. Prefer |shortest_paths|,
+        which returns arrays.
+        """
+        weights = [dist_func(int(vi1), int(vi2))
+                   for vi1, vi2 in self.edge_vert_indices]
+        dist, prev = self.shortest_paths(vi0, edge_weights=weights)
+        return [self.DijkstraResult(vdist, None if vprev == -1 else vprev)
+                for vdist, vprev in zip(dist.tolist(), prev.tolist())]
 
-        Adapted from:
-        http://pqdict.readthedocs.io/en/latest/examples.html
+    def edge_lengths(self):
+        """Array of the length of each edge.
 
+        The result is cached until vertex locations or the topology
+        change.
         """
-        result = []
+        version = (self._topology_version, self._locs_version)
+        if self._edge_lengths is None or self._edge_lengths[0] != version:
+            locs = self.locs.astype(numpy.float64)
+            delta = (locs[self.edge_vert_indices[:, 1]] -
+                     locs[self.edge_vert_indices[:, 0]])
+            lengths = numpy.sqrt(numpy.einsum('ij,ij->i', delta, delta))
+            self._edge_lengths = (version, lengths)
+        return self._edge_lengths[1]
+
+    def bounds(self):
+        """Axis-aligned bounding box of the vertices as (min, max).
+
+        Returns None if the mesh has no vertices. The result is
+        cached until vertex locations or the topology change.
+        """
+        version = (self._topology_version, self._locs_version)
+        if self._bounds is None or self._bounds[0] != version:
+            if self._num_verts == 0:
+                box = None
+            else:
+                locs = self.locs.astype(numpy.float64)
+                box = (locs.min(axis=0), locs.max(axis=0))
+            self._bounds = (version, box)
+        return self._bounds[1]
 
-        queue = minpq()
-        for vi1 in range(len(self._verts)):
-            queue[vi1] = float('inf')
-            result.append(self.DijkstraResult())
-        queue[vi0] = 0
+    @property
+    def vert_vert_adjacency(self):
+        """Vertex to vertex adjacency in CSR form.
 
-        for vi2, min_dist in queue.popitems():
-            result[vi2].dist = min_dist
+        Returns (offsets, vert_indices, edge_indices). The vertices
+        adjacent to vertex v are vert_indices[offsets[v]:offsets[v + 1]]
+        and edge_indices holds the edge connecting each pair.
 
-            for vi3 in self.adj_vert_vert(vi2):
-                if vi3 in queue:
-                    new_score = result[vi2].dist + dist_func(vi2, vi3)
-                    if new_score < queue[vi3]:
-                        # pqdict update is O(log n)
-                        queue[vi3] = new_score
-                        result[vi3].prev = vi2
+        The result is cached until the topology changes.
+        """
+        version = self._topology_version
+        if (self._vert_vert_adjacency is None or
+                self._vert_vert_adjacency[0] != version):
+            offsets, edge_indices = self.vert_edge_adjacency
+            owners = numpy.repeat(numpy.arange(self._num_verts),
+                                  numpy.diff(offsets))
+            # One of each pair is the owner, so the sum minus the owner
+            # is the other vertex
+            vert_indices = (
+                self.edge_vert_indices[edge_indices].sum(axis=1) - owners)
+            self._vert_vert_adjacency = (
+                version, (offsets, vert_indices, edge_indices))
+        return self._vert_vert_adjacency[1]
+
+    def _vert_graph_lists(self):
+        """Vertex adjacency weighted by |edge_lengths|, as Python lists.
+
+        See |bel.graph.adjacency_lists|. Cached until vertex locations
+        or the topology change, so repeated searches don't pay for the
+        conversion.
+        """
+        version = (self._topology_version, self._locs_version)
+        if self._vert_graph is None or self._vert_graph[0] != version:
+            offsets, vert_indices, edge_indices = self.vert_vert_adjacency
+            lists = graph.adjacency_lists(
+                offsets, vert_indices, self.edge_lengths()[edge_indices])
+            self._vert_graph = (version, lists)
+        return self._vert_graph[1]
+
+    def shortest_paths(self, sources, edge_weights=None, max_dist=inf,
+                       targets=None):
+        """Shortest paths along edges from the vertices |sources|.
+
+        sources: vertex index or sequence of vertex indices
 
-        return result
+        edge_weights: length of each edge, defaults to |edge_lengths|
+
+        max_dist, targets: stop early, see |bel.graph.dijkstra|
+
+        Returns (dist, prev) arrays: the distance of each vertex from
+        the nearest source and the previous vertex on that path (-1 for
+        sources and unreached vertices, whose distance is inf).
+        """
+        offsets, vert_indices, weights = self._vert_graph_lists()
+        if edge_weights is not None:
+            edge_indices = self.vert_vert_adjacency[2]
+            weights = numpy.asarray(
+                edge_weights, numpy.float64)[edge_indices].tolist()
+        return graph.dijkstra(offsets, vert_indices, weights, sources,
+                              max_dist, targets)
 
     def _update_edges(self):
-        """Recalculate edge adjacency.
+        """Recalculate edge adjacency from the faces.
 
-        TODO(nicholasbishop): this doesn't correctly handle repeated
-        calls because face/vert adjacency lists aren't cleared first.
+        Edges are numbered in order of first appearance in the face
+        corners. Any loose edges (not part of a face) are discarded.
         """
-        self._edges = []
-        for face_index, face in enumerate(self._faces):
-            for vi0, vi1 in face.iter_vert_pairs():
-                assert vi0 != vi1
-                vi0, vi1 = sorted((vi0, vi1))
-
-                edge_indices = self.vert(vi0).edge_indices
-
-                found = False
-                edge = None
-                for ei0 in edge_indices:
-                    edge = self._edges[ei0]
-                    if edge.vert_indices == (vi0, vi1):
-                        found = True
-                        break
-
-                if found:
-                    edge.face_indices.append(face_index)
-                else:
-                    ei1 = len(self._edges)
-                    self.vert(vi0).edge_indices.append(ei1)
-                    self.vert(vi1).edge_indices.append(ei1)
-                    self._edges.append(Edge(vi0, vi1, [face_index]))
+        face_offsets = self._face_offsets
+        corners = self._face_vert_indices
+        num_corners = len(corners)
+
+        # Index of the corner following each corner within its face
+        next_corner = numpy.arange(1, num_corners + 1, dtype=numpy.int32)
+        nonempty = face_offsets[1:] > face_offsets[:-1]
+        next_corner[face_offsets[1:][nonempty] - 1] = (
+            face_offsets[:-1][nonempty])
+        next_corners = corners[next_corner]
+        assert not numpy.any(corners == next_corners)
+
+        keys = _edge_keys(corners, next_corners)
+        unique_keys, first, inverse = numpy.unique(
+            keys, return_index=True, return_inverse=True)
+
+        # numpy.unique sorts by key, renumber by first appearance
+        order = numpy.argsort(first, kind='stable')
+        rank = numpy.empty(len(order), numpy.int32)
+        rank[order] = numpy.arange(len(order), dtype=numpy.int32)
+        edge_keys = unique_keys[order]
+
+        self._num_edges = len(edge_keys)
+        self._edge_vert_indices = numpy.empty((self._num_edges, 2),
+                                              numpy.int32)
+        self._edge_vert_indices[:, 0] = edge_keys >> 32
+        self._edge_vert_indices[:, 1] = edge_keys & 0xffffffff
+        self._corner_edge_indices = rank[inverse.ravel()]
+        self._edge_index_by_key = None
+
+        self._vert_edges = self._build_vert_edges()
+        self._edge_faces = self._build_edge_faces()
+        self._topology_changed()
 
     @classmethod
-    def load_obj(cls, path):
-        """Create a |Mesh| from an obj file."""
-        with open(path) as rfile:
-            verts = []
-            faces = []
-            for line in rfile.readlines():
-                line = _obj_remove_comment(line)
-                parts = line.split()
-                if len(parts) == 0:
-                    continue
-                tok = parts[0]
-                if tok == 'v':
-                    vec = vec3()
-                    if len(parts) > 1:
-                        vec[0] = float(parts[1])
-                    if len(parts) > 2:
-                        vec[1] = float(parts[2])
-                    if len(parts) > 3:
-                        vec[2] = float(parts[3])
-                    verts.append(Vert(vec))
-                elif tok == 'f':
-                    indices = [int(ind) - 1 for ind in parts[1:]]
-                    faces.append(Face(indices))
-
-        return Mesh(verts, faces, path)
+    def load_obj(cls, path, use_cache=True, cache_dir=None):
+        """Create a |Mesh| from an obj file.
+
+        use_cache: if True the parsed mesh is stored in a binary
+                   cache (see |bel.mesh_cache|), and later loads of
+                   the unchanged file memory-map the cached mesh
+                   instead of parsing the file again.
+
+        cache_dir: cache directory, the default is
+                   |bel.mesh_cache.default_cache_dir|.
+        """
+        if use_cache:
+            arrays = mesh_cache.load_cached(path, cache_dir)
+            if arrays is not None:
+                return cls.from_array_dict(arrays, path)
+
+        locs, face_vert_indices, face_offsets = read_obj(path)
+        mesh = cls.from_arrays(locs, face_vert_indices, face_offsets,
+                               path=path)
+        if use_cache:
+            mesh_cache.store_cached(path, mesh.to_arrays(), cache_dir)
+        return mesh
+
+    def triangles(self):
+        """Triangulate the faces as triangle fans.
+
+        Returns (vert_indices, face_indices): T x 3 int32 vertex
+        indices of each triangle and the T int32 indices of the face
+        each triangle came from. The result is cached until the
+        topology changes.
+        """
+        if (self._triangles is None or
+                self._triangles[0] != self._topology_version):
+            face_sizes = self.face_sizes
+            tris_per_face = numpy.maximum(face_sizes - 2, 0)
+            face_indices = numpy.repeat(
+                numpy.arange(self.num_faces, dtype=numpy.int32),
+                tris_per_face)
+            # Position of each triangle within its face's fan
+            fan_index = (numpy.arange(len(face_indices)) -
+                         (numpy.cumsum(tris_per_face) -
+                          tris_per_face)[face_indices])
+            first = self._face_offsets[:-1][face_indices]
+            corners = numpy.stack((first, first + fan_index + 1,
+                                   first + fan_index + 2), axis=1)
+            vert_indices = self._face_vert_indices[corners].reshape(-1, 3)
+            self._triangles = (self._topology_version, vert_indices,
+                               face_indices, None)
+        return self._triangles[1:3]
+
+    @property
+    def vert_triangle_adjacency(self):
+        """Vertex to triangle adjacency as a CSR (offsets, indices) pair.
+
+        Triangle indices refer to the rows of |triangles|. The
+        triangles using vertex v are
+        triangle_indices[offsets[v]:offsets[v + 1]].
+        """
+        vert_indices = self.triangles()[0]
+        if self._triangles[3] is None:
+            tri_indices = numpy.repeat(
+                numpy.arange(len(vert_indices), dtype=numpy.int32), 3)
+            adjacency = _csr_from_groups(vert_indices.ravel(), tri_indices,
+                                         self._num_verts)
+            self._triangles = self._triangles[:3] + (adjacency,)
+        return self._triangles[3]
+
+    def triangles_using_verts(self, vert_indices):
+        """Sorted indices of the triangles using any of |vert_indices|."""
+        return numpy.unique(_csr_rows(*self.vert_triangle_adjacency,
+                                      rows=vert_indices))
+
+    def edges_using_verts(self, vert_indices):
+        """Sorted indices of the edges using any of |vert_indices|."""
+        return numpy.unique(_csr_rows(*self.vert_edge_adjacency,
+                                      rows=vert_indices))
+
+    def _ray_bvh(self):
+        """Get the (cached) BVH over the triangles."""
+        version = (self._topology_version, self._locs_version)
+        if self._bvh is None or self._bvh[0] != version:
+            vert_indices = self.triangles()[0]
+            tri_locs = self.locs[vert_indices].astype(numpy.float64)
+            bvh = BVH(tri_locs.min(axis=1), tri_locs.max(axis=1),
+                      max_leaf_size=RAY_BVH_LEAF_SIZE)
+            self._bvh = (version, bvh, tri_locs)
+        return self._bvh[1:]
+
+    def ray_hit(self, ray):
+        """Find the nearest face hit by |ray|.
+
+        Returns a |RayHit|, or None if nothing is hit.
+        """
+        bvh, tri_locs = self._ray_bvh()
+        tri_vert_indices, tri_face_indices = self.triangles()
+
+        def intersect_triangles(tri_indices, max_t):
+            t, u, v = ray_triangles_intersect(ray, tri_locs[tri_indices])
+            nearest = numpy.argmin(t)
+            if t[nearest] >= max_t:
+                return None
+            return (t[nearest],
+                    (tri_indices[nearest], u[nearest], v[nearest]))
+
+        hit = bvh.intersect(ray.origin, ray.direction, intersect_triangles)
+        if hit is None:
+            return None
+        hit_t, (tri_index, u, v) = hit
+        return RayHit(distance=float(hit_t),
+                      face_index=int(tri_face_indices[tri_index]),
+                      vert_indices=tuple(tri_vert_indices[tri_index].tolist()),
+                      uv=(float(u), float(v)))
 
     def ray_intersect(self, ray):
-        # TODO, spatial data structure
-        nearest_hit = float('inf')
-
-        for face in self._faces:
-            for triangle in face.iter_triangle_fan():
-                verts = self.verts_from_indices(triangle)
-                locs = [vert.loc for vert in verts]
-                hit = ray_triangle_intersect(ray, locs)
-                if hit is not None and hit < nearest_hit:
-                    nearest_hit = hit
-        return nearest_hit
+        """Distance along |ray| to the nearest face, or inf if no hit."""
+        hit = self.ray_hit(ray)
+        if hit is None:
+            return float('inf')
+        return hit.distance
@@ -0,0 +1,167 @@
+"""Binary mesh files and an on-disk cache of parsed OBJ files.
+
+A mesh file is a fixed header followed by the raw mesh arrays, each
+starting at a 64-byte aligned offset:
+
+    magic      8 bytes, b'BELMESH\\0'
+    version    uint32
+    reserved   uint32
+    counts     4 x uint64: verts (V), faces (F), corners (C), edges (E)
+
+    locs                 V x 3 float32
+    cols                 V x 4 float32
+    face_vert_indices    C int32
+    face_offsets         F + 1 int32
+    edge_vert_indices    E x 2 int32
+    corner_edge_indices  C int32
+    vert_edge_offsets    V + 1 int32
+    vert_edge_indices    2E int32
+    edge_face_offsets    E + 1 int32
+    edge_face_indices    C int32
+
+All values are little-endian. Files are opened with numpy.memmap, so
+pages are only read from disk when an array is first touched.
+"""
+
+from hashlib import sha1
+from logging import getLogger
+import os
+import struct
+from tempfile import NamedTemporaryFile
+
+import numpy
+
+from bel.caches import cache_subdir
+
+LOG = getLogger(__name__)
+
+MAGIC = b'BELMESH\0'
+VERSION = 1
+ALIGNMENT = 64
+
+_HEADER = struct.Struct('<8sII4Q')
+
+
+def _array_layout(num_verts, num_faces, num_corners, num_edges):
+    """Get the (name, dtype, shape) of each array in file order."""
+    float32 = numpy.dtype('<f4')
+    int32 = numpy.dtype('<i4')
+    return (
+        ('locs', float32, (num_verts, 3)),
+        ('cols', float32, (num_verts, 4)),
+        ('face_vert_indices', int32, (num_corners,)),
+        ('face_offsets', int32, (num_faces + 1,)),
+        ('edge_vert_indices', int32, (num_edges, 2)),
+        ('corner_edge_indices', int32, (num_corners,)),
+        ('vert_edge_offsets', int32, (num_verts + 1,)),
+        ('vert_edge_indices', int32, (2 * num_edges,)),
+        ('edge_face_offsets', int32, (num_edges + 1,)),
+        ('edge_face_indices', int32, (num_corners,)),
+    )
+
+
+def _aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_mesh_file(path, arrays):
+    """Write a dict of mesh arrays (see module docstring) to |path|.
+
+    The file is written to a temporary name and renamed into place so
+    that readers never see a partial file.
+    """
+    counts = (len(arrays['locs']),
+              len(arrays['face_offsets']) - 1,
+              len(arrays['face_vert_indices']),
+              len(arrays['edge_vert_indices']))
+
+    dir_name = os.path.dirname(os.path.abspath(path))
+    wfile = NamedTemporaryFile(dir=dir_name, delete=False)
+    try:
+        with wfile:
+            wfile.write(_HEADER.pack(MAGIC, VERSION, 0, *counts))
+            for name, dtype, shape in _array_layout(*counts):
+                array = numpy.ascontiguousarray(arrays[name], dtype)
+                if array.shape != shape:
+                    raise ValueError('bad array shape', name, array.shape,
+                                     shape)
+                wfile.write(b'\0' * (_aligned(wfile.tell()) - wfile.tell()))
+                wfile.write(array.tobytes())
+        os.replace(wfile.name, path)
+    finally:
+        if os.path.exists(wfile.name):
+            os.unlink(wfile.name)
+
+
+def read_mesh_file(path):
+    """Memory-map the mesh file at |path|.
+
+    Returns a dict of arrays (see module docstring). The arrays are
+    copy-on-write: modifying them never changes the file.
+
+    Raises ValueError if the file is not a valid mesh file.
+    """
+    data = numpy.memmap(path, numpy.uint8, mode='c')
+    if len(data) < _HEADER.size:
+        raise ValueError('truncated mesh file', path)
+    magic, version, _, *counts = _HEADER.unpack(data[:_HEADER.size])
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('not a version {} mesh file'.format(VERSION), path)
+
+    arrays = {}
+    offset = _HEADER.size
+    for name, dtype, shape in _array_layout(*counts):
+        offset = _aligned(offset)
+        nbytes = dtype.itemsize * int(numpy.prod(shape))
+        if offset + nbytes > len(data):
+            raise ValueError('truncated mesh file', path)
+        arrays[name] = data[offset:offset + nbytes].view(dtype).reshape(
+            shape)
+        offset += nbytes
+    return arrays
+
+
+def default_cache_dir():
+    """Directory used to cache parsed meshes, see |cache_subdir|."""
+    return cache_subdir('meshes')
+
+
+def cache_path(source_path, cache_dir=None):
+    """Path of the cached mesh file for |source_path|.
+
+    The name is derived from the source's absolute path, modification
+    time and size, so editing the source invalidates the entry.
+    """
+    if cache_dir is None:
+        cache_dir = default_cache_dir()
+    stat = os.stat(source_path)
+    key = '{}\0{}\0{}\0{}'.format(os.path.abspath(source_path),
+                                  stat.st_mtime_ns, stat.st_size, VERSION)
+    name = sha1(key.encode('utf-8')).hexdigest() + '.belmesh'
+    return os.path.join(cache_dir, name)
+
+
+def load_cached(source_path, cache_dir=None):
+    """Get the cached arrays for |source_path|, or None on a miss."""
+    path = cache_path(source_path, cache_dir)
+    try:
+        return read_mesh_file(path)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as err:
+        LOG.warning('ignoring bad mesh cache entry %s: %s', path, err)
+        return None
+
+
+def store_cached(source_path, arrays, cache_dir=None):
+    """Cache the mesh |arrays| parsed from |source_path|.
+
+    Failures are logged rather than raised, the cache is only an
+    optimization.
+    """
+    path = cache_path(source_path, cache_dir)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_mesh_file(path, arrays)
+    except OSError as err:
+        LOG.warning('failed to write mesh cache entry %s: %s', path, err)
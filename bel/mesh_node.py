@@ -1,42 +1,65 @@
 """MeshNode is a SceneNode containing one Mesh."""
 
 import numpy
+from OpenGL.GL import GL_STATIC_DRAW, GL_STREAM_DRAW
 
 from bel.auto_name import auto_name
-from bel.buffer_object import float_array_buffer_view
+from bel.buffer_object import (float_array_buffer_view, index_array,
+                               upload_ranges)
 from bel.draw_command import DrawCommand, DrawCommandHandle
 from bel.mesh import Mesh
 from bel.scene_node import SceneNode
 from bel.uniform import MatrixUniform
-from cgmath.normal import triangle_normal
-from cgmath.vector import copy_xyz, copy_xyzw
+from cgmath.normal import triangle_normals, vertex_normals
 
 
 class VertBufHandle:
-    def __init__(self):
+    def __init__(self, usage=GL_STATIC_DRAW):
         self.uid = auto_name('vertbuf')
-        # TODO: this will probably need more fine-grained control,
-        # i.e. dirty ranges
+        # GL usage hint; GL_STREAM_DRAW buffers are uploaded through a
+        # ring of regions so rewriting them every frame doesn't stall
+        self.usage = usage
+        # Forces a full rebuild, needed after in-place edits that the
+        # mesh wasn't told about
         self.dirty = True
+        # CPU copy of the buffer, one row per item (e.g. triangle)
+        self.array = None
+        # Mesh.vert_change_count the array is up to date with
+        self.change_count = None
 
 
 class MeshNode(SceneNode):
     """SceneNode containing one Mesh."""
 
-    def __init__(self, mesh=None):
+    def __init__(self, mesh=None, usage=GL_STATIC_DRAW):
+        """Create a node drawing |mesh|.
+
+        usage: GL usage hint for the vertex buffers, use GL_STREAM_DRAW
+               for meshes whose vertices change every frame
+        """
         super().__init__()
         self._mesh = Mesh() if mesh is None else mesh
 
         self._num_draw_triangles = 0
-        self._triangle_buf = VertBufHandle()
+        self._triangle_buf = VertBufHandle(usage)
         self._triangle_draw = DrawCommandHandle()
+        self._index_buf = VertBufHandle()
+        self._index_type = None
 
         self._num_draw_edges = 0
-        self._edge_buf = VertBufHandle()
+        self._edge_buf = VertBufHandle(usage)
         self._edge_draw = DrawCommandHandle()
 
+        # Shared by the draw commands, updated in place so unchanged
+        # matrices keep their version
+        self._model_uniform = MatrixUniform(numpy.identity(4))
+        # Transform.world_version the model uniform is up to date with
+        self._model_version = None
+
         self._material_uid = 'default'
         self._draw_edges = False
+        self._smooth_shading = False
+        self._mesh.add_change_listener(self.mark_changed)
 
     @property
     def draw_edges(self):
@@ -44,70 +67,175 @@ class MeshNode(SceneNode):
 
     @draw_edges.setter
     def draw_edges(self, val):
-        self._draw_edges = val
+        if val != self._draw_edges:
+            self._draw_edges = val
+            self.mark_changed()
+
+    @property
+    def smooth_shading(self):
+        """Draw with interpolated vertex normals rather than flat faces.
+
+        Smooth shading shares vertices between triangles, so the mesh
+        is drawn from one vertex per mesh vertex plus an index buffer.
+        """
+        return self._smooth_shading
+
+    @smooth_shading.setter
+    def smooth_shading(self, val):
+        if val != self._smooth_shading:
+            self._smooth_shading = val
+            self.mark_changed()
+            self._triangle_buf.dirty = True
+            self._triangle_draw.needs_update = True
 
     @property
     def mesh(self):
         return self._mesh
 
-    def _create_edge_array(self):
-        num_edges = len(self._mesh.edges)
-        vert_per_edge = 2
+    def _create_edge_rows(self, edge_indices=None):
+        """Get one row of 2 x (loc, col) per edge.
+
+        edge_indices: the edges to create rows for, default all
+        """
         elem_per_loc = 3
         elem_per_col = 4
         elem_per_vert = elem_per_loc + elem_per_col
-        elem_per_edge = vert_per_edge * elem_per_vert
-        assert elem_per_edge == 14
-        verts = numpy.empty(num_edges * elem_per_edge, numpy.float32)
-
-        out_index = 0
-        for edge in self._mesh.edges:
-            for vert_index in edge.vert_indices:
-                vert = self._mesh.vert(vert_index)
-
-                copy_xyz(verts[out_index:], vert.loc)
-                out_index += elem_per_loc
-
-                copy_xyzw(verts[out_index:], vert.col)
-                out_index += elem_per_col
-        return num_edges, verts
-
-    def _create_draw_array(self):
-        elem_per_vert = 10
-        vert_per_tri = 3
-        fac = elem_per_vert * vert_per_tri
-
-        num_triangles = 0
-        for face in self._mesh.faces:
-            num_triangles += len(face.vert_indices) - 2
-
-        verts = numpy.empty(num_triangles * fac, numpy.float32)
-        out = 0
-
-        for face in self._mesh.faces:
-            for vi0, vi1, vi2 in face.iter_triangle_fan():
-                loc_col = [
-                    (self._mesh.verts[vit].loc, self._mesh.verts[vit].col)
-                    for vit in (vi0, vi1, vi2)
-                ]
-                nor = triangle_normal(*(loc for loc, _ in loc_col))
-
-                for loc, col in loc_col:
-                    copy_xyz(verts[out:out+3], loc)
-                    out += 3
-                    copy_xyz(verts[out:out+3], nor)
-                    out += 3
-                    copy_xyzw(verts[out:out+6], col)
-                    out += 4
-        return num_triangles, verts
+
+        # Gather both endpoints of every edge into rows of (loc, col)
+        vert_indices = self._mesh.edge_vert_indices
+        if edge_indices is not None:
+            vert_indices = vert_indices[edge_indices]
+        verts = numpy.empty(vert_indices.shape + (elem_per_vert,),
+                            numpy.float32)
+        verts[:, :, :elem_per_loc] = self._mesh.locs[vert_indices]
+        verts[:, :, elem_per_loc:] = self._mesh.cols[vert_indices]
+        return verts.reshape(len(vert_indices), -1)
+
+    def _create_triangle_rows(self, tri_indices=None):
+        """Get one row of 3 x (loc, nor, col) per triangle.
+
+        tri_indices: the triangles to create rows for, default all
+        """
+        elem_per_loc = 3
+        elem_per_nor = 3
+        nor_end = elem_per_loc + elem_per_nor
+
+        # Each triangle gets three vertices, all three sharing the flat
+        # normal of the triangle
+        vert_indices = self._mesh.triangles()[0]
+        if tri_indices is not None:
+            vert_indices = vert_indices[tri_indices]
+        locs = self._mesh.locs.take(vert_indices, axis=0)
+        nors = triangle_normals(locs[:, 0], locs[:, 1], locs[:, 2])
+
+        verts = numpy.empty(vert_indices.shape + (10,), numpy.float32)
+        verts[:, :, :elem_per_loc] = locs
+        verts[:, :, elem_per_loc:nor_end] = nors[:, numpy.newaxis]
+        verts[:, :, nor_end:] = self._mesh.cols.take(vert_indices, axis=0)
+        return verts.reshape(len(vert_indices), -1)
+
+    def _create_smooth_vert_rows(self, vert_indices=None):
+        """Get one (loc, nor, col) row per mesh vertex.
+
+        vert_indices: sorted vertices to create rows for, default all
+        """
+        elem_per_loc = 3
+        elem_per_nor = 3
+        nor_end = elem_per_loc + elem_per_nor
+
+        mesh = self._mesh
+        triangles = mesh.triangles()[0]
+        if vert_indices is None:
+            nors = vertex_normals(mesh.locs, triangles)
+            vert_indices = slice(None)
+        else:
+            nors = vertex_normals(
+                mesh.locs,
+                triangles[mesh.triangles_using_verts(vert_indices)],
+                vert_indices)
+        locs = mesh.locs[vert_indices]
+        verts = numpy.empty((len(locs), 10), numpy.float32)
+        verts[:, :elem_per_loc] = locs
+        verts[:, elem_per_loc:nor_end] = nors
+        verts[:, nor_end:] = mesh.cols[vert_indices]
+        return verts
+
+    def _sync_buffer(self, draw_state, handle, create_rows, changed_rows):
+        """Bring the buffer of |handle| up to date with the mesh.
+
+        create_rows: callable(rows) that returns the buffer rows for
+                     the given sorted row indices, or all rows if None
+
+        changed_rows: callable(vert_indices) that returns the sorted
+                      rows that depend on the given vertices
+
+        If the mesh can say which vertices changed since the last
+        update only the rows that depend on them are rebuilt and
+        uploaded. Returns True if the whole buffer was replaced.
+        """
+        mesh = self._mesh
+        changed = None
+        if not handle.dirty and handle.array is not None:
+            changed = mesh.changed_verts_since(handle.change_count)
+        handle.change_count = mesh.vert_change_count
+        handle.dirty = False
+
+        if changed is None:
+            handle.array = create_rows(None)
+            draw_state.update_buffer(handle.uid, handle.array, handle.usage)
+            return True
+
+        if len(changed):
+            rows = changed_rows(changed)
+            handle.array[rows] = create_rows(rows)
+            if handle.usage == GL_STREAM_DRAW:
+                # Streaming buffers are always written whole into a
+                # fresh region, never patched in place
+                draw_state.update_buffer(handle.uid, handle.array,
+                                         handle.usage)
+                return False
+            row_bytes = handle.array.itemsize * handle.array.shape[1]
+            for start, stop in upload_ranges(rows):
+                draw_state.update_buffer_range(handle.uid,
+                                               handle.array[start:stop],
+                                               start * row_bytes)
+        return False
 
     def _update_triangle_buf(self, draw_state):
-        self._num_draw_triangles, vert_nors = self._create_draw_array()
-        draw_state.update_buffer(self._triangle_buf.uid, vert_nors)
+        mesh = self._mesh
+        if self._smooth_shading:
+            full = self._sync_buffer(draw_state, self._triangle_buf,
+                                     self._create_smooth_vert_rows,
+                                     self._smooth_changed_rows)
+        else:
+            full = self._sync_buffer(draw_state, self._triangle_buf,
+                                     self._create_triangle_rows,
+                                     mesh.triangles_using_verts)
+        if not full:
+            return
+
+        triangles = mesh.triangles()[0]
+        self._num_draw_triangles = len(triangles)
+        if self._smooth_shading:
+            indices, index_type = index_array(triangles.ravel(),
+                                              mesh.num_verts)
+            draw_state.update_index_buffer(self._index_buf.uid, indices)
+            self._index_type = index_type
+        self._triangle_draw.needs_update = True
+
+    def _smooth_changed_rows(self, vert_indices):
+        # Moving a vertex changes the normals of its neighbors too
+        mesh = self._mesh
+        triangles = mesh.triangles()[0]
+        neighbors = triangles[mesh.triangles_using_verts(vert_indices)]
+        return numpy.union1d(vert_indices, neighbors.ravel())
 
     def _update_edge_buf(self, draw_state):
-        self._num_draw_edges, array = self._create_edge_array()
-        draw_state.update_buffer(self._edge_buf.uid, array)
+        if self._sync_buffer(draw_state, self._edge_buf,
+                             self._create_edge_rows,
+                             self._mesh.edges_using_verts):
+            self._num_draw_edges = self._mesh.num_edges
+            self._edge_draw.needs_update = True
 
     def _update_draw_cmd(self, draw_state):
         # TODO, update instead of create
@@ -137,9 +265,15 @@ class MeshNode(SceneNode):
                 )
             }
         })
-        dcom.uniforms['model'] = MatrixUniform(self.transform.matrix())
+        dcom.uniforms['model'] = self._model_uniform
         dcom.vert_range = (0, self._num_draw_triangles * 3)
         dcom.primitive = DrawCommand.Triangles
+        if self._smooth_shading:
+            dcom.index_buffer = self._index_buf.uid
+            dcom.index_type = self._index_type
+        else:
+            dcom.index_buffer = None
+            dcom.index_type = None
 
     def _update_edge_draw(self, draw_state):
         # TODO, update instead of create
@@ -164,26 +298,38 @@ class MeshNode(SceneNode):
             }
         })
         dcom.material_name = 'flat'
-        dcom.uniforms['model'] = MatrixUniform(self.transform.matrix())
+        dcom.uniforms['model'] = self._model_uniform
         dcom.vert_range = (0, self._num_draw_edges * 2)
         dcom.primitive = DrawCommand.Lines
 
     def draw(self, draw_state):
-        if self._edge_buf.dirty and self._draw_edges:
+        if self._draw_edges:
             self._update_edge_buf(draw_state)
-            self._edge_buf.dirty = False
 
         if self._edge_draw.needs_update and self._draw_edges:
             self._update_edge_draw(draw_state)
             self._edge_draw.needs_update = False
 
-        if self._triangle_buf.dirty:
-            self._update_triangle_buf(draw_state)
-            self._triangle_buf.dirty = False
+        self._update_triangle_buf(draw_state)
 
         if self._triangle_draw.needs_update:
             self._update_draw_cmd(draw_state)
             self._triangle_draw.needs_update = False
 
+        self._update_model_uniform()
+
+    def _update_model_uniform(self):
+        version = self.transform.world_version()
+        if version == self._model_version:
+            return
+        self._model_version = version
+        self._model_uniform.set(self.transform.world_matrix())
+
+    def bounds(self):
+        return self._mesh.bounds()
+
+    def draw_handles(self):
+        return (self._triangle_draw, self._edge_draw)
+
     def ray_intersect(self, ray):
         return self._mesh.ray_intersect(ray)
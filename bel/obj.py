@@ -0,0 +1,241 @@
+"""Streaming Wavefront OBJ reader.
+
+The file is read in fixed-size blocks of whole lines and each block
+is parsed with whole-array numpy operations rather than line by
+line: bytes that don't belong to the records of interest are blanked
+out and the remaining numbers are converted in bulk by
+numpy.fromstring.
+
+Only vertex locations ("v") and faces ("f") are read. Face tokens may
+use any of the "v", "v/vt", "v//vn" and "v/vt/vn" forms, and indices
+may be negative (relative to the last vertex defined). Line
+continuations ("\\" at end of line) are not supported.
+"""
+
+import warnings
+
+import numpy
+
+# Size of each block read from the file
+BLOCK_SIZE = 1 << 20
+
+_NEWLINE = ord('\n')
+_HASH = ord('#')
+_SLASH = ord('/')
+_SPACE = ord(' ')
+
+
+def _is_blank(chars):
+    """Mask of whitespace (or other control characters) in |chars|."""
+    return chars <= _SPACE
+
+
+def _parse_numbers(chars, count, dtype):
+    """Parse |count| whitespace-separated numbers from |chars|."""
+    if count == 0:
+        # fromstring misparses all-blank input as [-1]
+        return numpy.empty(0, dtype)
+    with warnings.catch_warnings():
+        # A malformed number makes fromstring stop early with a
+        # warning, that case is reported by the count check below
+        warnings.simplefilter('ignore', DeprecationWarning)
+        values = numpy.fromstring(chars.tobytes(), dtype=dtype, sep=' ')
+    if len(values) != count:
+        raise ValueError('malformed number in OBJ data')
+    return values
+
+
+class _Block:
+    """Byte-level view of a block of complete OBJ lines."""
+    def __init__(self, block):
+        self.chars = numpy.frombuffer(block, numpy.uint8)
+        num_chars = len(self.chars)
+
+        # Every byte (including its terminating newline) belongs to
+        # exactly one line
+        line_ends = numpy.flatnonzero(self.chars == _NEWLINE) + 1
+        self.line_starts = numpy.concatenate(([0], line_ends[:-1]))
+        self.line_lengths = line_ends - self.line_starts
+
+        self.comment = None
+        if block.find(b'#') != -1:
+            self.comment = self._find_comments(line_ends)
+
+        # Position of the record tag of each line, after any leading
+        # whitespace
+        self.tag_positions = self.line_starts
+        indented = (_is_blank(self.chars[self.line_starts]) &
+                    (self.line_lengths > 1))
+        if numpy.any(indented):
+            self.tag_positions = self._find_tags(indented)
+        self._first = self.chars[self.tag_positions]
+        self._record_blank = _is_blank(
+            self.chars[numpy.minimum(self.tag_positions + 1, num_chars - 1)])
+
+    def _find_tags(self, indented):
+        """Position of the first non-blank byte of each line.
+
+        Lines in the |indented| mask are searched, the others (and
+        lines that are all blank) keep their line start.
+        """
+        tag_positions = self.line_starts.copy()
+        keep = numpy.repeat(indented, self.line_lengths)
+        nonblank = numpy.flatnonzero(keep & ~_is_blank(self.chars))
+        nonblank_lines = self.line_of(nonblank)
+        first = numpy.ones(len(nonblank), bool)
+        first[1:] = nonblank_lines[1:] != nonblank_lines[:-1]
+        tag_positions[nonblank_lines[first]] = nonblank[first]
+        return tag_positions
+
+    def _find_comments(self, line_ends):
+        """Mask of bytes from a "#" to the end of its line."""
+        hashes = numpy.flatnonzero(self.chars == _HASH)
+        hash_lines = self.line_of(hashes)
+        first = numpy.ones(len(hashes), bool)
+        first[1:] = hash_lines[1:] != hash_lines[:-1]
+
+        toggles = numpy.zeros(len(self.chars) + 1, numpy.int8)
+        toggles[hashes[first]] = 1
+        toggles[line_ends[hash_lines[first]]] -= 1
+        return numpy.cumsum(toggles[:-1], dtype=numpy.int8) != 0
+
+    def line_of(self, positions):
+        """Line index of each byte position."""
+        return numpy.searchsorted(self.line_starts, positions,
+                                  side='right') - 1
+
+    def record_lines(self, tag):
+        """Mask of lines of the one-letter record |tag|.
+
+        The tag may be preceded by whitespace.
+        """
+        return (self._first == ord(tag)) & self._record_blank
+
+    def record_chars(self, lines):
+        """Copy of the block keeping only the arguments of |lines|.
+
+        All other bytes, comments and the record tags themselves are
+        replaced by spaces.
+        """
+        keep = numpy.repeat(lines, self.line_lengths)
+        if self.comment is not None:
+            keep &= ~self.comment
+        keep[self.tag_positions] = False
+        chars = numpy.full(len(self.chars), _SPACE, numpy.uint8)
+        chars[keep] = self.chars[keep]
+        return chars
+
+    def tokens(self, chars):
+        """Get (token_positions, tokens_per_line) for |chars|."""
+        nonblank = ~_is_blank(chars)
+        token_starts = nonblank.copy()
+        token_starts[1:] &= ~nonblank[:-1]
+        token_positions = numpy.flatnonzero(token_starts)
+        tokens_per_line = numpy.bincount(self.line_of(token_positions),
+                                         minlength=len(self.line_starts))
+        return token_positions, tokens_per_line
+
+
+def _strip_after_slash(chars):
+    """Blank the "/vt/vn" part of every face token in place."""
+    after_slash = chars == _SLASH
+    while numpy.any(after_slash):
+        chars[after_slash] = _SPACE
+        # Extend the blanked run by one byte until the token ends
+        after_slash[1:] = after_slash[:-1] & ~_is_blank(chars[1:])
+        after_slash[0] = False
+
+
+def _parse_block(block, num_verts_before):
+    """Parse a block of complete lines.
+
+    num_verts_before: number of vertices defined earlier in the file,
+                      used to resolve negative indices
+
+    Returns (locs, corners, face_sizes). |corners| are zero-based
+    vertex indices.
+    """
+    parsed = _Block(block)
+
+    # Vertices: first three components of each "v" record, missing
+    # components are zero
+    vert_lines = parsed.record_lines('v')
+    chars = parsed.record_chars(vert_lines)
+    token_positions, tokens_per_line = parsed.tokens(chars)
+    values = _parse_numbers(chars, len(token_positions), numpy.float32)
+    counts = tokens_per_line[vert_lines]
+    starts = numpy.cumsum(counts) - counts
+    locs = numpy.zeros((len(counts), 3), numpy.float32)
+    for axis in range(3):
+        has_axis = counts > axis
+        locs[has_axis, axis] = values[starts[has_axis] + axis]
+
+    # Faces: the vertex index of each "v/vt/vn" token
+    face_lines = parsed.record_lines('f')
+    chars = parsed.record_chars(face_lines)
+    token_positions, tokens_per_line = parsed.tokens(chars)
+    if block.find(b'/') != -1:
+        _strip_after_slash(chars)
+    corners = _parse_numbers(chars, len(token_positions), numpy.int64)
+    face_sizes = tokens_per_line[face_lines]
+    face_sizes = face_sizes[face_sizes != 0]
+
+    negative = corners < 0
+    if numpy.any(negative):
+        # Relative to the number of vertices defined before the line
+        verts_before_line = (numpy.cumsum(vert_lines) - vert_lines +
+                             num_verts_before)
+        corner_lines = parsed.line_of(token_positions)
+        corners[negative] += verts_before_line[corner_lines[negative]]
+    corners[~negative] -= 1
+
+    return locs, corners, face_sizes
+
+
+def _iter_blocks(rfile, block_size):
+    """Iterator of blocks of complete lines from a binary file."""
+    tail = b''
+    while True:
+        data = rfile.read(block_size)
+        if not data:
+            break
+        data = tail + data
+        cut = data.rfind(b'\n') + 1
+        if cut != 0:
+            yield data[:cut]
+        tail = data[cut:]
+    if tail:
+        yield tail + b'\n'
+
+
+def read_obj(path, block_size=BLOCK_SIZE):
+    """Read vertex locations and faces from the OBJ file at |path|.
+
+    Returns (locs, face_vert_indices, face_offsets) in the layout used
+    by |bel.mesh.Mesh.from_arrays|.
+    """
+    loc_blocks = []
+    corner_blocks = []
+    size_blocks = []
+    num_verts = 0
+    with open(path, 'rb') as rfile:
+        for block in _iter_blocks(rfile, block_size):
+            locs, corners, face_sizes = _parse_block(block, num_verts)
+            num_verts += len(locs)
+            loc_blocks.append(locs)
+            corner_blocks.append(corners)
+            size_blocks.append(face_sizes)
+
+    locs = numpy.concatenate(
+        loc_blocks or [numpy.empty((0, 3), numpy.float32)])
+    corners = numpy.concatenate(
+        corner_blocks or [numpy.empty(0, numpy.int64)])
+    if numpy.any((corners < 0) | (corners >= num_verts)):
+        raise ValueError('face vertex index out of range', path)
+
+    face_sizes = numpy.concatenate(
+        size_blocks or [numpy.empty(0, numpy.int64)])
+    face_offsets = numpy.zeros(len(face_sizes) + 1, numpy.int32)
+    numpy.cumsum(face_sizes, out=face_offsets[1:])
+
+    return locs, corners.astype(numpy.int32), face_offsets
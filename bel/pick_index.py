@@ -0,0 +1,90 @@
+"""Acceleration structure for picking scene nodes with rays."""
+
+from math import inf
+
+import numpy
+
+from cgmath.bvh import BVH
+from cgmath.frustum import transform_boxes
+from cgmath.ray import Ray
+
+
+def local_ray(world_matrix, ray):
+    """Transform |ray| into the local space of |world_matrix|.
+
+    world_matrix: 4 x 4 matrix acting on column vectors
+
+    The direction is not normalized, so distances along the local ray
+    are the same as along |ray|.
+    """
+    inv = numpy.linalg.inv(world_matrix)
+    origin = inv[:3, :3].dot(ray.origin) + inv[:3, 3]
+    direction = inv[:3, :3].dot(ray.direction)
+    return Ray(origin=origin, direction=direction)
+
+
+class PickIndex:
+    """BVH over the world-space bounds of scene nodes.
+
+    |update| rebuilds the tree when the set of nodes changes and only
+    refits it when their transforms or bounds change. |intersect|
+    visits nodes front to back, so only the few nodes whose boxes the
+    ray passes near are asked for a full intersection.
+    """
+    def __init__(self):
+        self._nodes = []
+        self._bounds = []
+        self._update_count = None
+        self._bvh = None
+        self._matrices = None
+
+    def update(self, nodes, hierarchy):
+        """Index the bounded |nodes|, all members of |hierarchy|.
+
+        The hierarchy must be up to date.
+        """
+        bounds = [node.bounds() for node in nodes]
+        rebuild = nodes != self._nodes
+        if (not rebuild and self._update_count == hierarchy.update_count and
+                all(new is old for new, old in zip(bounds, self._bounds))):
+            return
+        self._nodes = nodes
+        self._bounds = bounds
+        self._update_count = hierarchy.update_count
+
+        if not nodes:
+            self._bvh = None
+            return
+        box_min = numpy.array([box[0] for box in bounds])
+        box_max = numpy.array([box[1] for box in bounds])
+        self._matrices = hierarchy.world_matrices[
+            [node.transform.index for node in nodes]].astype(numpy.float64)
+        world_min, world_max = transform_boxes(self._matrices, box_min,
+                                               box_max)
+        if rebuild:
+            self._bvh = BVH(world_min, world_max, max_leaf_size=2)
+        else:
+            self._bvh.refit(world_min, world_max)
+
+    def intersect(self, ray):
+        """Get (node, distance) of the nearest node hit by |ray|.
+
+        Returns (None, inf) if no node is hit.
+        """
+        if self._bvh is None:
+            return None, inf
+
+        def intersect_nodes(indices, max_t):
+            best = None
+            for index in indices.tolist():
+                node_ray = local_ray(self._matrices[index], ray)
+                dist = self._nodes[index].ray_intersect(node_ray)
+                if dist is not None and dist < max_t:
+                    max_t = dist
+                    best = (dist, index)
+            return best
+
+        hit = self._bvh.intersect(ray.origin, ray.direction, intersect_nodes)
+        if hit is None:
+            return None, inf
+        return self._nodes[hit[1]], hit[0]
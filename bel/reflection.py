@@ -0,0 +1,146 @@
+"""Uniforms and attributes of linked programs, queried from GL."""
+
+from collections import namedtuple
+import ctypes
+
+import numpy
+from OpenGL.GL import (GL_ACTIVE_ATTRIBUTE_MAX_LENGTH, GL_ACTIVE_ATTRIBUTES,
+                       GL_ACTIVE_UNIFORM_MAX_LENGTH, GL_ACTIVE_UNIFORMS,
+                       GL_BOOL, GL_FLOAT, GL_FLOAT_MAT3, GL_FLOAT_MAT4,
+                       GL_FLOAT_VEC2, GL_FLOAT_VEC3, GL_FLOAT_VEC4, GL_INT,
+                       GL_INT_VEC2, GL_INT_VEC3, GL_INT_VEC4, GL_SAMPLER_2D,
+                       GL_UNIFORM_BLOCK_INDEX, GL_UNSIGNED_INT,
+                       glGetAttribLocation, glGetProgramiv,
+                       glGetUniformLocation, glUniform1fv, glUniform1iv,
+                       glUniform1uiv, glUniform2fv, glUniform2iv,
+                       glUniform3fv, glUniform3iv, glUniform4fv,
+                       glUniform4iv, glUniformMatrix3fv, glUniformMatrix4fv)
+from OpenGL.raw.GL.VERSION.GL_2_0 import (glGetActiveAttrib,
+                                          glGetActiveUniform)
+from OpenGL.raw.GL.VERSION.GL_3_1 import glGetActiveUniformsiv
+
+# location is -1 for uniforms in a block, block_index -1 for uniforms
+# in the default block
+UniformInfo = namedtuple('UniformInfo', ('name', 'location', 'gl_type',
+                                         'size', 'block_index'))
+
+AttributeInfo = namedtuple('AttributeInfo', ('name', 'location', 'gl_type',
+                                             'size'))
+
+# Uniform type -> glUniform* function taking (location, count, value)
+UNIFORM_FUNCTIONS = {
+    GL_FLOAT: glUniform1fv,
+    GL_FLOAT_VEC2: glUniform2fv,
+    GL_FLOAT_VEC3: glUniform3fv,
+    GL_FLOAT_VEC4: glUniform4fv,
+    GL_INT: glUniform1iv,
+    GL_INT_VEC2: glUniform2iv,
+    GL_INT_VEC3: glUniform3iv,
+    GL_INT_VEC4: glUniform4iv,
+    GL_UNSIGNED_INT: glUniform1uiv,
+    GL_BOOL: glUniform1iv,
+    GL_SAMPLER_2D: glUniform1iv,
+}
+
+# Integer uniform type -> dtype its values are converted to, uniform
+# values are stored as floats
+UNIFORM_INTEGER_DTYPES = {
+    GL_INT: numpy.int32,
+    GL_INT_VEC2: numpy.int32,
+    GL_INT_VEC3: numpy.int32,
+    GL_INT_VEC4: numpy.int32,
+    GL_UNSIGNED_INT: numpy.uint32,
+    GL_BOOL: numpy.int32,
+    GL_SAMPLER_2D: numpy.int32,
+}
+
+# Matrix uniform type -> glUniformMatrix* function taking (location,
+# count, transpose, value)
+UNIFORM_MATRIX_FUNCTIONS = {
+    GL_FLOAT_MAT3: glUniformMatrix3fv,
+    GL_FLOAT_MAT4: glUniformMatrix4fv,
+}
+
+
+def uniform_setter(gl_type, size=1):
+    """Get a function(location, value) that sets a uniform.
+
+    gl_type: GL type of the uniform, e.g. GL_FLOAT_VEC4
+
+    size: number of array elements
+
+    Matrices are uploaded without transposing, the value must already
+    be in the order of the shader's matrix. Values of integer, bool
+    and sampler uniforms are converted, see |UNIFORM_INTEGER_DTYPES|.
+
+    Returns None for unsupported types.
+    """
+    func = UNIFORM_FUNCTIONS.get(gl_type)
+    dtype = UNIFORM_INTEGER_DTYPES.get(gl_type)
+    if func is not None and dtype is not None:
+        return lambda location, value: func(location, size,
+                                            numpy.asarray(value, dtype))
+    if func is not None:
+        return lambda location, value: func(location, size, value)
+    func = UNIFORM_MATRIX_FUNCTIONS.get(gl_type)
+    if func is not None:
+        return lambda location, value: func(location, size, False, value)
+    return None
+
+
+def _base_name(name):
+    """Name of an array uniform without the "[0]" GL appends."""
+    if name.endswith('[0]'):
+        return name[:-3]
+    return name
+
+
+def _active_resources(hnd, count_param, max_length_param, get_active):
+    """Yield (index, name, gl_type, size) of each active resource."""
+    count = glGetProgramiv(hnd, count_param)
+    max_length = max(glGetProgramiv(hnd, max_length_param), 1)
+    length = numpy.zeros(1, numpy.int32)
+    size = numpy.zeros(1, numpy.int32)
+    gl_type = numpy.zeros(1, numpy.uint32)
+    name = ctypes.create_string_buffer(max_length)
+    for index in range(count):
+        get_active(hnd, index, max_length, length, size, gl_type, name)
+        yield (index, name.value.decode('utf-8'), int(gl_type[0]),
+               int(size[0]))
+
+
+def reflect_uniforms(hnd):
+    """Get a |UniformInfo| for each active uniform of program |hnd|."""
+    uniforms = []
+    for index, name, gl_type, size in _active_resources(
+            hnd, GL_ACTIVE_UNIFORMS, GL_ACTIVE_UNIFORM_MAX_LENGTH,
+            glGetActiveUniform):
+        block_index = numpy.zeros(1, numpy.int32)
+        glGetActiveUniformsiv(hnd, 1, numpy.array([index], numpy.uint32),
+                              GL_UNIFORM_BLOCK_INDEX, block_index)
+        uniforms.append(UniformInfo(
+            name=_base_name(name),
+            location=glGetUniformLocation(hnd, name),
+            gl_type=gl_type,
+            size=size,
+            block_index=int(block_index[0])))
+    return uniforms
+
+
+def reflect_attributes(hnd):
+    """Get an |AttributeInfo| for each active attribute of program |hnd|.
+
+    Built-in inputs such as gl_VertexID are left out.
+    """
+    attributes = []
+    for _, name, gl_type, size in _active_resources(
+            hnd, GL_ACTIVE_ATTRIBUTES, GL_ACTIVE_ATTRIBUTE_MAX_LENGTH,
+            glGetActiveAttrib):
+        if name.startswith('gl_'):
+            continue
+        attributes.append(AttributeInfo(
+            name=name,
+            location=glGetAttribLocation(hnd, name),
+            gl_type=gl_type,
+            size=size))
+    return attributes
@@ -1,6 +1,10 @@
+import numpy
+
 from bel.camera_node import CameraNode
+from bel.pick_index import PickIndex, local_ray
 from bel.scene_node import SceneNode
 
+from cgmath.frustum import boxes_in_frustum, frustum_planes, transform_boxes
 from cgmath.matrix import inverse
 from cgmath.ray import Ray
 from cgmath.vector import normalized, vec4_from_vec2, vec3_from_vec4
@@ -9,6 +13,15 @@ class Scene(object):
     def __init__(self):
         self._root = SceneNode()
         self._camera = self._root.add_child(CameraNode())
+        # Nodes drawn and culled in the last frame
+        self.num_visible = 0
+        self.num_culled = 0
+        self._pick_index = PickIndex()
+        # Pickable nodes without bounds, and the
+        # |SceneNode.pick_changes| value the pick index is up to date
+        # with
+        self._unbounded = []
+        self._pick_version = None
 
     @property
     def root(self):
@@ -24,26 +37,92 @@ class Scene(object):
             stack += node.children
             yield node
 
+    def _visible_mask(self, nodes):
+        """Test the bounds of all |nodes| against the view frustum."""
+        visible = numpy.ones(len(nodes), bool)
+        clip_matrix = self._camera.clip_matrix()
+        if clip_matrix is None:
+            return visible
+        indices = []
+        boxes = []
+        for index, node in enumerate(nodes):
+            box = node.bounds()
+            if box is not None:
+                indices.append(index)
+                boxes.append(box)
+        if not boxes:
+            return visible
+
+        box_min, box_max = (numpy.array(corner)
+                            for corner in zip(*boxes))
+        hierarchy = self._root.transform.hierarchy
+        matrices = hierarchy.world_matrices[
+            [nodes[index].transform.index for index in indices]]
+        world_min, world_max = transform_boxes(matrices, box_min, box_max)
+        visible[indices] = boxes_in_frustum(frustum_planes(clip_matrix),
+                                            world_min, world_max)
+        return visible
+
     def draw(self, draw_state):
-        for node in self.iter_nodes():
-            node.draw(draw_state)
+        # World matrices of the whole tree in one batch
+        self._root.transform.hierarchy.update()
+        nodes = list(self.iter_nodes())
+        visible = self._visible_mask(nodes)
+        for node, node_visible in zip(nodes, visible.tolist()):
+            for handle in node.draw_handles():
+                draw_state.set_draw_culled(handle, not node_visible)
+            # Culled nodes don't need their buffers brought up to date
+            if node_visible:
+                node.draw(draw_state)
+        self.num_culled = len(nodes) - int(visible.sum())
+        self.num_visible = len(nodes) - self.num_culled
 
     def ray_intersect(self, ray):
-        # TODO, implement properly
-        best_node = None
-        closest_hit = float('inf')
+        """Get (node, distance) of the nearest pickable node hit.
 
-        for node in self.iter_nodes():
-            if not node.pickable:
-                continue
+        The pick index is only updated if the scene's
+        |SceneNode.pick_changes| counter moved since the last pick.
+        Returns (None, inf) if nothing is hit.
+        """
+        hierarchy = self._root.transform.hierarchy
+        if self._pick_version != self._root.pick_changes.latest:
+            self._update_pick_index(hierarchy)
+        best_node, closest_hit = self._pick_index.intersect(ray)
 
-            hit = node.ray_intersect(ray)
+        # Nodes without bounds can't be indexed, test them all
+        for node in self._unbounded:
+            hit = node.ray_intersect(
+                local_ray(hierarchy.world_matrices[node.transform.index],
+                          ray))
             if hit is not None and hit < closest_hit:
                 best_node = node
                 closest_hit = hit
 
         return best_node, closest_hit
 
+    def _update_pick_index(self, hierarchy):
+        """Bring the pick index up to date after the scene changed."""
+        hierarchy.update()
+        bounded = []
+        unbounded = []
+        for node in self.iter_nodes():
+            if node.pickable:
+                if node.bounds() is None:
+                    unbounded.append(node)
+                else:
+                    bounded.append(node)
+        self._pick_index.update(bounded, hierarchy)
+        self._unbounded = unbounded
+        self._pick_version = self._root.pick_changes.latest
+
+    def change_version(self):
+        """Value that changes whenever the scene needs to be redrawn.
+
+        The latest value of the tree's |SceneNode.changes| counter,
+        cheap enough for |FrameScheduler.add_version_source|.
+        """
+        return self._root.changes.latest
+
     def ray_from_screen_coord(self, screen_loc):
         # Adapted from http://antongerdelan.net/opengl/raycasting.html
         cam = self._camera
@@ -1,15 +1,72 @@
+from bel.versions import VersionCounter
 from cgmath.affine import Transform
 
 class SceneNode(object):
     def __init__(self):
         self._transform = Transform()
+        self._transform.on_change = self.mark_changed
         self._children = []
-        self.pickable = True
+        self._pickable = True
+        # Shared by the whole tree once the node is added to one
+        self._changes = VersionCounter()
+        self._pick_changes = VersionCounter()
 
     def add_child(self, child):
         self._children.append(child)
+        # Moves the transforms of the child's whole subtree
+        child.transform.attach(self._transform)
+        # pylint: disable=protected-access
+        child._join(self._changes, self._pick_changes)
+        next(self._changes)
+        next(self._pick_changes)
         return child
 
+    def _join(self, changes, pick_changes):
+        """Share the counters of a tree with the subtree."""
+        self._changes = changes
+        self._pick_changes = pick_changes
+        for child in self._children:
+            # pylint: disable=protected-access
+            child._join(changes, pick_changes)
+
+    @property
+    def changes(self):
+        """|VersionCounter| of the tree the node belongs to.
+
+        Its |VersionCounter.latest| changes whenever anything that
+        affects drawing or picking changes in the tree: nodes being
+        added, transform or mesh changes and node options. In-place
+        edits of transform views aren't noticed, call |mark_changed|
+        after them.
+        """
+        return self._changes
+
+    @property
+    def pick_changes(self):
+        """Like |changes|, but only counting what may affect picking.
+
+        Changes to nodes that are neither pickable nor have children
+        (which they could move) are left out.
+        """
+        return self._pick_changes
+
+    def mark_changed(self):
+        """Increment the tree's |changes| (and |pick_changes|) counter."""
+        next(self._changes)
+        if self._pickable or self._children:
+            next(self._pick_changes)
+
+    @property
+    def pickable(self):
+        return self._pickable
+
+    @pickable.setter
+    def pickable(self, val):
+        if val != self._pickable:
+            self._pickable = val
+            next(self._changes)
+            next(self._pick_changes)
+
     @property
     def transform(self):
         return self._transform
@@ -21,6 +78,19 @@ class SceneNode(object):
     def draw(self, draw_state):
         pass
 
+    def bounds(self):
+        """Local-space (min, max) box around what the node draws.
+
+        None means the node is never culled.
+        """
+        # pylint: disable=no-self-use
+        return None
+
+    def draw_handles(self):
+        """Handles of the draw commands the node creates."""
+        # pylint: disable=no-self-use
+        return ()
+
     def ray_intersect(self, ray):
         # pylint: disable=no-self-use,unused-argument
         return None
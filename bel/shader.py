@@ -1,23 +1,40 @@
 from contextlib import contextmanager
+import ctypes
+from functools import lru_cache
 import logging
 import re
 
 from bidict import bidict
 
 from OpenGL.GL import (GL_COMPILE_STATUS, GL_FRAGMENT_SHADER,
-                       GL_GEOMETRY_SHADER, GL_VERTEX_SHADER,
-                       glAttachShader, glCompileShader,
-                       glCreateProgram, glCreateShader,
-                       glDeleteShader, glEnableVertexAttribArray,
-                       glGetProgramInfoLog, glGetUniformLocation,
-                       glGetShaderInfoLog, glGetShaderiv,
-                       glLinkProgram, glShaderSource, glUseProgram)
+                       GL_GEOMETRY_SHADER, GL_INVALID_INDEX, GL_LINK_STATUS,
+                       GL_NUM_PROGRAM_BINARY_FORMATS,
+                       GL_PROGRAM_BINARY_LENGTH,
+                       GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL_RENDERER,
+                       GL_TRUE, GL_VENDOR, GL_VERSION, GL_VERTEX_SHADER,
+                       GL_EXTENSIONS, GL_NUM_EXTENSIONS,
+                       GLenum, GLsizei, glAttachShader, glCompileShader,
+                       glCreateProgram, glCreateShader, glDeleteProgram,
+                       glDeleteShader, glGetIntegerv,
+                       glGetProgramBinary, glGetProgramInfoLog,
+                       glGetProgramiv, glGetString, glGetStringi,
+                       glGetUniformBlockIndex, glGetShaderInfoLog,
+                       glGetShaderiv, glLinkProgram, glProgramBinary,
+                       glProgramParameteri, glShaderSource,
+                       glUniformBlockBinding, glUseProgram)
+try:
+    # PyOpenGL 3.1.1+
+    from OpenGL.GL.KHR.parallel_shader_compile import (
+        GL_COMPLETION_STATUS_KHR, glMaxShaderCompilerThreadsKHR)
+except ImportError:
+    GL_COMPLETION_STATUS_KHR = None
+    glMaxShaderCompilerThreadsKHR = None  # pylint: disable=invalid-name
+
+from bel import shader_cache
+from bel.reflection import (reflect_attributes, reflect_uniforms,
+                            uniform_setter)
+from bel.uniform import UNIFORM_BLOCKS
 
-KEYWORD_ATTRIBUTE = 'attribute'
-KEYWORD_UNIFORM = 'uniform'
-
-
-# TODO, this is just what works for my driver
 def pretty_print_log(log, path):
     # Example input line:
     # 0:17(24): error: `gl_PositionIn' undeclared
@@ -31,64 +48,99 @@ def pretty_print_log(log, path):
                  flags=re.MULTILINE))
 
 
-def extract_uniforms(source):
-    for line in source.splitlines():
-        parts = line.split()
-        if len(parts) == 3 and parts[0] == 'uniform':
-            name = parts[2].rstrip(';')
-            yield name
+def print_source(source):
+    for index, line in enumerate(source.splitlines()):
+        print('{:4}| {}'.format(index + 1, line))
 
 
-def extract_links(source, keyword):
-    for line in source.splitlines():
-        parts = line.split()
-        if (len(parts) >= 4 and parts[-3] == keyword and
-                parts[0].startswith('layout')):
-            layout = ''.join(parts[0:-3])
-            layout = layout.replace('\t', '')
-            layout = layout.replace(' ', '')
-            index = layout.find('location=')
-            if index != -1:
-                index += len('location=')
-                location = layout[index:-1]
-                name = parts[-1][:-1]
-                yield name, int(location)
+def read_sources(*paths):
+    """Read each file in |paths|, None paths give None."""
+    sources = []
+    for path in paths:
+        if path is None:
+            sources.append(None)
+        else:
+            with open(path) as rfile:
+                sources.append(rfile.read())
+    return sources
 
 
-def print_source(source):
-    for index, line in enumerate(source.splitlines()):
-        print('{:4}| {}'.format(index + 1, line))
+def rewrite_uniform_blocks(source):
+    """Declare the shared per-frame uniforms of |source| as blocks."""
+    for block in UNIFORM_BLOCKS:
+        source = block.rewrite_source(source)
+    return source
+
+
+@lru_cache(maxsize=None)
+def program_binaries_supported():
+    """Whether the driver can save and load linked programs."""
+    # pylint: disable=assignment-from-no-return
+    return (bool(glProgramBinary) and
+            glGetIntegerv(GL_NUM_PROGRAM_BINARY_FORMATS) > 0)
+
+
+@lru_cache(maxsize=None)
+def parallel_compile_supported():
+    """Whether compile and link status can be polled without blocking.
+
+    If so, the driver is also told to use as many compiler threads as
+    it likes.
+    """
+    if glMaxShaderCompilerThreadsKHR is None:
+        return False
+    # pylint: disable=assignment-from-no-return
+    extensions = set(glGetStringi(GL_EXTENSIONS, index)
+                     for index in range(glGetIntegerv(GL_NUM_EXTENSIONS)))
+    if b'GL_KHR_parallel_shader_compile' not in extensions:
+        return False
+    glMaxShaderCompilerThreadsKHR(0xffffffff)
+    return True
+
+
+@lru_cache(maxsize=None)
+def driver_identity():
+    """String identifying the GL implementation, for cache keys."""
+    return '\n'.join(glGetString(name).decode('utf-8', 'replace')
+                     for name in (GL_VENDOR, GL_RENDERER, GL_VERSION))
 
 
 class Shader:
-    def __init__(self, path, kind, source=None):
+    def __init__(self, path, kind, source=None, wait=True):
+        """Create and compile a shader.
+
+        wait: check the compile status right away; otherwise |check|
+              must be called before using the shader, which allows the
+              driver to compile several shaders in parallel
+        """
         self._hnd = None
-        self._attributes = set()
-        self._uniforms = set()
 
         self._kind = kind
         self._path = path
 
-        if source is not None:
-            self._source = source
-        else:
+        if source is None:
             with open(self._path) as rfile:
-                self._source = rfile.read()
+                source = rfile.read()
+        # Shared per-frame uniforms come from uniform buffers
+        self._source = rewrite_uniform_blocks(source)
 
         self._alloc()
         self._compile()
-        self._extract_links()
-
-    def _extract_links(self):
-        # TODO
-        if self._kind == GL_VERTEX_SHADER:
-            self._attributes = extract_links(self._source, 'in')
-        self._uniforms = extract_uniforms(self._source)
+        if wait:
+            self.check()
 
     @property
     def hnd(self):
         return self._hnd
 
+    @property
+    def kind(self):
+        return self._kind
+
+    @property
+    def source(self):
+        return self._source
+
     def _alloc(self):
         # pylint: disable=assignment-from-no-return
         self._hnd = glCreateShader(self._kind)
@@ -100,17 +152,25 @@ class Shader:
         if self._hnd is not None:
             conn.send_msg(lambda: glDeleteShader(self._hnd))
 
+    def delete(self):
+        if self._hnd is not None:
+            glDeleteShader(self._hnd)
+            self._hnd = None
+
     def _compile(self):
         logging.info('glShaderSource(%d, ...)', self._hnd)
         glShaderSource(self._hnd, self._source)
         logging.info('glCompileShader(%d)', self._hnd)
         glCompileShader(self._hnd)
 
+    def check(self):
+        """Wait for compilation, raising RuntimeError if it failed."""
         if not glGetShaderiv(self._hnd, GL_COMPILE_STATUS):
             logging.error('glCompileShader failed')
             compile_log = glGetShaderInfoLog(self._hnd).decode('utf-8')
 
             glDeleteShader(self._hnd)
+            self._hnd = None
 
             if self._path == '':
                 print_source(self._source)
@@ -119,49 +179,181 @@ class Shader:
 
             raise RuntimeError('shader failed to compile', compile_log)
 
-    def uniforms(self):
-        return self._uniforms
-
-    def attributes(self):
-        return self._attributes
-
 
 class VertexShader(Shader):
-    def __init__(self, path='', source=None):
-        super().__init__(path, GL_VERTEX_SHADER, source)
+    def __init__(self, path='', source=None, wait=True):
+        super().__init__(path, GL_VERTEX_SHADER, source, wait)
 
 
 class GeometryShader(Shader):
-    def __init__(self, path='', source=None):
-        super().__init__(path, GL_GEOMETRY_SHADER, source)
+    def __init__(self, path='', source=None, wait=True):
+        super().__init__(path, GL_GEOMETRY_SHADER, source, wait)
 
 
 class FragmentShader(Shader):
-    def __init__(self, path='', source=None):
-        super().__init__(path, GL_FRAGMENT_SHADER, source)
+    def __init__(self, path='', source=None, wait=True):
+        super().__init__(path, GL_FRAGMENT_SHADER, source, wait)
+
+
+SHADER_CLASSES = {
+    GL_VERTEX_SHADER: VertexShader,
+    GL_GEOMETRY_SHADER: GeometryShader,
+    GL_FRAGMENT_SHADER: FragmentShader,
+}
 
 
 class ShaderProgram:
+    # Handle of the program in use, to skip redundant glUseProgram calls
+    _BoundProgram = None
+
     def __init__(self):
         self._hnd = None
         self._shaders = []
-        self._uniforms = {}
-        self._attributes = {}
+        # Reflected UniformInfo and AttributeInfo lists
+        self._uniforms = []
+        self._attributes = []
+        # (name, location, setter) of each uniform outside a block
+        self._uniform_table = []
+        # Attribute name -> location
+        self._attribute_locations = {}
+        # Indexed by uniform location: (version, value key) of the
+        # value last set, or None. Uniform values are part of the
+        # program state so they stay valid across program switches
+        self._uniform_values = []
+        # Names of uniforms already reported as not found in any map
+        self._unresolved = set()
+        # (cache key, cache dir) while linking, see |start|
+        self._pending = None
         self._alloc()
 
     @classmethod
-    def from_material(cls, sdef):
+    def from_material(cls, sdef, cache_dir=None):
+        """Create a program from a translated shaderdef material."""
+        return cls.from_sources(sdef.vert_shader, sdef.frag_shader,
+                                sdef.geom_shader, cache_dir)
+
+    @classmethod
+    def from_files(cls, vert_path, frag_path, geom_path=None,
+                   cache_dir=None):
+        """Create a program from GLSL source files."""
+        return cls.from_sources(*read_sources(vert_path, frag_path,
+                                              geom_path),
+                                cache_dir=cache_dir)
+
+    @classmethod
+    def from_sources(cls, vert_source, frag_source, geom_source=None,
+                     cache_dir=None):
+        """Create a program, reusing a cached binary if possible.
+
+        Same as |start| followed by |finish|.
+        """
+        prog = cls.start(vert_source, frag_source, geom_source, cache_dir)
+        prog.finish()
+        return prog
+
+    @classmethod
+    def start(cls, vert_source, frag_source, geom_source=None,
+              cache_dir=None):
+        """Start creating a program without waiting for the driver.
+
+        The shaders are submitted for compiling and the program for
+        linking, but no status is queried, so several programs can be
+        started before the first one is waited on. Use |is_ready| to
+        poll and |finish| to complete the program.
+
+        If the driver supports program binaries, the linked program
+        is cached under a key of the sources and the driver identity,
+        and later loaded from there instead of compiling. A binary the
+        driver rejects is discarded and the program compiled.
+
+        cache_dir: see |shader_cache.default_cache_dir|
+        """
+        sources = [(GL_VERTEX_SHADER, vert_source),
+                   (GL_GEOMETRY_SHADER, geom_source),
+                   (GL_FRAGMENT_SHADER, frag_source)]
+        sources = [(kind, rewrite_uniform_blocks(source))
+                   for kind, source in sources if source is not None]
+
         prog = cls()
-        prog.update(VertexShader(source=sdef.vert_shader),
-                    GeometryShader(source=sdef.geom_shader),
-                    FragmentShader(source=sdef.frag_shader))
-        print_source(sdef.vert_shader)
-        print('---')
-        print_source(sdef.geom_shader)
-        print('---')
-        print_source(sdef.frag_shader)
+        key = None
+        if program_binaries_supported():
+            key = shader_cache.program_key(
+                [source for _, source in sources], driver_identity())
+            if prog._load_binary(key, cache_dir):
+                prog._link_finished()
+                return prog
+
+        prog._start_link([SHADER_CLASSES[kind](source=source, wait=False)
+                          for kind, source in sources])
+        prog._pending = (key, cache_dir)
         return prog
 
+    def is_ready(self):
+        """Whether |finish| can complete without waiting.
+
+        Always true if the driver can't report progress.
+        """
+        if self._pending is None or not parallel_compile_supported():
+            return True
+        return bool(glGetProgramiv(self._hnd, GL_COMPLETION_STATUS_KHR))
+
+    def finish(self):
+        """Wait for the program to link and set it up.
+
+        Raises RuntimeError if a shader failed to compile or the
+        program failed to link.
+        """
+        if self._pending is None:
+            return
+        key, cache_dir = self._pending
+        self._pending = None
+        for shader in self._shaders:
+            shader.check()
+        if not glGetProgramiv(self._hnd, GL_LINK_STATUS):
+            link_log = glGetProgramInfoLog(self._hnd).decode('utf-8')
+            logging.error('glLinkProgram failed: %s', link_log)
+            raise RuntimeError('program failed to link', link_log)
+        logging.info('glGetProgramInfoLog(%d) -> %s', self._hnd,
+                     glGetProgramInfoLog(self._hnd).decode().strip())
+        self._link_finished()
+        if key is not None:
+            self._store_binary(key, cache_dir)
+
+    def delete(self):
+        """Delete the program and its shaders."""
+        if ShaderProgram._BoundProgram == self._hnd:
+            ShaderProgram._BoundProgram = None
+        for shader in self._shaders:
+            shader.delete()
+        glDeleteProgram(self._hnd)
+
+    def _load_binary(self, key, cache_dir):
+        cached = shader_cache.load_program_binary(key, cache_dir)
+        if cached is None:
+            return False
+        binary_format, binary = cached
+        glProgramBinary(self._hnd, binary_format, binary, len(binary))
+        if glGetProgramiv(self._hnd, GL_LINK_STATUS):
+            logging.info('glProgramBinary(%d) loaded %s', self._hnd, key)
+            return True
+        # E.g. a driver update that didn't change the version string
+        logging.info('glProgramBinary(%d) rejected %s', self._hnd, key)
+        shader_cache.discard_program_binary(key, cache_dir)
+        return False
+
+    def _store_binary(self, key, cache_dir):
+        # pylint: disable=assignment-from-no-return
+        length = glGetProgramiv(self._hnd, GL_PROGRAM_BINARY_LENGTH)
+        if not length:
+            return
+        size = GLsizei()
+        binary_format = GLenum()
+        binary = (ctypes.c_ubyte * length)()
+        glGetProgramBinary(self._hnd, length, size, binary_format, binary)
+        shader_cache.store_program_binary(key, binary_format.value,
+                                          bytes(binary[:size.value]),
+                                          cache_dir)
+
     def _alloc(self):
         # pylint: disable=assignment-from-no-return
         self._hnd = glCreateProgram()
@@ -169,9 +361,20 @@ class ShaderProgram:
         if self._hnd == 0:
             raise ValueError('glCreateProgram failed')
 
+    def use(self):
+        """Make this the current program.
+
+        Returns False if it already was and no GL call was made.
+        """
+        if ShaderProgram._BoundProgram == self._hnd:
+            return False
+        glUseProgram(self._hnd)
+        ShaderProgram._BoundProgram = self._hnd
+        return True
+
     @contextmanager
     def bind(self):
-        glUseProgram(self._hnd)
+        self.use()
         try:
             yield
         finally:
@@ -179,45 +382,128 @@ class ShaderProgram:
 
     def bind_attributes(self, buffer_objects, attribute_inputs):
         # TODO
-        for attr_name, attr_index in self._attributes.items():
+        for attr_name, attr_index in self._attribute_locations.items():
             data = attribute_inputs[attr_name]
             bufname = data['buffer']
             buf = buffer_objects[bufname]
 
-            buf.bind()
-            glEnableVertexAttribArray(attr_index)
             # TODO
             buf.bind_to_attribute(attr_index, data['buffer_view'])
 
-    def bind_uniforms(self, uniforms):
-        for uniform_name, uniform_index in self._uniforms.items():
-            uniform = uniforms[uniform_name]
-            if uniform is None:
-                raise KeyError(uniform_name)
+    def resolve_uniforms(self, *uniform_maps):
+        """Find the |Uniform| of each of the program's uniforms.
+
+        Each uniform is looked up in |uniform_maps| in order. Returns
+        the bindings for |bind_uniforms|, a list of (location, setter,
+        uniform). They stay valid while the maps hold the same objects
+        (uniforms are updated in place), and must be resolved again
+        when a map gains or replaces an entry or the program changes.
+
+        Uniforms found in no map (e.g. samplers left at their default)
+        are left out, each is logged once.
+        """
+        bindings = []
+        for uniform_name, location, setter in self._uniform_table:
+            for uniforms in uniform_maps:
+                uniform = uniforms.get(uniform_name)
+                if uniform is not None:
+                    bindings.append((location, setter, uniform))
+                    break
             else:
-                uniform.bind(uniform_index)
+                if uniform_name not in self._unresolved:
+                    self._unresolved.add(uniform_name)
+                    logging.warning('uniform %s of program %s is not set',
+                                    uniform_name, self._hnd)
+        return bindings
+
+    def bind_uniforms(self, bindings):
+        """Set the program's uniforms, see |resolve_uniforms|.
+
+        Uniforms whose value hasn't changed since they were last set
+        are skipped: first by version, then, for a new version, by
+        comparing values. The program must be in use. Returns the
+        number of (set, skipped, compared) uniforms, where compared
+        counts the value comparisons.
+        """
+        num_set = 0
+        num_skipped = 0
+        num_compared = 0
+        uniform_values = self._uniform_values
+        for location, setter, uniform in bindings:
+            last = uniform_values[location]
+            if last is not None and last[0] == uniform.version:
+                num_skipped += 1
+                continue
+            value_key = uniform.value_key()
+            if last is not None:
+                num_compared += 1
+                if last[1] == value_key:
+                    uniform_values[location] = (uniform.version, value_key)
+                    num_skipped += 1
+                    continue
+            setter(location, uniform.value)
+            uniform_values[location] = (uniform.version, value_key)
+            num_set += 1
+        return num_set, num_skipped, num_compared
 
     def update(self, *shaders):
         # TODO: for now this is actually create, not update
+        self._start_link(shaders)
+        self._pending = (None, None)
+        self.finish()
+
+    def _start_link(self, shaders):
         self._shaders += shaders
 
         for shader in self._shaders:
             glAttachShader(self._hnd, shader.hnd)
+        if program_binaries_supported():
+            glProgramParameteri(self._hnd,
+                                GL_PROGRAM_BINARY_RETRIEVABLE_HINT, GL_TRUE)
         logging.info('glLinkProgram(%d)', self._hnd)
         glLinkProgram(self._hnd)
-        logging.info('glGetProgramInfoLog(%d) -> %s', self._hnd,
-                     glGetProgramInfoLog(self._hnd).decode().strip())
 
-        self._uniforms = {}
-        self._attributes = bidict()
-        for shader in self._shaders:
-            for name in shader.uniforms():
-                self._uniforms[name] = glGetUniformLocation(self._hnd, name)
-            for name, location in shader.attributes():
-                if location in self._attributes.inv:
-                    raise KeyError('duplication attribute location', location,
-                                   name)
-                self._attributes[name] = location
+    def _link_finished(self):
+        """Set up the linked program and reflect its interface."""
+        for block in UNIFORM_BLOCKS:
+            block_index = glGetUniformBlockIndex(self._hnd, block.name)
+            if block_index != GL_INVALID_INDEX:
+                glUniformBlockBinding(self._hnd, block_index, block.binding)
+
+        self._uniforms = reflect_uniforms(self._hnd)
+        self._attributes = reflect_attributes(self._hnd)
+        self._uniform_table = []
+        for info in self._uniforms:
+            # Uniforms in blocks and built-ins such as gl_DepthRange
+            # have no location
+            if info.block_index != -1 or info.location < 0:
+                continue
+            setter = uniform_setter(info.gl_type, info.size)
+            if setter is None:
+                logging.warning('skipping uniform %s of unsupported type '
+                                '0x%x', info.name, info.gl_type)
+                continue
+            self._uniform_table.append((info.name, info.location, setter))
+        num_locations = max((location for _, location, _
+                             in self._uniform_table), default=-1) + 1
+        self._uniform_values = [None] * num_locations
+        self._unresolved = set()
+        self._attribute_locations = bidict()
+        for info in self._attributes:
+            if info.location in self._attribute_locations.inv:
+                raise KeyError('duplication attribute location',
+                               info.location, info.name)
+            self._attribute_locations[info.name] = info.location
+
+    @property
+    def uniforms(self):
+        """|UniformInfo| of each active uniform."""
+        return self._uniforms
+
+    @property
+    def attributes(self):
+        """|AttributeInfo| of each active attribute."""
+        return self._attributes
 
     @property
     def handle(self):
@@ -0,0 +1,200 @@
+"""On-disk cache of translated shaders and linked program binaries.
+
+Entries are content addressed: the file name is a hash of everything
+the entry depends on, so stale entries are never found, they're just
+left unused.
+
+    <key>.glsl.json   translated shaderdef material, a JSON object
+                      with the vert_shader, geom_shader and
+                      frag_shader GLSL sources
+    <key>.belprog     linked program binary: magic b'BELPROG\\0',
+                      uint32 version, uint32 binary format, then the
+                      binary as returned by glGetProgramBinary
+
+Program binaries are only valid for the driver that created them, the
+driver identity is part of their key. Drivers may still reject a
+binary (e.g. after an update that kept the version string), callers
+must fall back to compiling.
+"""
+
+from collections import namedtuple
+from glob import glob
+from hashlib import sha1
+import importlib
+import importlib.util
+import json
+from logging import getLogger
+import os
+import struct
+from tempfile import NamedTemporaryFile
+
+from bel.caches import cache_subdir
+
+LOG = getLogger(__name__)
+
+MAGIC = b'BELPROG\0'
+VERSION = 1
+
+_HEADER = struct.Struct('<8sII')
+
+TranslatedMaterial = namedtuple('TranslatedMaterial',
+                                ('vert_shader', 'geom_shader', 'frag_shader'))
+
+
+def default_cache_dir():
+    """Directory used to cache shaders, see |cache_subdir|."""
+    return cache_subdir('shaders')
+
+
+def content_key(*parts):
+    """Hash the string |parts| into a cache key."""
+    digest = sha1()
+    for part in parts:
+        data = part.encode('utf-8')
+        # Length-prefixed so ('ab', 'c') and ('a', 'bc') differ
+        digest.update(struct.pack('<Q', len(data)))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def _entry_path(key, suffix, cache_dir):
+    if cache_dir is None:
+        cache_dir = default_cache_dir()
+    return os.path.join(cache_dir, key + suffix)
+
+
+def _write_atomic(path, data):
+    """Write |data| to a temporary name and rename it into place."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    wfile = NamedTemporaryFile(dir=os.path.dirname(path), delete=False)
+    try:
+        with wfile:
+            wfile.write(data)
+        os.replace(wfile.name, path)
+    finally:
+        if os.path.exists(wfile.name):
+            os.unlink(wfile.name)
+
+
+def cached_translation(key, translate, cache_dir=None):
+    """Get a translated material, running |translate| on a miss.
+
+    key: hash of everything the translation depends on, see
+         |content_key|
+
+    translate: callable returning an object with vert_shader,
+               geom_shader and frag_shader GLSL sources
+
+    Returns a |TranslatedMaterial|.
+    """
+    path = _entry_path(key, '.glsl.json', cache_dir)
+    try:
+        with open(path) as rfile:
+            return TranslatedMaterial(**json.load(rfile))
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, TypeError) as err:
+        LOG.warning('ignoring bad shader cache entry %s: %s', path, err)
+
+    sdef = translate()
+    material = TranslatedMaterial(vert_shader=sdef.vert_shader,
+                                  geom_shader=sdef.geom_shader,
+                                  frag_shader=sdef.frag_shader)
+    try:
+        _write_atomic(path, json.dumps(material._asdict()).encode('utf-8'))
+    except OSError as err:
+        LOG.warning('failed to write shader cache entry %s: %s', path, err)
+    return material
+
+
+def package_fingerprint(name):
+    """Identify the installed version of package |name|.
+
+    The package isn't imported, the fingerprint is made of the path,
+    size and modification time of its source files (like the check
+    for stale bytecode). Returns '' if it isn't installed.
+    """
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        return ''
+    if spec.submodule_search_locations:
+        paths = sorted(path
+                       for location in spec.submodule_search_locations
+                       for path in glob(os.path.join(location, '**', '*.py'),
+                                        recursive=True))
+    else:
+        paths = [spec.origin]
+    parts = []
+    for path in paths:
+        stat = os.stat(path)
+        parts.append('{} {} {}'.format(path, stat.st_size, stat.st_mtime_ns))
+    return '\n'.join(parts)
+
+
+def cached_material(module_name, cache_dir=None):
+    """Get the translated GLSL of a shaderdef material module.
+
+    The module must have a translate() function returning a
+    translated ShaderDef. It is keyed on the module's source and the
+    installed shaderdef, and only imported (along with shaderdef) on
+    a cache miss.
+
+    Returns a |TranslatedMaterial|.
+    """
+    spec = importlib.util.find_spec(module_name)
+    with open(spec.origin) as rfile:
+        source = rfile.read()
+    key = content_key(source, package_fingerprint('shaderdef'))
+
+    def translate():
+        return importlib.import_module(module_name).translate()
+
+    return cached_translation(key, translate, cache_dir)
+
+
+def program_key(sources, driver):
+    """Cache key of a program linked from GLSL |sources| by |driver|.
+
+    driver: string identifying the GL implementation, e.g. vendor,
+            renderer and version joined together
+    """
+    return content_key(driver, *sources)
+
+
+def load_program_binary(key, cache_dir=None):
+    """Get the cached (binary_format, binary) for |key|, or None."""
+    path = _entry_path(key, '.belprog', cache_dir)
+    try:
+        with open(path, 'rb') as rfile:
+            data = rfile.read()
+    except FileNotFoundError:
+        return None
+    except OSError as err:
+        LOG.warning('ignoring bad program cache entry %s: %s', path, err)
+        return None
+    if len(data) < _HEADER.size:
+        LOG.warning('ignoring truncated program cache entry %s', path)
+        return None
+    magic, version, binary_format = _HEADER.unpack(data[:_HEADER.size])
+    if magic != MAGIC or version != VERSION:
+        LOG.warning('ignoring bad program cache entry %s', path)
+        return None
+    return binary_format, data[_HEADER.size:]
+
+
+def store_program_binary(key, binary_format, binary, cache_dir=None):
+    """Cache a linked program binary, logging rather than raising."""
+    path = _entry_path(key, '.belprog', cache_dir)
+    try:
+        _write_atomic(path, _HEADER.pack(MAGIC, VERSION, binary_format) +
+                      bytes(binary))
+    except OSError as err:
+        LOG.warning('failed to write program cache entry %s: %s', path, err)
+
+
+def discard_program_binary(key, cache_dir=None):
+    """Remove an entry the driver rejected."""
+    try:
+        os.unlink(_entry_path(key, '.belprog', cache_dir))
+    except OSError:
+        pass
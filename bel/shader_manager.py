@@ -0,0 +1,150 @@
+"""Builds shader programs in the background and reloads changed ones."""
+
+from collections import OrderedDict
+from logging import getLogger
+import os
+import time
+
+from bel.shader import ShaderProgram, read_sources
+from bel.shader_cache import cached_material
+
+LOG = getLogger(__name__)
+
+# Seconds between checks for finished programs and changed files
+POLL_INTERVAL = 0.25
+
+
+def _mtimes(paths):
+    """Modification times of |paths|, None for missing files.
+
+    None paths are skipped.
+    """
+    mtimes = []
+    for path in paths:
+        if path is None:
+            continue
+        try:
+            mtimes.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            # E.g. an editor replacing the file
+            mtimes.append(None)
+    return tuple(mtimes)
+
+
+class ShaderManager:
+    """Creates shader programs without stalling on the driver compiler.
+
+    |add_files| and |add_material| only submit programs, so the driver
+    can compile all of them in parallel. |poll| installs programs in
+    the draw state once they're ready. Until then, a program that is
+    being rebuilt keeps drawing with its previous version, and a build
+    that fails is logged and leaves the previous version in place.
+
+    With |watch| set, |poll| also rebuilds file programs whose source
+    files changed.
+    """
+    def __init__(self, draw_state, cache_dir=None,
+                 program_class=ShaderProgram, clock=time.monotonic):
+        """Create a manager.
+
+        cache_dir: see |shader_cache.default_cache_dir|
+
+        program_class: class with |ShaderProgram.start|
+
+        clock: callable returning the current time in seconds
+        """
+        self.watch = False
+        self._draw_state = draw_state
+        self._cache_dir = cache_dir
+        self._program_class = program_class
+        self._clock = clock
+        # Material uid -> program not yet installed
+        self._pending = OrderedDict()
+        # Material uid -> (source paths, their modification times)
+        self._files = OrderedDict()
+        self._last_check = None
+
+    @property
+    def num_pending(self):
+        return len(self._pending)
+
+    def add_files(self, uid, vert_path, frag_path, geom_path=None):
+        """Build material |uid| from GLSL files."""
+        paths = (vert_path, frag_path, geom_path)
+        self._files[uid] = (paths, _mtimes(paths))
+        self._submit_files(uid, paths)
+
+    def add_material(self, uid, module_name):
+        """Build material |uid| from a shaderdef material module.
+
+        See |shader_cache.cached_material|.
+        """
+        material = cached_material(module_name, self._cache_dir)
+        self._submit(uid, material.vert_shader, material.frag_shader,
+                     material.geom_shader)
+
+    def _submit_files(self, uid, paths):
+        try:
+            sources = read_sources(*paths)
+        except OSError as err:
+            LOG.error('failed to read shaders of %r: %s', uid, err)
+            return
+        self._submit(uid, *sources)
+
+    def _submit(self, uid, vert_source, frag_source, geom_source):
+        program = self._program_class.start(vert_source, frag_source,
+                                            geom_source, self._cache_dir)
+        superseded = self._pending.pop(uid, None)
+        if superseded is not None:
+            superseded.delete()
+        self._pending[uid] = program
+
+    def wait_timeout(self):
+        """Seconds until |poll| may have work, None if never."""
+        if self._pending or (self.watch and self._files):
+            return POLL_INTERVAL
+        return None
+
+    def poll(self):
+        """Install ready programs and rebuild changed ones.
+
+        Returns True if a program of the draw state was replaced.
+        """
+        if self.watch:
+            self._check_files()
+        changed = False
+        for uid, program in list(self._pending.items()):
+            if program.is_ready():
+                del self._pending[uid]
+                changed |= self._install(uid, program)
+        return changed
+
+    def finish_all(self):
+        """Wait for all pending programs and install them."""
+        for uid, program in list(self._pending.items()):
+            del self._pending[uid]
+            self._install(uid, program)
+
+    def _install(self, uid, program):
+        try:
+            program.finish()
+        except RuntimeError as err:
+            LOG.error('failed to build shader program %r: %s', uid, err)
+            program.delete()
+            return False
+        self._draw_state.update_shader_program(uid, program)
+        return True
+
+    def _check_files(self):
+        now = self._clock()
+        if (self._last_check is not None and
+                now - self._last_check < POLL_INTERVAL):
+            return
+        self._last_check = now
+        for uid, (paths, mtimes) in list(self._files.items()):
+            new_mtimes = _mtimes(paths)
+            # Wait for missing files to be written back
+            if new_mtimes != mtimes and None not in new_mtimes:
+                self._files[uid] = (paths, new_mtimes)
+                LOG.info('reloading shader program %r', uid)
+                self._submit_files(uid, paths)
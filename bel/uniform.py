@@ -1,24 +1,153 @@
-from OpenGL.GL import glUniformMatrix4fv, glUniform2fv, glUniform4fv
+import re
+
+import numpy
+
+from bel.versions import VersionCounter
+
+# GLSL type -> (base alignment, size) in bytes under the std140 layout
+STD140_LAYOUT = {
+    'float': (4, 4),
+    'vec2': (8, 8),
+    'vec3': (16, 12),
+    'vec4': (16, 16),
+    'mat4': (16, 64),
+}
+
+_UNIFORM_DECLARATION = re.compile(
+    r'^[ \t]*uniform[ \t]+(\w+)[ \t]+(\w+)[ \t]*;[ \t]*(\n|$)', re.MULTILINE)
+
+# Source of uniform versions, unique across all uniforms
+_VERSIONS = VersionCounter()
+
+
+def latest_version():
+    """Version of the most recently changed uniform."""
+    return _VERSIONS.latest
 
-class MatrixUniform:
-    def __init__(self, data):
-        self._data = data
 
-    def bind(self, uniform_location):
-        count = 1
-        transpose = False
-        glUniformMatrix4fv(uniform_location, count, transpose, self._data)
+class Uniform:
+    """Value of a uniform.
 
+    Each value has a |version| that is unique across all uniforms, so
+    a program that remembers the version it last uploaded to a
+    location can skip an upload without comparing values. The value
+    is copied, use |set| to change it.
 
-class VectorUniform:
+    Programs upload it with the setter they reflected for the
+    uniform's type, see |reflection.uniform_setter|.
+    """
     def __init__(self, data):
-        self._data = data
-
-    def bind(self, uniform_location):
-        count = 1
-        if len(self._data) == 2:
-            glUniform2fv(uniform_location, count, self._data)
-        elif len(self._data) == 4:
-            glUniform4fv(uniform_location, count, self._data)
-        else:
-            raise NotImplementedError(self._data)
+        self._data = numpy.array(data, numpy.float32)
+        self.version = next(_VERSIONS)
+
+    @property
+    def value(self):
+        return self._data
+
+    def set(self, data):
+        """Replace the value; the version only changes if the value does."""
+        data = numpy.array(data, numpy.float32)
+        if not numpy.array_equal(data, self._data):
+            self._data = data
+            self.version = next(_VERSIONS)
+
+    def value_key(self):
+        """Hashable snapshot of the value, equal for equal values."""
+        return self._data.tobytes()
+
+
+class MatrixUniform(Uniform):
+    pass
+
+
+class VectorUniform(Uniform):
+    pass
+
+
+class UniformBlock:
+    """Named std140 uniform block backed by a uniform buffer.
+
+    Shaders keep declaring the members as plain uniforms,
+    |rewrite_source| moves those declarations into the block. The
+    values of all members are then uploaded together with |pack| and
+    shared by every program through the block's binding point.
+    """
+    def __init__(self, name, binding, fields):
+        """Create a block layout.
+
+        name: GLSL block name
+
+        binding: uniform buffer binding point
+
+        fields: sequence of (glsl_type, member_name) pairs
+        """
+        self.name = name
+        self.binding = binding
+        self.fields = tuple(fields)
+        self.offsets = {}
+        offset = 0
+        for glsl_type, member_name in self.fields:
+            alignment, size = STD140_LAYOUT[glsl_type]
+            offset = -(-offset // alignment) * alignment
+            self.offsets[member_name] = offset
+            offset += size
+        # The block size is rounded up to a vec4
+        self.size = -(-offset // 16) * 16
+
+    def declaration(self):
+        members = ''.join('    {} {};\n'.format(glsl_type, member_name)
+                          for glsl_type, member_name in self.fields)
+        return 'layout(std140) uniform {} {{\n{}}};\n'.format(self.name,
+                                                            members)
+
+    def rewrite_source(self, source):
+        """Replace plain declarations of the members with the block.
+
+        Declarations whose type doesn't match are left alone. Returns
+        |source| unchanged if it declares none of the members.
+        """
+        fields = set(self.fields)
+        found = []
+
+        def remove(match):
+            if (match.group(1), match.group(2)) in fields:
+                found.append(match.group(2))
+                return ''
+            return match.group(0)
+
+        rewritten = _UNIFORM_DECLARATION.sub(remove, source)
+        if not found:
+            return source
+
+        # The block goes right after the #version line, if any
+        lines = rewritten.splitlines(True)
+        insert_at = 0
+        if lines and lines[0].lstrip().startswith('#version'):
+            insert_at = 1
+        lines.insert(insert_at, self.declaration())
+        return ''.join(lines)
+
+    def pack(self, values):
+        """Get the block contents for the member |values| dict.
+
+        Matrices are stored in the same memory order that
+        glUniformMatrix4fv is given them. Missing members are zero.
+        """
+        data = numpy.zeros(self.size // 4, numpy.float32)
+        for _, member_name in self.fields:
+            value = values.get(member_name)
+            if value is not None:
+                value = numpy.asarray(value, numpy.float32).ravel()
+                start = self.offsets[member_name] // 4
+                data[start:start + len(value)] = value
+        return data
+
+
+# Per-frame data shared by all programs. The model matrix stays a
+# plain uniform since it's different for each draw.
+VIEW_BLOCK = UniformBlock('View', 0, (('mat4', 'projection'),
+                                      ('mat4', 'camera'),
+                                      ('vec2', 'fb_size')))
+
+# Blocks that shaders are rewritten to use
+UNIFORM_BLOCKS = (VIEW_BLOCK,)
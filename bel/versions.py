@@ -0,0 +1,18 @@
+"""Counters handing out unique version numbers."""
+
+
+class VersionCounter:
+    """Like itertools.count, but the last number handed out is readable.
+
+    |latest| changes whenever anything numbered by the counter does,
+    which makes it a cheap way to notice that something changed.
+    """
+    def __init__(self, start=1):
+        self.latest = start - 1
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self.latest += 1
+        return self.latest
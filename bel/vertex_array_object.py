@@ -5,6 +5,13 @@ class VertexArrayObject:
 
     def __init__(self):
         self._hnd = glGenVertexArrays(1)
+        # Identifies the attribute setup recorded in the object, None
+        # if nothing has been recorded yet
+        self.recorded_key = None
+
+    @property
+    def handle(self):
+        return self._hnd
 
     def bind(self):
         if self._hnd != VertexArrayObject._BoundVertexArrayObject:
@@ -1,4 +1,5 @@
 from logging import getLogger
+import time
 
 from cyglfw3.compatible import (GLFW_CONTEXT_VERSION_MAJOR,
                                 GLFW_CONTEXT_VERSION_MINOR,
@@ -12,22 +13,32 @@ from cyglfw3.compatible import (GLFW_CONTEXT_VERSION_MAJOR,
                                 glfwGetWindowSize,
                                 glfwInit,
                                 glfwMakeContextCurrent,
+                                glfwPollEvents,
                                 glfwSetCursorPosCallback,
                                 glfwSetErrorCallback,
+                                glfwSetFramebufferSizeCallback,
                                 glfwSetKeyCallback,
                                 glfwSetMouseButtonCallback,
+                                glfwSetWindowRefreshCallback,
                                 glfwSetWindowShouldClose,
                                 glfwSwapBuffers,
                                 glfwWaitEvents,
                                 glfwWindowHint,
                                 glfwWindowShouldClose)
+try:
+    # GLFW 3.2+
+    from cyglfw3.compatible import glfwWaitEventsTimeout
+except ImportError:
+    glfwWaitEventsTimeout = None  # pylint: disable=invalid-name
 from OpenGL.GL import GL_VERSION, glGetString
 
-from bel.default_material import default_material
+from bel.buffer_object import latest_generation
 from bel.color import Color
 from bel.event import Button, ButtonAction, MouseButtonEvent
+from bel.frame_scheduler import FrameScheduler
 from bel.gldraw import DrawState
-from bel.shader import (FragmentShader, ShaderProgram, VertexShader)
+from bel.shader_manager import ShaderManager
+from bel.uniform import latest_version
 from cgmath.vector import vec2
 
 LOG = getLogger(__name__)
@@ -57,10 +68,20 @@ class Window:
         self._window = None
         self.on_draw = lambda *args: None
         self.on_start = lambda *args: None
-        self.on_cursor_pos = lambda *args: None
-        self.on_key = lambda *args: None
-        self.on_mouse_button = lambda *args: None
+        # Input handlers return True to request a redraw for changes
+        # the frame scheduler's version sources don't track
+        self.on_cursor_pos = lambda *args: False
+        self.on_key = lambda *args: False
+        self.on_mouse_button = lambda *args: False
         self._draw_state = DrawState()
+        self.frame_scheduler = FrameScheduler()
+        # Uniforms and buffers changed outside of drawing
+        self.frame_scheduler.add_version_source(
+            lambda: (latest_version(), latest_generation()))
+        # Set shader_manager.watch to reload edited shaders
+        self.shader_manager = ShaderManager(self._draw_state)
+        # Latest cursor position not yet passed to on_cursor_pos
+        self._pending_cursor_loc = None
         self._init_glfw(width, height)
 
     def close(self):
@@ -70,6 +91,10 @@ class Window:
     def draw_state(self):
         return self._draw_state
 
+    def request_redraw(self):
+        """Draw a frame soon, e.g. after changing the scene."""
+        self.frame_scheduler.request_redraw()
+
     @staticmethod
     def _cb_glfw_error(error, description):
         LOG.error('GLFW error: %d %s', error, description)
@@ -79,17 +104,34 @@ class Window:
         width, height = glfwGetWindowSize(window)
         loc = vec2((2.0 * xpos) / width - 1.0,
                    1.0 - (2.0 * ypos) / height)
-        self.on_cursor_pos(loc)
+        # Bursts of cursor events are coalesced, only the latest
+        # position is handled once the events are processed
+        self._pending_cursor_loc = loc
+
+    def _dispatch_cursor_pos(self):
+        loc = self._pending_cursor_loc
+        if loc is not None:
+            self._pending_cursor_loc = None
+            if self.on_cursor_pos(loc):
+                self.request_redraw()
 
     def _cb_key(self, window, key, scancode, action, mods):
         # pylint: disable=too-many-arguments
-        self.on_key(key, scancode, action, mods)
+        if self.on_key(key, scancode, action, mods):
+            self.request_redraw()
 
     def _cb_mouse_button(self, window, button, action, mods):
         event = MouseButtonEvent(button_from_glfw(button),
                                  button_action_from_glfw(action))
 
-        self.on_mouse_button(event)
+        # Handlers see the cursor position the button was pressed at
+        self._dispatch_cursor_pos()
+        if self.on_mouse_button(event):
+            self.request_redraw()
+
+    def _cb_redraw(self, window, *args):
+        # pylint: disable=unused-argument
+        self.request_redraw()
 
     def _init_glfw(self, width, height):
         if not glfwInit():
@@ -108,6 +150,8 @@ class Window:
         glfwSetCursorPosCallback(self._window, self._cb_cursor_pos)
         glfwSetKeyCallback(self._window, self._cb_key)
         glfwSetMouseButtonCallback(self._window, self._cb_mouse_button)
+        glfwSetFramebufferSizeCallback(self._window, self._cb_redraw)
+        glfwSetWindowRefreshCallback(self._window, self._cb_redraw)
 
         glfwMakeContextCurrent(self._window)
         LOG.info('GL_VERSION: %s', glGetString(GL_VERSION).decode())
@@ -118,15 +162,15 @@ class Window:
         self._add_default_materials()
 
     def _add_default_materials(self):
-        # TODO
-        default = ShaderProgram.from_material(default_material())
-
-        flat = ShaderProgram()
-        flat.update(
-            VertexShader('shaders/flat.vert.glsl'),
-            FragmentShader('shaders/flat.frag.glsl'))
-        self._draw_state.update_shader_program('default', default)
-        self._draw_state.update_shader_program('flat', flat)
+        manager = self.shader_manager
+        manager.add_material('default', 'bel.default_material')
+        manager.add_files('flat', 'shaders/flat.vert.glsl',
+                          'shaders/flat.frag.glsl')
+        manager.add_files('instanced', 'shaders/instanced.vert.glsl',
+                          'shaders/instanced.frag.glsl')
+        # Everything was submitted before waiting, so the driver can
+        # compile the programs in parallel
+        manager.finish_all()
 
     def set_clear_color(self, color: Color):
         self._draw_state.clear_color = color
@@ -137,13 +181,39 @@ class Window:
 
         self._draw_state.draw_all()
 
+    @staticmethod
+    def _wait_events(timeout):
+        if timeout is None:
+            glfwWaitEvents()
+        elif timeout <= 0:
+            glfwPollEvents()
+        elif glfwWaitEventsTimeout is not None:
+            glfwWaitEventsTimeout(timeout)
+        else:
+            # Can't wake up early on events, so latency is up to one
+            # frame interval
+            time.sleep(timeout)
+            glfwPollEvents()
+
+    def _wait_timeout(self):
+        timeouts = [timeout for timeout in
+                    (self.frame_scheduler.wait_timeout(),
+                     self.shader_manager.wait_timeout())
+                    if timeout is not None]
+        return min(timeouts) if timeouts else None
+
     def run(self):
-        running = True
-        while running:
+        scheduler = self.frame_scheduler
+        while not glfwWindowShouldClose(self._window):
+            self._wait_events(self._wait_timeout())
+            self._dispatch_cursor_pos()
+            if self.shader_manager.poll():
+                self.request_redraw()
+            if not scheduler.frame_due():
+                continue
+
             glfwMakeContextCurrent(self._window)
+            scheduler.begin_frame()
             self._draw()
             glfwSwapBuffers(self._window)
-            glfwWaitEvents()
-
-            if glfwWindowShouldClose(self._window):
-                running = False
+            scheduler.end_frame()
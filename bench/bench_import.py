@@ -0,0 +1,107 @@
+"""Benchmark import time of the bel package.
+
+Each module is imported in fresh interpreters run with
+"python -X importtime" (Python 3.7+). Modules already imported at
+interpreter startup are left out, so the total is the cost of the
+import statement itself. A warm-up import first makes sure bytecode
+is compiled; the best of the repeats is compared against |BUDGETS|.
+
+Exits with status 1 if a module is over its budget or fails to import.
+The gate needs a Python 3.7+ interpreter: older ones silently ignore
+-X importtime, which is reported as a failure rather than as 0 ms.
+
+Usage: python -m bench.bench_import [repeat]
+"""
+
+from collections import namedtuple
+import os
+import re
+import subprocess
+import sys
+
+# Maximum import time in milliseconds
+BUDGETS = (
+    ('cgmath.affine', 250),
+    ('bel.mesh', 300),
+    ('bel.window', 1000),
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ImportTime = namedtuple('ImportTime', ('name', 'self_us', 'cumulative_us',
+                                       'depth'))
+
+_LINE_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+
+def import_times(statement):
+    """Run |statement| in a fresh interpreter.
+
+    Returns a list of |ImportTime|, one per module imported, in the
+    order -X importtime reports them (children before parents).
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                             statement],
+                            cwd=ROOT, stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    if result.returncode != 0:
+        raise ImportError(result.stderr.strip().splitlines()[-1])
+    times = []
+    for line in result.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            times.append(ImportTime(name, int(self_us), int(cumulative_us),
+                                    len(indent) // 2))
+    return times
+
+
+def measure(module, startup):
+    """Get (total_us, times) of importing |module|.
+
+    startup: names of the modules imported at interpreter startup
+    """
+    times = [entry for entry in import_times('import ' + module)
+             if entry.name not in startup]
+    total_us = sum(entry.cumulative_us for entry in times
+                   if entry.depth == 0)
+    return total_us, times
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    startup = import_times('pass')
+    if not startup:
+        print('no -X importtime output, Python 3.7+ is required')
+        sys.exit(1)
+    startup = set(entry.name for entry in startup)
+
+    failed = False
+    for module, budget_ms in BUDGETS:
+        try:
+            measure(module, startup)
+            runs = [measure(module, startup) for _ in range(repeat)]
+        except ImportError as err:
+            print('{:14} import failed: {}'.format(module, err))
+            failed = True
+            continue
+        if not all(times for _, times in runs):
+            print('{:14} no import times measured'.format(module))
+            failed = True
+            continue
+        total_us, times = min(runs, key=lambda run: run[0])
+        total_ms = total_us / 1e3
+        over = total_ms > budget_ms
+        failed |= over
+        print('{:14} {:8.1f} ms  budget {:6} ms  {}'.format(
+            module, total_ms, budget_ms, 'OVER' if over else 'ok'))
+        slowest = sorted(times, key=lambda entry: entry.self_us)[-5:]
+        for entry in reversed(slowest):
+            print('  {:30} {:8.1f} ms'.format(entry.name,
+                                              entry.self_us / 1e3))
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Benchmark the OBJ reader on scaled-up copies of examples/*.obj.
+
+Each example is tiled into a synthetic file with many copies of the
+mesh (faces alternate between plain and "v/vt/vn" tokens) and read
+with both |bel.obj.read_obj| and a line-by-line reference loader.
+
+Usage: python -m bench.bench_obj [copies]
+"""
+
+from glob import glob
+import os
+import sys
+from tempfile import TemporaryDirectory
+import time
+import tracemalloc
+
+import numpy
+
+from bel.obj import read_obj
+
+
+def reference_read_obj(path):
+    """Line-by-line loader equivalent to the original Mesh.load_obj."""
+    locs = []
+    face_vert_indices = []
+    face_offsets = [0]
+    with open(path) as rfile:
+        for line in rfile:
+            line = line.split('#', 1)[0]
+            parts = line.split()
+            if len(parts) == 0:
+                continue
+            if parts[0] == 'v':
+                loc = [0.0, 0.0, 0.0]
+                for axis, part in enumerate(parts[1:4]):
+                    loc[axis] = float(part)
+                locs.append(loc)
+            elif parts[0] == 'f':
+                face_vert_indices += (int(tok.split('/')[0]) - 1
+                                      for tok in parts[1:])
+                face_offsets.append(len(face_vert_indices))
+    return (numpy.array(locs, numpy.float32),
+            numpy.array(face_vert_indices, numpy.int32),
+            numpy.array(face_offsets, numpy.int32))
+
+
+def write_scaled_obj(src_path, dst_path, copies):
+    """Write |copies| translated copies of the mesh at |src_path|."""
+    locs, face_vert_indices, face_offsets = read_obj(src_path)
+    with open(dst_path, 'w') as wfile:
+        wfile.write('vt 0 0\nvn 0 0 1\n')
+        for copy in range(copies):
+            wfile.write('o copy{}\n'.format(copy))
+            for loc in locs + copy * 3.0:
+                wfile.write('v {:.6f} {:.6f} {:.6f}\n'.format(*loc))
+            first = copy * len(locs) + 1
+            for face in range(len(face_offsets) - 1):
+                corners = face_vert_indices[
+                    face_offsets[face]:face_offsets[face + 1]] + first
+                fmt = '{}/1/1' if face % 2 else '{}'
+                wfile.write('f ' + ' '.join(fmt.format(corner)
+                                            for corner in corners) + '\n')
+
+
+def measure(func, path):
+    """Get (seconds, peak traced bytes, result) for func(path)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(path)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def main():
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    with TemporaryDirectory() as tmp_dir:
+        for src_path in sorted(glob('examples/*.obj')):
+            dst_path = os.path.join(tmp_dir, os.path.basename(src_path))
+            write_scaled_obj(src_path, dst_path, copies)
+            size_mb = os.path.getsize(dst_path) / 1e6
+
+            fast = measure(read_obj, dst_path)
+            ref = measure(reference_read_obj, dst_path)
+            for arr0, arr1 in zip(fast[2], ref[2]):
+                assert numpy.array_equal(arr0, arr1)
+
+            print('{} x{} ({:.1f} MB, {} verts)'.format(
+                src_path, copies, size_mb, len(fast[2][0])))
+            for name, (elapsed, peak, _) in (('read_obj', fast),
+                                             ('reference', ref)):
+                print('  {:10} {:8.3f} s {:8.1f} MB peak'.format(
+                    name, elapsed, peak / 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Benchmark batched ray-triangle intersection against the scalar path.
+
+A ray is intersected with N random small triangles, once with a loop
+over |ray_triangle_intersect_tuv| and once with a single call to
+|ray_triangles_intersect|. Batches of rays are also timed with
+|rays_triangles_intersect|.
+
+Usage: python -m bench.bench_ray [num_triangles]
+"""
+
+import sys
+import time
+
+import numpy
+
+from cgmath.ray import Ray
+from cgmath.ray_triangle_intersect import (ray_triangle_intersect_tuv,
+                                           ray_triangles_intersect,
+                                           rays_triangles_intersect)
+
+
+def random_triangles(rng, count):
+    """Small triangles scattered in a cube, so most tests miss."""
+    corners = rng.uniform(-10, 10, (count, 1, 3))
+    return corners + rng.uniform(-1, 1, (count, 3, 3))
+
+
+def best_time(func, repeat=5):
+    """Best of |repeat| runs of func(), in seconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    num_tris = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    rng = numpy.random.RandomState(0)
+    triangles = random_triangles(rng, num_tris)
+    ray = Ray(origin=numpy.array((0.0, 0.0, -20.0)),
+              direction=numpy.array((0.01, 0.02, 1.0)))
+
+    def scalar():
+        return [ray_triangle_intersect_tuv(ray, tri) for tri in triangles]
+
+    def batched():
+        return ray_triangles_intersect(ray, triangles)
+
+    scalar_hits = sum(hit is not None for hit in scalar())
+    batched_hits = int(numpy.isfinite(batched()[0]).sum())
+    assert scalar_hits == batched_hits
+
+    print('1 ray x {} triangles ({} hits)'.format(num_tris, scalar_hits))
+    scalar_time = best_time(scalar, repeat=1)
+    batched_time = best_time(batched)
+    print('  {:10} {:10.3f} ms'.format('scalar', scalar_time * 1e3))
+    print('  {:10} {:10.3f} ms ({:.0f}x)'.format(
+        'batched', batched_time * 1e3, scalar_time / batched_time))
+
+    num_rays = 64
+    num_batch_tris = max(num_tris // num_rays, 1)
+    origins = rng.uniform(-10, 10, (num_rays, 3))
+    directions = rng.uniform(-1, 1, (num_rays, 3))
+    batch_time = best_time(lambda: rays_triangles_intersect(
+        origins, directions, triangles[:num_batch_tris]))
+    print('{} rays x {} triangles'.format(num_rays, num_batch_tris))
+    print('  {:10} {:10.3f} ms'.format('batched', batch_time * 1e3))
+
+
+if __name__ == '__main__':
+    main()
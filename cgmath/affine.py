@@ -1,47 +1,353 @@
+"""Affine transforms and hierarchies of them."""
+
+import numpy
 from numpy import ndarray
 
-from cgmath.matrix import new_mat4
-from cgmath.vector import vec3, vec3_from_scalar
-from cgmath.quaternion import quat4f
+from cgmath.quaternion import Quat4f
+
+# Floats of local parameters per transform: location, rotation
+# quaternion (i, j, k, w) and scale
+_PARAM_FLOATS = 10
+
+
+def quaternion_matrices(quats):
+    """Get N x 3 x 3 rotation matrices from N x 4 (i, j, k, w) |quats|.
+
+    Quaternions don't have to be normalized, a zero quaternion gives
+    the identity.
+    """
+    i, j, k, w = (quats[:, axis] for axis in range(4))
+    norm_sq = numpy.einsum('ij,ij->i', quats, quats)
+    scale = numpy.divide(2.0, norm_sq, out=numpy.zeros_like(norm_sq),
+                         where=norm_sq > 0)
+    mats = numpy.empty((len(quats), 3, 3), quats.dtype)
+    mats[:, 0, 0] = 1 - scale * (j * j + k * k)
+    mats[:, 0, 1] = scale * (i * j - k * w)
+    mats[:, 0, 2] = scale * (i * k + j * w)
+    mats[:, 1, 0] = scale * (i * j + k * w)
+    mats[:, 1, 1] = 1 - scale * (i * i + k * k)
+    mats[:, 1, 2] = scale * (j * k - i * w)
+    mats[:, 2, 0] = scale * (i * k - j * w)
+    mats[:, 2, 1] = scale * (j * k + i * w)
+    mats[:, 2, 2] = 1 - scale * (i * i + j * j)
+    return mats
+
+
+def local_matrices(locs, quats, scales):
+    """Get N x 4 x 4 translate * rotate * scale matrices.
+
+    The matrices act on column vectors, i.e. the translation is in the
+    last column.
+    """
+    mats = numpy.zeros((len(locs), 4, 4), locs.dtype)
+    mats[:, :3, :3] = quaternion_matrices(quats) * scales[:, numpy.newaxis]
+    mats[:, :3, 3] = locs
+    mats[:, 3, 3] = 1
+    return mats
+
+
+class TransformHierarchy:
+    """Packed local transforms of a tree with batched world matrices.
+
+    Node parameters live in whole arrays (|locs|, |rots|, |scales|)
+    that may be edited in place. |add| may reallocate the arrays, so
+    views taken before it are only valid until a node is added.
+    |update| finds the nodes whose
+    parameters changed by comparing against the values it last saw,
+    then recomputes world matrices level by level, only for changed
+    nodes and their descendants.
+
+    World matrices act on column vectors (translation in the last
+    column), |Transform.world_matrix| converts to the convention of
+    |Transform.matrix|.
+
+    |remove| frees a node's row, |add| reuses free rows before growing
+    the arrays. Free rows are skipped by |update|.
+    """
+    def __init__(self):
+        self._count = 0
+        self._params = numpy.empty((0, _PARAM_FLOATS), numpy.float32)
+        # Parameters as of the last update, NaN for new nodes so they
+        # always compare as changed
+        self._seen_params = numpy.empty((0, _PARAM_FLOATS), numpy.float32)
+        self._parents = numpy.empty(0, numpy.int64)
+        self._depths = numpy.empty(0, numpy.int64)
+        self._local = numpy.empty((0, 4, 4), numpy.float32)
+        self._world = numpy.empty((0, 4, 4), numpy.float32)
+        self._world_versions = numpy.empty(0, numpy.int64)
+        # Counts the updates that changed a world matrix, and removals,
+        # so it only changes when the hierarchy does
+        self.update_count = 0
+        # Nodes sorted by depth and the start of each depth in that
+        # order, None after nodes are added or removed
+        self._levels = None
+        # Indices of removed rows, free rows have depth -1
+        self._free = []
+
+    def __len__(self):
+        """Number of nodes, not counting free rows."""
+        return self._count - len(self._free)
+
+    @property
+    def locs(self):
+        return self._params[:self._count, 0:3]
+
+    @property
+    def rots(self):
+        return self._params[:self._count, 3:7]
+
+    @property
+    def scales(self):
+        return self._params[:self._count, 7:10]
+
+    @property
+    def parents(self):
+        """Parent index of each node, -1 for roots."""
+        return self._parents[:self._count]
+
+    @property
+    def world_matrices(self):
+        """N x 4 x 4 world matrices as of the last |update|."""
+        return self._world[:self._count]
+
+    @property
+    def world_versions(self):
+        """|update_count| of the update that last changed each node."""
+        return self._world_versions[:self._count]
+
+    def _grow(self):
+        capacity = max(2 * len(self._params), 16)
+
+        def grown(array, fill):
+            new = numpy.full((capacity,) + array.shape[1:], fill, array.dtype)
+            new[:len(array)] = array
+            return new
+
+        self._params = grown(self._params, 0)
+        self._seen_params = grown(self._seen_params, numpy.nan)
+        self._parents = grown(self._parents, -1)
+        self._depths = grown(self._depths, 0)
+        self._local = grown(self._local, 0)
+        self._world = grown(self._world, 0)
+        self._world_versions = grown(self._world_versions, 0)
+
+    def add(self, parent=-1):
+        """Add an identity transform and return its index.
+
+        parent: index of the parent node, -1 for a root
+        """
+        if parent >= self._count or (parent >= 0 and
+                                     self._depths[parent] < 0):
+            raise IndexError('invalid parent', parent)
+        if self._free:
+            index = self._free.pop()
+        else:
+            if self._count == len(self._params):
+                self._grow()
+            index = self._count
+            self._count += 1
+        self._params[index] = (0, 0, 0, 0, 0, 0, 1, 1, 1, 1)
+        self._seen_params[index] = numpy.nan
+        self._parents[index] = parent
+        self._depths[index] = 0 if parent < 0 else self._depths[parent] + 1
+        self._levels = None
+        return index
+
+    def remove(self, index):
+        """Free the row of node |index|, which must not have children.
+
+        The index may be returned by a later |add|.
+        """
+        if not 0 <= index < self._count or self._depths[index] < 0:
+            raise IndexError('invalid node', index)
+        if (self.parents == index).any():
+            raise ValueError('node has children', index)
+        self._params[index] = (0, 0, 0, 0, 0, 0, 1, 1, 1, 1)
+        # Never compares as changed
+        self._seen_params[index] = self._params[index]
+        self._parents[index] = -1
+        self._depths[index] = -1
+        self._levels = None
+        self._free.append(index)
+        self.update_count += 1
+
+    def _sorted_levels(self):
+        if self._levels is None:
+            depths = self._depths[:self._count]
+            order = numpy.argsort(depths, kind='stable')
+            # Free rows (depth -1) sort before the first level
+            starts = numpy.searchsorted(depths[order],
+                                        numpy.arange(depths.max() + 2))
+            self._levels = (order, starts)
+        return self._levels
+
+    def update(self):
+        """Recompute the world matrices of changed nodes.
+
+        Returns the sorted indices of the nodes whose world matrix
+        was recomputed. |update_count| is only incremented if there
+        are any.
+        """
+        count = self._count
+        if count == 0:
+            return numpy.empty(0, numpy.int64)
+        params = self._params[:count]
+        seen = self._seen_params[:count]
+        # NaN != NaN, so new nodes are always changed
+        changed = (params != seen).any(axis=1)
+        dirty = numpy.flatnonzero(changed)
+        if len(dirty) == 0:
+            return dirty
+        self.update_count += 1
+        self._local[dirty] = local_matrices(params[dirty, 0:3],
+                                            params[dirty, 3:7],
+                                            params[dirty, 7:10])
+        seen[dirty] = params[dirty]
+
+        order, starts = self._sorted_levels()
+        parents = self._parents
+        for depth in range(len(starts) - 1):
+            level = order[starts[depth]:starts[depth + 1]]
+            if depth == 0:
+                update = level[changed[level]]
+                self._world[update] = self._local[update]
+                continue
+            changed[level] |= changed[parents[level]]
+            update = level[changed[level]]
+            if len(update):
+                self._world[update] = numpy.matmul(
+                    self._world[parents[update]], self._local[update])
+
+        updated = numpy.flatnonzero(changed)
+        self._world_versions[updated] = self.update_count
+        return updated
+
 
 class Transform(object):
+    """Location, rotation and scale of one node of a hierarchy.
+
+    A new transform is the root of its own |TransformHierarchy|;
+    |attach| moves it, along with its descendants, under a transform
+    of another (or the same) hierarchy. The properties return views of
+    the packed arrays, so in-place edits are picked up by the next
+    update. Each access returns a fresh view; a view kept around stops
+    affecting the transform once a node is added to its hierarchy
+    (which may reallocate the arrays) or the transform is attached
+    elsewhere.
+    """
     def __init__(self):
-        self._loc = vec3()
-        self._rot = quat4f()
-        self._scale = vec3_from_scalar(1)
+        self._hierarchy = TransformHierarchy()
+        self._index = self._hierarchy.add()
+        self._parent = None
+        self._children = []
+        # Optional callable run after a property is assigned, in-place
+        # edits of the views don't call it
+        self.on_change = None
+
+    @property
+    def hierarchy(self):
+        return self._hierarchy
+
+    @property
+    def index(self):
+        return self._index
 
     @property
     def loc(self):
         """Location vector."""
-        return self._loc
+        return self._hierarchy.locs[self._index]
 
     @property
     def rot(self):
         """Rotation quaternion."""
-        return self._loc
+        return Quat4f(self._hierarchy.rots[self._index])
 
     @property
     def scale(self):
         """Scale vector."""
-        return self._scale
+        return self._hierarchy.scales[self._index]
 
     @loc.setter
     def loc(self, val):
         assert isinstance(val, ndarray)
-        self._loc = val
+        self._hierarchy.locs[self._index] = val
+        self._changed()
 
     @rot.setter
     def rot(self, val):
-        self._rot = val
+        self._hierarchy.rots[self._index] = val.array
+        self._changed()
 
     @scale.setter
     def scale(self, val):
         assert isinstance(val, ndarray)
-        self._scale = val
+        self._hierarchy.scales[self._index] = val
+        self._changed()
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change()
+
+    @property
+    def parent(self):
+        return self._parent
+
+    @property
+    def children(self):
+        return tuple(self._children)
+
+    def attach(self, parent):
+        """Move this transform and its descendants under |parent|.
+
+        The local values are kept and the rows the subtree used in its
+        old hierarchy are freed. Views returned before this call no
+        longer affect the moved transforms.
+        """
+        ancestor = parent
+        while ancestor is not None:
+            if ancestor is self:
+                raise ValueError('cannot attach a transform to itself or '
+                                 'a descendant')
+            ancestor = ancestor.parent
+        if self._parent is not None:
+            # pylint: disable=protected-access
+            self._parent._children.remove(self)
+        parent._children.append(self)
+        self._parent = parent
+        self._move(parent)
+
+    def _move(self, parent):
+        """Copy the subtree to new rows under |parent|, freeing the old."""
+        old_hierarchy = self._hierarchy
+        old_index = self._index
+        hierarchy = parent.hierarchy
+        index = hierarchy.add(parent.index)
+        hierarchy.locs[index] = old_hierarchy.locs[old_index]
+        hierarchy.rots[index] = old_hierarchy.rots[old_index]
+        hierarchy.scales[index] = old_hierarchy.scales[old_index]
+        self._hierarchy = hierarchy
+        self._index = index
+        for child in self._children:
+            # pylint: disable=protected-access
+            child._move(self)
+        # The children's old rows are free by now
+        old_hierarchy.remove(old_index)
 
     def matrix(self):
-        # TODO
-        return new_mat4(self._scale[0], 0, 0, self._loc[0],
-                        0, self._scale[1], 0, self._loc[1],
-                        0, 0, self._scale[2], self._loc[2],
-                        0, 0, 0, 1)
+        """Local matrix, translate * rotate * scale."""
+        hier = self._hierarchy
+        index = slice(self._index, self._index + 1)
+        mat = local_matrices(hier.locs[index], hier.rots[index],
+                             hier.scales[index])[0]
+        return mat.transpose()
+
+    def world_matrix(self):
+        """Matrix including all parents as of the last hierarchy update.
+
+        Uses the same convention as |matrix|.
+        """
+        return self._hierarchy.world_matrices[self._index].transpose()
+
+    def world_version(self):
+        """Hierarchy update count at which |world_matrix| last changed."""
+        return int(self._hierarchy.world_versions[self._index])
@@ -0,0 +1,330 @@
+"""Bounding volume hierarchy over axis-aligned boxes."""
+
+# pylint: disable=invalid-name
+
+from math import inf
+
+import numpy
+
+# Relative cost of visiting a node vs testing one primitive
+TRAVERSAL_COST = 1.0
+
+
+def _area(box_min, box_max):
+    """Half surface area of boxes (or inf for empty boxes)."""
+    ext = numpy.maximum(box_max - box_min, 0)
+    area = (ext[..., 0] * ext[..., 1] + ext[..., 1] * ext[..., 2] +
+            ext[..., 2] * ext[..., 0])
+    return numpy.where(numpy.isfinite(box_min[..., 0]), area, inf)
+
+
+def _segment_ranges(starts, counts):
+    """Get (segment_ids, positions) covering ranges start:start+count."""
+    offsets = numpy.cumsum(counts) - counts
+    segment_ids = numpy.repeat(numpy.arange(len(counts)), counts)
+    positions = (numpy.arange(len(segment_ids)) - offsets[segment_ids] +
+                 starts[segment_ids])
+    return segment_ids, positions
+
+
+def _group_bounds(keys, box_min, box_max, num_groups):
+    """Bounds of the boxes in each group 0 <= key < num_groups.
+
+    Empty groups get inverted (inf, -inf) bounds.
+    """
+    # Sorting then reducing runs is much faster than minimum.at
+    order = numpy.argsort(keys)
+    sorted_keys = keys[order]
+    run_starts = numpy.flatnonzero(numpy.diff(sorted_keys, prepend=-1))
+    run_keys = sorted_keys[run_starts]
+    group_min = numpy.full((num_groups, 3), inf)
+    group_max = numpy.full((num_groups, 3), -inf)
+    group_min[run_keys] = numpy.minimum.reduceat(
+        box_min.take(order, axis=0), run_starts)
+    group_max[run_keys] = numpy.maximum.reduceat(
+        box_max.take(order, axis=0), run_starts)
+    return group_min, group_max
+
+
+class BVH:
+    """Binned SAH bounding volume hierarchy.
+
+    The tree is built breadth first, one level at a time: all nodes
+    of a level are binned and split together with whole-array
+    operations, so building is not dominated by per-node Python
+    overhead.
+
+    Nodes are stored in flat arrays, children always follow their
+    parent and the two children of a node are adjacent:
+      node_min, node_max: N x 3 node bounds
+      node_left: index of the first child, or -1 for leaves (the
+                 second child is node_left + 1)
+      node_start, node_count: leaf primitives are
+                 prim_order[node_start:node_start + node_count]
+    """
+    def __init__(self, prim_min, prim_max, max_leaf_size=8, num_bins=16):
+        prim_min = numpy.asarray(prim_min, numpy.float64).reshape(-1, 3)
+        prim_max = numpy.asarray(prim_max, numpy.float64).reshape(-1, 3)
+        num_prims = len(prim_min)
+        max_nodes = max(2 * num_prims - 1, 1)
+
+        self.prim_order = numpy.arange(num_prims)
+        self.node_min = numpy.full((max_nodes, 3), inf)
+        self.node_max = numpy.full((max_nodes, 3), -inf)
+        self.node_left = numpy.full(max_nodes, -1, numpy.int64)
+        self.node_start = numpy.zeros(max_nodes, numpy.int64)
+        self.node_count = numpy.zeros(max_nodes, numpy.int64)
+        self.node_count[0] = num_prims
+        self._levels = []
+
+        num_nodes = 1
+        level = numpy.zeros(1, numpy.int64) if num_prims else None
+        while level is not None and len(level):
+            self._levels.append(level)
+            level, num_nodes = self._split_level(
+                level, num_nodes, prim_min, prim_max, max_leaf_size,
+                num_bins)
+        self._trim(num_nodes)
+
+    def _trim(self, num_nodes):
+        self.node_min = self.node_min[:num_nodes]
+        self.node_max = self.node_max[:num_nodes]
+        self.node_left = self.node_left[:num_nodes]
+        self.node_start = self.node_start[:num_nodes]
+        self.node_count = self.node_count[:num_nodes]
+        self._node_lists = None
+
+    def _split_level(self, nodes, num_nodes, prim_min, prim_max,
+                     max_leaf_size, num_bins):
+        """Compute bounds of |nodes| and split those worth splitting.
+
+        Returns (child node indices, new node count).
+        """
+        # pylint: disable=too-many-arguments,too-many-locals
+        starts = self.node_start[nodes]
+        counts = self.node_count[nodes]
+        prims = self.prim_order[_segment_ranges(starts, counts)[1]]
+        seg_starts = numpy.cumsum(counts) - counts
+        # take() is several times faster than fancy indexing for
+        # gathering rows
+        self.node_min[nodes] = numpy.minimum.reduceat(
+            prim_min.take(prims, axis=0), seg_starts)
+        self.node_max[nodes] = numpy.maximum.reduceat(
+            prim_max.take(prims, axis=0), seg_starts)
+
+        # Only nodes over the leaf size are candidates for splitting,
+        # the remaining work is restricted to their primitives
+        candidate = counts > max_leaf_size
+        if not numpy.any(candidate):
+            return None, num_nodes
+        nodes = nodes[candidate]
+        starts = starts[candidate]
+        counts = counts[candidate]
+        seg, pos = _segment_ranges(starts, counts)
+        prims = self.prim_order[pos]
+        seg_starts = numpy.cumsum(counts) - counts
+
+        pmin = prim_min.take(prims, axis=0)
+        pmax = prim_max.take(prims, axis=0)
+        centroid = (pmin + pmax) * 0.5
+        cmin = numpy.minimum.reduceat(centroid, seg_starts)
+        cmax = numpy.maximum.reduceat(centroid, seg_starts)
+        extent = cmax - cmin
+        scale = numpy.divide(num_bins, extent, out=numpy.zeros_like(extent),
+                             where=extent > 0)
+
+        # Bin the centroids along the axis of largest centroid extent
+        # and evaluate the SAH cost of splitting between each pair of
+        # adjacent bins
+        num_segs = len(nodes)
+        axis = numpy.argmax(extent, axis=1)
+        seg_axis = axis[seg]
+        all_prims = numpy.arange(len(prims))
+        flat = all_prims * 3 + seg_axis
+        seg_flat = seg * 3 + seg_axis
+        bins = ((centroid.ravel()[flat] - cmin.ravel()[seg_flat]) *
+                scale.ravel()[seg_flat]).astype(numpy.int64)
+        numpy.clip(bins, 0, num_bins - 1, out=bins)
+        key = seg * num_bins + bins
+
+        shape = (num_segs, num_bins)
+        bin_count = numpy.bincount(
+            key, minlength=num_segs * num_bins).reshape(shape)
+        bin_min, bin_max = _group_bounds(key, pmin, pmax,
+                                         num_segs * num_bins)
+        bin_min = bin_min.reshape(shape + (3,))
+        bin_max = bin_max.reshape(shape + (3,))
+
+        left_count = numpy.cumsum(bin_count, axis=1)[:, :-1]
+        left_area = _area(numpy.minimum.accumulate(bin_min, axis=1),
+                          numpy.maximum.accumulate(bin_max, axis=1))
+        right_area = _area(
+            numpy.minimum.accumulate(bin_min[:, ::-1], axis=1),
+            numpy.maximum.accumulate(bin_max[:, ::-1], axis=1))
+        right_count = counts[:, None] - left_count
+        with numpy.errstate(invalid='ignore'):
+            cost = (left_area[:, :-1] * left_count +
+                    right_area[:, ::-1][:, 1:] * right_count)
+        cost[(left_count == 0) | (right_count == 0)] = inf
+        best_split = numpy.argmin(cost, axis=1) + 1
+        best_cost = cost[numpy.arange(num_segs), best_split - 1]
+
+        node_area = _area(self.node_min[nodes], self.node_max[nodes])
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            sah = TRAVERSAL_COST + best_cost / node_area
+        do_split = (sah < counts) | (counts > 4 * max_leaf_size)
+        if not numpy.any(do_split):
+            return None, num_nodes
+
+        # Primitives go left if they're below the chosen split bin. If
+        # no split separates the centroids, split the range in half.
+        go_left = bins < best_split[seg]
+        no_split = ~numpy.isfinite(best_cost)
+        halves = all_prims - seg_starts[seg] < counts[seg] // 2
+        go_left = numpy.where(no_split[seg], halves, go_left)
+
+        # Stable partition within each splitting segment: left
+        # primitives keep their relative order at the start of the
+        # segment, right ones follow
+        left_count = numpy.bincount(seg[go_left], minlength=num_segs)
+        left_before = numpy.cumsum(go_left) - go_left
+        left_rank = left_before - left_before[seg_starts][seg]
+        right_rank = all_prims - seg_starts[seg] - left_rank
+        new_pos = starts[seg] + numpy.where(
+            go_left, left_rank, left_count[seg] + right_rank)
+        splitting = do_split[seg]
+        self.prim_order[new_pos[splitting]] = prims[splitting]
+
+        parents = nodes[do_split]
+        children = num_nodes + 2 * numpy.arange(len(parents))
+        self.node_left[parents] = children
+        self.node_start[children] = starts[do_split]
+        self.node_count[children] = left_count[do_split]
+        self.node_start[children + 1] = (starts[do_split] +
+                                         left_count[do_split])
+        self.node_count[children + 1] = (counts[do_split] -
+                                         left_count[do_split])
+        self.node_count[parents] = 0
+        next_level = numpy.empty(2 * len(parents), numpy.int64)
+        next_level[0::2] = children
+        next_level[1::2] = children + 1
+        return next_level, num_nodes + 2 * len(parents)
+
+    @property
+    def num_nodes(self):
+        return len(self.node_left)
+
+    def refit(self, prim_min, prim_max):
+        """Update node bounds for moved primitives.
+
+        The tree structure is kept, so this is much cheaper than a
+        rebuild but the tree quality degrades if primitives move far.
+        """
+        prim_min = numpy.asarray(prim_min, numpy.float64).reshape(-1, 3)
+        prim_max = numpy.asarray(prim_max, numpy.float64).reshape(-1, 3)
+        for level in reversed(self._levels):
+            leaves = level[self.node_left[level] == -1]
+            if len(leaves):
+                counts = self.node_count[leaves]
+                seg_starts = numpy.cumsum(counts) - counts
+                prims = self.prim_order[
+                    _segment_ranges(self.node_start[leaves], counts)[1]]
+                self.node_min[leaves] = numpy.minimum.reduceat(
+                    prim_min[prims], seg_starts)
+                self.node_max[leaves] = numpy.maximum.reduceat(
+                    prim_max[prims], seg_starts)
+
+            inner = level[self.node_left[level] != -1]
+            left = self.node_left[inner]
+            self.node_min[inner] = numpy.minimum(self.node_min[left],
+                                                 self.node_min[left + 1])
+            self.node_max[inner] = numpy.maximum(self.node_max[left],
+                                                 self.node_max[left + 1])
+        self._node_lists = None
+
+    def _lists(self):
+        # Traversal touches a few nodes at a time, plain Python floats
+        # are much faster than numpy scalars for that
+        if self._node_lists is None:
+            self._node_lists = (self.node_min.tolist(),
+                                self.node_max.tolist(),
+                                self.node_left.tolist(),
+                                self.node_start.tolist(),
+                                self.node_count.tolist())
+        return self._node_lists
+
+    def intersect(self, origin, direction, intersect_prims, max_t=inf):
+        """Find the nearest primitive hit by a ray.
+
+        Nodes are visited front to back, and nodes whose boxes are
+        further away than the nearest hit so far are skipped.
+
+        intersect_prims: callable(prim_indices, max_t) that returns
+                         (t, payload) for the nearest hit closer than
+                         max_t among the given primitives, or None
+
+        Returns (t, payload) for the nearest hit, or None.
+        """
+        # pylint: disable=too-many-locals
+        if len(self.prim_order) == 0:
+            return None
+        node_min, node_max, node_left, node_start, node_count = \
+            self._lists()
+        # A ray parallel to an axis never crosses that axis' slabs, it
+        # only hits boxes whose slab contains the origin. Handling
+        # that explicitly avoids 0 * inf = NaN in the slab test.
+        parallel_axes = []
+        slab_axes = []
+        for axis, (orig, dirn) in enumerate(zip(origin, direction)):
+            if dirn == 0:
+                parallel_axes.append((axis, float(orig)))
+            else:
+                slab_axes.append((axis, float(orig), 1.0 / float(dirn)))
+
+        def entry(node):
+            """Distance at which the ray enters |node|, or inf."""
+            lo = node_min[node]
+            hi = node_max[node]
+            for axis, orig in parallel_axes:
+                if orig < lo[axis] or orig > hi[axis]:
+                    return inf
+            tmin = 0.0
+            tmax = inf
+            for axis, orig, inv in slab_axes:
+                t0 = (lo[axis] - orig) * inv
+                t1 = (hi[axis] - orig) * inv
+                if t0 > t1:
+                    t0, t1 = t1, t0
+                if t0 > tmin:
+                    tmin = t0
+                if t1 < tmax:
+                    tmax = t1
+            return tmin if tmin <= tmax else inf
+
+        best = None
+        stack = [(entry(0), 0)]
+        while stack:
+            t_enter, node = stack.pop()
+            if t_enter >= max_t:
+                continue
+            left = node_left[node]
+            if left == -1:
+                start = node_start[node]
+                hit = intersect_prims(
+                    self.prim_order[start:start + node_count[node]], max_t)
+                if hit is not None and hit[0] < max_t:
+                    max_t = hit[0]
+                    best = hit
+                continue
+
+            t_left = entry(left)
+            t_right = entry(left + 1)
+            # Push the farther child first so the nearer is visited
+            # first
+            if t_left <= t_right:
+                stack.append((t_right, left + 1))
+                stack.append((t_left, left))
+            else:
+                stack.append((t_left, left))
+                stack.append((t_right, left + 1))
+        return best
@@ -0,0 +1,52 @@
+"""Batched view-frustum tests of axis-aligned boxes."""
+
+import numpy
+
+
+def frustum_planes(clip_matrix):
+    """Get the 6 x 4 inward-facing planes of a clip-space frustum.
+
+    clip_matrix: 4 x 4 projection * view matrix acting on column
+                 vectors, the frustum is -w <= x, y, z <= w in clip
+                 space
+
+    A point p is inside plane (a, b, c, d) if a*x + b*y + c*z + d >= 0.
+    """
+    mat = numpy.asarray(clip_matrix, numpy.float64)
+    return numpy.array((mat[3] + mat[0], mat[3] - mat[0],
+                        mat[3] + mat[1], mat[3] - mat[1],
+                        mat[3] + mat[2], mat[3] - mat[2]))
+
+
+def transform_boxes(matrices, box_min, box_max):
+    """Get the world-space bounds of N transformed boxes.
+
+    matrices: N x 4 x 4 affine matrices acting on column vectors
+
+    box_min, box_max: N x 3 corners of the local boxes
+
+    Returns (world_min, world_max) of the boxes enclosing the
+    transformed boxes.
+    """
+    center = (box_min + box_max) * 0.5
+    extent = (box_max - box_min) * 0.5
+    linear = matrices[:, :3, :3]
+    world_center = (numpy.einsum('nij,nj->ni', linear, center) +
+                    matrices[:, :3, 3])
+    world_extent = numpy.einsum('nij,nj->ni', numpy.abs(linear), extent)
+    return world_center - world_extent, world_center + world_extent
+
+
+def boxes_in_frustum(planes, box_min, box_max):
+    """Test N boxes against frustum |planes|.
+
+    Returns a bool array, False where a box is entirely outside one
+    of the planes. Boxes near corners of the frustum may be reported
+    as inside even though they're not, never the other way around.
+    """
+    center = (box_min + box_max) * 0.5
+    extent = (box_max - box_min) * 0.5
+    normals = planes[:, :3]
+    dist = center.dot(normals.T) + planes[:, 3]
+    radius = extent.dot(numpy.abs(normals).T)
+    return numpy.all(dist + radius >= 0, axis=1)
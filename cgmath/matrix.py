@@ -1,3 +1,5 @@
+from math import radians, tan
+
 import numpy
 
 from cgmath.vector import cross, dot, normalized
@@ -26,3 +28,16 @@ def mat4_look_at(eye, target, up):
                          up[0],      up[1],      up[2], -dot(up, eye),
                     forward[0], forward[1], forward[2], -dot(forward, eye),
                              0,          0,          0,  1)
+
+
+def mat4_perspective(fov_y, aspect_ratio, near, far):
+    """Perspective projection, |fov_y| is in degrees."""
+    y_scale = 1 / tan(radians(fov_y) / 2)
+    x_scale = y_scale / aspect_ratio
+    z_scale = (far + near) / (near - far)
+    z_offset = 2 * far * near / (near - far)
+
+    return new_mat4(x_scale,       0,       0,        0,
+                          0, y_scale,       0,        0,
+                          0,       0, z_scale, z_offset,
+                          0,       0,      -1,        0)
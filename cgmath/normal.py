@@ -1,3 +1,5 @@
+import numpy
+
 from cgmath.vector import cross, normalized
 
 def triangle_normal(v1, v2, v3):
@@ -5,3 +7,66 @@ def triangle_normal(v1, v2, v3):
     e1 = v2 - v3
     e2 = v2 - v1
     return normalized(cross(e1, e2))
+
+
+def _normalized_rows(vecs):
+    lengths = numpy.sqrt(numpy.einsum('ij,ij->i', vecs, vecs))
+    return numpy.divide(vecs, lengths[:, numpy.newaxis],
+                        out=numpy.zeros_like(vecs),
+                        where=lengths[:, numpy.newaxis] > 0)
+
+
+def triangle_normals(v1, v2, v3):
+    """Surface normals for N triangles.
+
+    v1, v2, v3: N x 3 arrays of triangle corners
+
+    Returns an N x 3 array with the same orientation as
+    |triangle_normal|. Degenerate triangles get a zero normal.
+    """
+    return _normalized_rows(numpy.cross(v2 - v3, v2 - v1))
+
+
+def vertex_normals(locs, triangles, vert_indices=None):
+    """Smooth vertex normals.
+
+    locs: V x 3 array of vertex locations
+
+    triangles: T x 3 array of vertex indices
+
+    vert_indices: optional sorted array of the vertices to calculate
+                  normals for, |triangles| then only needs to contain
+                  the triangles that use them
+
+    Each vertex normal is the average of the normals of the adjacent
+    triangles, weighted by triangle area. Returns a V x 3 array (or
+    one row per vert_indices); vertices that aren't part of any
+    (non-degenerate) triangle get a zero normal.
+    """
+    locs = numpy.asarray(locs, numpy.float64)
+    triangles = numpy.asarray(triangles).reshape(-1, 3)
+    corners = locs[triangles]
+    # Unnormalized, so the length is proportional to the area
+    face_normals = numpy.repeat(
+        numpy.cross(corners[:, 1] - corners[:, 2],
+                    corners[:, 1] - corners[:, 0]), 3, axis=0)
+    corner_verts = triangles.ravel()
+
+    num_normals = len(locs)
+    if vert_indices is not None:
+        num_normals = len(vert_indices)
+        if num_normals == 0:
+            return numpy.empty((0, 3))
+        # Renumber the corners' vertices to rows of the result,
+        # dropping corners of other vertices
+        rows = numpy.minimum(numpy.searchsorted(vert_indices, corner_verts),
+                             num_normals - 1)
+        keep = vert_indices[rows] == corner_verts
+        corner_verts = rows[keep]
+        face_normals = face_normals[keep]
+
+    normals = numpy.empty((num_normals, 3))
+    for axis in range(3):
+        normals[:, axis] = numpy.bincount(corner_verts, face_normals[:, axis],
+                                          minlength=num_normals)
+    return _normalized_rows(normals)
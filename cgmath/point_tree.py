@@ -0,0 +1,188 @@
+"""Spatial index over points for nearest-neighbor queries."""
+
+# pylint: disable=invalid-name
+
+from heapq import heappop, heappush
+from math import inf
+
+import numpy
+
+# Bits per axis of the Morton codes used to order the points
+MORTON_BITS = 21
+
+
+def _spread_bits(values):
+    """Insert two zero bits between each of the low 21 bits."""
+    x = values.astype(numpy.uint64) & numpy.uint64(0x1fffff)
+    for shift, mask in ((32, 0x1f00000000ffff),
+                        (16, 0x1f0000ff0000ff),
+                        (8, 0x100f00f00f00f00f),
+                        (4, 0x10c30c30c30c30c3),
+                        (2, 0x1249249249249249)):
+        x = (x | (x << numpy.uint64(shift))) & numpy.uint64(mask)
+    return x
+
+
+def morton_codes(points):
+    """Morton (Z-order) codes of N x 3 |points| within their bounds."""
+    lo = points.min(axis=0)
+    extent = points.max(axis=0) - lo
+    scale = numpy.divide((1 << MORTON_BITS) - 1, extent,
+                         out=numpy.zeros_like(extent), where=extent > 0)
+    cells = ((points - lo) * scale).astype(numpy.uint64)
+    return (_spread_bits(cells[:, 0]) |
+            (_spread_bits(cells[:, 1]) << numpy.uint64(1)) |
+            (_spread_bits(cells[:, 2]) << numpy.uint64(2)))
+
+
+class PointTree:
+    """Bounding box tree over points.
+
+    Points are sorted along a Morton curve and cut into leaves of
+    |leaf_size| consecutive points. The leaves are the bottom level
+    of an implicit complete binary tree (node i has children 2i + 1
+    and 2i + 2) whose node bounds are reduced level by level. Building
+    is a single sort plus whole-array reductions.
+
+    Queries visit nodes nearest first and skip nodes whose boxes are
+    farther than the current result.
+    """
+    def __init__(self, points, leaf_size=16):
+        points = numpy.asarray(points, numpy.float64).reshape(-1, 3)
+        self.leaf_size = leaf_size
+        self.order = numpy.argsort(morton_codes(points), kind='stable') \
+            if len(points) else numpy.empty(0, numpy.int64)
+        self.points = points[self.order]
+
+        num_leaves = max(-(-len(points) // leaf_size), 1)
+        self.first_leaf = (1 << (num_leaves - 1).bit_length()) - 1
+        num_nodes = 2 * self.first_leaf + 1
+        self.node_min = numpy.full((num_nodes, 3), inf)
+        self.node_max = numpy.full((num_nodes, 3), -inf)
+        if len(points):
+            leaf_starts = numpy.arange(0, len(points), leaf_size)
+            leaves = slice(self.first_leaf, self.first_leaf + num_leaves)
+            self.node_min[leaves] = numpy.minimum.reduceat(self.points,
+                                                           leaf_starts)
+            self.node_max[leaves] = numpy.maximum.reduceat(self.points,
+                                                           leaf_starts)
+        level_start = self.first_leaf
+        while level_start:
+            parent_start = (level_start - 1) // 2
+            children = slice(level_start, 2 * level_start + 1)
+            parents = slice(parent_start, level_start)
+            self.node_min[parents] = numpy.minimum(
+                self.node_min[children][0::2], self.node_min[children][1::2])
+            self.node_max[parents] = numpy.maximum(
+                self.node_max[children][0::2], self.node_max[children][1::2])
+            level_start = parent_start
+
+        # Traversal touches a few nodes at a time, plain Python floats
+        # are much faster than numpy scalars for that
+        self._node_min = self.node_min.tolist()
+        self._node_max = self.node_max.tolist()
+
+    def __len__(self):
+        return len(self.points)
+
+    def _box_distance_squared(self, node, point):
+        lo = self._node_min[node]
+        hi = self._node_max[node]
+        dx = max(lo[0] - point[0], point[0] - hi[0], 0.0)
+        dy = max(lo[1] - point[1], point[1] - hi[1], 0.0)
+        dz = max(lo[2] - point[2], point[2] - hi[2], 0.0)
+        return dx * dx + dy * dy + dz * dz
+
+    def _leaf_range(self, node):
+        start = (node - self.first_leaf) * self.leaf_size
+        return start, min(start + self.leaf_size, len(self.points))
+
+    def _leaf_distances_squared(self, node, point):
+        start, end = self._leaf_range(node)
+        delta = self.points[start:end] - point
+        return start, numpy.einsum('ij,ij->i', delta, delta)
+
+    def _visit_nearest(self, point, bound, visit_leaf):
+        """Visit leaves nearest first while they're closer than bound().
+
+        visit_leaf(node) is called for each leaf in order.
+        """
+        heap = [(self._box_distance_squared(0, point), 0)]
+        while heap:
+            dist, node = heappop(heap)
+            if dist > bound():
+                break
+            if node >= self.first_leaf:
+                visit_leaf(node)
+                continue
+            for child in (2 * node + 1, 2 * node + 2):
+                child_dist = self._box_distance_squared(child, point)
+                if child_dist <= bound():
+                    heappush(heap, (child_dist, child))
+
+    def nearest(self, point):
+        """Get (index, distance_squared) of the point nearest |point|.
+
+        Returns (None, inf) if the tree is empty.
+        """
+        indices, distances_squared = self.k_nearest(point, 1)
+        if len(indices) == 0:
+            return (None, inf)
+        return (int(indices[0]), float(distances_squared[0]))
+
+    def k_nearest(self, point, k):
+        """Get the |k| points nearest |point|.
+
+        Returns (indices, distances_squared) arrays sorted by
+        distance. Fewer than |k| points are returned if the tree has
+        fewer points.
+        """
+        point = [float(val) for val in point]
+        point_array = numpy.array(point)
+        best_pos = numpy.empty(0, numpy.int64)
+        best_dist = numpy.empty(0)
+        bound = inf if k > 0 else -inf
+
+        def visit_leaf(node):
+            nonlocal best_pos, best_dist, bound
+            start, dist = self._leaf_distances_squared(node, point_array)
+            pos = numpy.concatenate((best_pos,
+                                     numpy.arange(start, start + len(dist))))
+            dist = numpy.concatenate((best_dist, dist))
+            keep = numpy.argsort(dist, kind='stable')[:k]
+            best_pos, best_dist = pos[keep], dist[keep]
+            if len(best_dist) == k:
+                bound = best_dist[-1]
+
+        if len(self.points):
+            self._visit_nearest(point, lambda: bound, visit_leaf)
+        return self.order[best_pos], best_dist
+
+    def within_radius(self, point, radius):
+        """Get the points within |radius| of |point|.
+
+        Returns (indices, distances_squared) arrays sorted by
+        distance.
+        """
+        point = [float(val) for val in point]
+        radius_squared = radius * radius
+        ranges = []
+        stack = [0] if len(self.points) else []
+        while stack:
+            node = stack.pop()
+            if self._box_distance_squared(node, point) > radius_squared:
+                continue
+            if node >= self.first_leaf:
+                ranges.append(self._leaf_range(node))
+            else:
+                stack.extend((2 * node + 1, 2 * node + 2))
+
+        pos = numpy.concatenate([numpy.arange(start, end)
+                                 for start, end in ranges] or
+                                [numpy.empty(0, numpy.int64)])
+        delta = self.points[pos] - point
+        dist = numpy.einsum('ij,ij->i', delta, delta)
+        inside = dist <= radius_squared
+        pos, dist = pos[inside], dist[inside]
+        order = numpy.argsort(dist, kind='stable')
+        return self.order[pos[order]], dist[order]
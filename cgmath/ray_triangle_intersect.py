@@ -2,6 +2,8 @@
 
 # pylint: disable=invalid-name
 
+import numpy
+
 from cgmath.vector import cross, dot
 
 # TODO
@@ -20,6 +22,19 @@ def ray_triangle_intersect(ray, triangle):
     origin to the intersection. Returns None if no intersection found
     or multiple.
     """
+    hit = ray_triangle_intersect_tuv(ray, triangle)
+    if hit is None:
+        return None
+    return hit[0]
+
+
+def ray_triangle_intersect_tuv(ray, triangle):
+    """Ray-triangle intersection with barycentric coordinates.
+
+    Same as |ray_triangle_intersect|, but returns a tuple (t, u, v)
+    where t is the distance along the ray and the intersection point
+    is (1 - u - v) * triangle[0] + u * triangle[1] + v * triangle[2].
+    """
     v1 = triangle[0]
     v2 = triangle[1]
     v3 = triangle[2]
@@ -63,7 +78,102 @@ def ray_triangle_intersect(ray, triangle):
     t = dot(e2, Q) * inv_det
 
     if t > EPSILON: # ray intersection
-        return t
+        return (t, u, v)
 
     # No hit, no win
     return None
+
+
+def _take(rows, survivors):
+    """Select |survivors| of |rows| unless |rows| is a broadcast row."""
+    return rows if len(rows) == 1 else rows[survivors]
+
+
+def _dot_rows(a, b):
+    return (a * b).sum(axis=1)
+
+
+def _intersect_rows(origins, directions, triangles):
+    """Vectorized Moller-Trumbore over aligned rows.
+
+    origins, directions: K x 3 (or 1 x 3, shared by all rows)
+    triangles: K x 3 x 3
+
+    Each test only runs on the rows that passed the previous tests,
+    so misses are rejected as early as in the scalar code.
+
+    Returns (t, u, v) arrays of length K, see |ray_triangles_intersect|.
+    """
+    count = len(triangles)
+    t_out = numpy.full(count, numpy.inf)
+    u_out = numpy.full(count, numpy.nan)
+    v_out = numpy.full(count, numpy.nan)
+
+    v1 = triangles[:, 0]
+    e1 = triangles[:, 1] - v1
+    e2 = triangles[:, 2] - v1
+
+    P = numpy.cross(directions, e2)
+    det = _dot_rows(e1, P)
+    rows = numpy.flatnonzero(numpy.abs(det) >= EPSILON)
+    with numpy.errstate(divide='ignore'):
+        inv_det = 1.0 / det[rows]
+
+    T = _take(origins, rows) - v1[rows]
+    u = _dot_rows(T, P[rows]) * inv_det
+    keep = (u >= 0) & (u <= 1)
+    rows, T, u, inv_det = rows[keep], T[keep], u[keep], inv_det[keep]
+
+    Q = numpy.cross(T, e1[rows])
+    v = _dot_rows(_take(directions, rows), Q) * inv_det
+    keep = (v >= 0) & (u + v <= 1)
+    rows, Q, u, v, inv_det = (rows[keep], Q[keep], u[keep], v[keep],
+                              inv_det[keep])
+
+    t = _dot_rows(e2[rows], Q) * inv_det
+    keep = t > EPSILON
+    rows = rows[keep]
+    t_out[rows] = t[keep]
+    u_out[rows] = u[keep]
+    v_out[rows] = v[keep]
+    return t_out, u_out, v_out
+
+
+def ray_triangles_intersect(ray, triangles):
+    """Intersect one ray with N triangles.
+
+    ray: cgmath.ray.Ray instance
+
+    triangles: N x 3 x 3 array of triangle points
+
+    Returns (t, u, v) arrays of length N, with the same meaning as
+    |ray_triangle_intersect_tuv|. For triangles that are not hit t is
+    inf and u, v are NaN.
+    """
+    triangles = numpy.asarray(triangles, numpy.float64).reshape(-1, 3, 3)
+    origin = numpy.asarray(ray.origin, numpy.float64).reshape(1, 3)
+    direction = numpy.asarray(ray.direction, numpy.float64).reshape(1, 3)
+    return _intersect_rows(origin, direction, triangles)
+
+
+def rays_triangles_intersect(origins, directions, triangles):
+    """Intersect each of N rays with each of M triangles.
+
+    origins, directions: N x 3 arrays
+
+    triangles: M x 3 x 3 array of triangle points
+
+    Returns (t, u, v) arrays of shape N x M, see
+    |ray_triangles_intersect|. Memory use is proportional to N * M.
+    """
+    origins = numpy.asarray(origins, numpy.float64).reshape(-1, 3)
+    directions = numpy.asarray(directions, numpy.float64).reshape(-1, 3)
+    triangles = numpy.asarray(triangles, numpy.float64).reshape(-1, 3, 3)
+    num_rays = len(origins)
+    num_tris = len(triangles)
+    ray_rows = numpy.repeat(numpy.arange(num_rays), num_tris)
+    tri_rows = numpy.tile(numpy.arange(num_tris), num_rays)
+    t, u, v = _intersect_rows(origins[ray_rows], directions[ray_rows],
+                              triangles[tri_rows])
+    shape = (num_rays, num_tris)
+    return t.reshape(shape), u.reshape(shape), v.reshape(shape)
@@ -2,22 +2,25 @@
 
 import logging
 
-from cyglfw3.compatible import GLFW_KEY_ESCAPE
+from cyglfw3.compatible import GLFW_KEY_ESCAPE, GLFW_KEY_S, GLFW_PRESS
+import numpy
+from OpenGL.GL import GL_STREAM_DRAW
 
 from bel import log
 from bel.event import ButtonAction
+from bel.instanced_mesh_node import InstancedMeshNode
 from bel.mesh import Mesh
 from bel.mesh_node import MeshNode
 from bel.scene import Scene
 from bel.solids import cube_mesh
 from bel.window import Window
-from cgmath.vector import (copy_xyz, cross, vec3_from_scalar, vec3,
-                           vec4)
+from cgmath.vector import cross, vec3_from_scalar, vec3, vec4
 
 
 class RayNode(MeshNode):
     def __init__(self):
-        super().__init__()
+        # The ray follows the cursor, so it's rewritten every frame
+        super().__init__(usage=GL_STREAM_DRAW)
 
         # Ray
         vi0 = self.mesh.add_vert()
@@ -75,8 +78,6 @@ class RayNode(MeshNode):
         self._v4.loc = org
         self._v5.loc = org + cr2 * vlen
 
-        self._edge_buf.dirty = True
-
 
 class Demo:
     def __init__(self):
@@ -87,19 +88,25 @@ class Demo:
         self._window.on_cursor_pos = self.on_cursor_pos
         self._window.on_key = self.on_key
         self._window.on_mouse_button = self.on_mouse_button
+        self._window.shader_manager.watch = True
 
         self._ray_node = self._scene.root.add_child(RayNode())
+        # Follows the cursor, so it's never what the cursor points at
+        self._ray_node.pickable = False
         self._selected_vert_index = None
 
         self._mesh = Mesh.load_obj('examples/rounded-cube.obj')
         self._mesh_node = self._scene.root.add_child(MeshNode(self._mesh))
         self._mouse_node = self._scene.root.add_child(
-            MeshNode(cube_mesh()))
+            InstancedMeshNode(cube_mesh()))
+        self._mouse_node.add_instance()
         self._mouse_node.transform.scale = vec3_from_scalar(0.02)
         self._mouse_node.pickable = False
 
         # TODO
         self._scene.window_initialized(self._window.draw_state)
+        self._window.frame_scheduler.add_version_source(
+            self._scene.change_version)
 
     def on_mouse_button(self, event):
         if event.action != ButtonAction.Release:
@@ -109,15 +116,10 @@ class Demo:
             return
 
         mesh = self._mesh
-        vert = mesh.vert(self._selected_vert_index)
-        dist = lambda vi0, vi1: mesh.edge_length(mesh.edge_between(vi0, vi1))
-        results = mesh.dijkstra(self._selected_vert_index, dist)
-        for dijk, vert in zip(results, mesh.verts):
-            if dijk.dist > 99999:
-                vert.col[0] = -1
-            else:
-                vert.col[0] = dijk.dist
-        self._mesh_node._triangle_buf.dirty = True
+        dist, _ = mesh.shortest_paths(self._selected_vert_index)
+        dist[numpy.isinf(dist)] = -1
+        mesh.cols[:, 0] = dist
+        mesh.cols_changed()
 
     def on_cursor_pos(self, loc):
         ray = self._scene.ray_from_screen_coord(loc)
@@ -131,15 +133,17 @@ class Demo:
             vert_index, _ = mesh.nearest_vert(hit)
             self._selected_vert_index = vert_index
 
-            copy_xyz(self._mouse_node.transform.loc,
-                     mesh.vert(vert_index).loc)
-            self._mouse_node._triangle_draw.needs_update = True
+            # Assigned rather than copied in place, so the change is
+            # seen by redraw detection
+            self._mouse_node.transform.loc = mesh.vert(vert_index).loc.copy()
         else:
             self._selected_vert_index = None
 
     def on_key(self, key, scancode, action, mods):
         if key == GLFW_KEY_ESCAPE:
             self._window.close()
+        elif key == GLFW_KEY_S and action == GLFW_PRESS:
+            self._mesh_node.smooth_shading = not self._mesh_node.smooth_shading
 
     def on_draw(self):
         self._scene.draw(self._window.draw_state)
@@ -0,0 +1,10 @@
+#version 330 core
+
+in vec3 vs_normal;
+in vec4 vs_color;
+out vec4 color;
+
+void main() {
+	vec3 normal_color = (normalize(vs_normal) + 1.0) * 0.5;
+	color = vec4(normal_color * vs_color.rgb, vs_color.a);
+}
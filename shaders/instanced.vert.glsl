@@ -0,0 +1,22 @@
+#version 330 core
+
+layout(location=0) in vec3 vert_loc;
+layout(location=1) in vec3 vert_nor;
+layout(location=2) in vec4 vert_col;
+// Per-instance, inst_model takes locations 3 to 6
+layout(location=3) in mat4 inst_model;
+layout(location=7) in vec4 inst_col;
+
+out vec3 vs_normal;
+out vec4 vs_color;
+
+uniform mat4 projection;
+uniform mat4 camera;
+uniform mat4 model;
+
+void main() {
+	mat4 full_model = model * inst_model;
+	vs_normal = normalize(mat3(full_model) * vert_nor);
+	vs_color = vert_col * inst_col;
+	gl_Position = projection * camera * full_model * vec4(vert_loc, 1.0f);
+}
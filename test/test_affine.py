@@ -0,0 +1,133 @@
+# pylint: disable=missing-docstring
+
+from math import sqrt
+from unittest import TestCase
+
+import numpy
+
+from cgmath.affine import Transform, TransformHierarchy
+from cgmath.quaternion import quat4f
+from cgmath.vector import vec3
+
+
+def point(matrix, loc):
+    # Matrices act on column vectors
+    return matrix.dot(numpy.append(loc, 1))[:3]
+
+
+class TestTransform(TestCase):
+    def test_matrix(self):
+        transform = Transform()
+        transform.loc = vec3(1, 2, 3)
+        transform.scale = vec3(2, 2, 2)
+        # Translation in the bottom row
+        self.assertTrue(numpy.allclose(transform.matrix(),
+                                       ((2, 0, 0, 0),
+                                        (0, 2, 0, 0),
+                                        (0, 0, 2, 0),
+                                        (1, 2, 3, 1))))
+
+    def test_rotation(self):
+        transform = Transform()
+        # 90 degrees around z
+        transform.rot = quat4f(0, 0, sqrt(0.5), sqrt(0.5))
+        self.assertTrue(numpy.allclose(
+            point(transform.matrix().T, (1, 0, 0)), (0, 1, 0)))
+
+    def test_attach(self):
+        parent = Transform()
+        parent.loc = vec3(1, 0, 0)
+        child = Transform()
+        child.loc = vec3(0, 1, 0)
+        child.attach(parent)
+        self.assertIs(child.hierarchy, parent.hierarchy)
+        parent.hierarchy.update()
+        self.assertTrue(numpy.allclose(
+            point(child.world_matrix().T, (0, 0, 0)), (1, 1, 0)))
+
+    def test_reattach_subtree(self):
+        root = Transform()
+        root.loc = vec3(1, 0, 0)
+        node = Transform()
+        node.loc = vec3(0, 1, 0)
+        child = Transform()
+        child.loc = vec3(0, 0, 1)
+        child.attach(node)
+        old_hierarchy = node.hierarchy
+        node.attach(root)
+
+        self.assertIs(child.hierarchy, root.hierarchy)
+        self.assertEqual(child.hierarchy.parents[child.index], node.index)
+        self.assertEqual(len(old_hierarchy), 0)
+        root.hierarchy.update()
+        self.assertTrue(numpy.allclose(
+            point(child.world_matrix().T, (0, 0, 0)), (1, 1, 1)))
+
+        # Moving within the hierarchy reuses the freed rows
+        other = Transform()
+        other.attach(root)
+        child.attach(other)
+        self.assertEqual(len(root.hierarchy), 4)
+        self.assertEqual(root.hierarchy.parents[child.index], other.index)
+        self.assertEqual(node.children, ())
+        root.hierarchy.update()
+        self.assertTrue(numpy.allclose(
+            point(child.world_matrix().T, (0, 0, 0)), (1, 0, 1)))
+
+    def test_attach_cycle(self):
+        parent = Transform()
+        child = Transform()
+        child.attach(parent)
+        with self.assertRaises(ValueError):
+            parent.attach(child)
+
+
+class TestTransformHierarchy(TestCase):
+    def setUp(self):
+        #   0
+        #  / \
+        # 1   2
+        #     |
+        #     3
+        self.hier = TransformHierarchy()
+        self.hier.add()
+        self.hier.add(0)
+        self.hier.add(0)
+        self.hier.add(2)
+        self.hier.locs[:] = ((1, 0, 0), (0, 1, 0), (0, 0, 1), (0, 0, 1))
+
+    def test_update(self):
+        self.assertEqual(list(self.hier.update()), [0, 1, 2, 3])
+        world = self.hier.world_matrices
+        self.assertTrue(numpy.allclose(world[3][:3, 3], (1, 0, 2)))
+        self.assertTrue(numpy.allclose(world[1][:3, 3], (1, 1, 0)))
+        self.assertEqual(list(self.hier.world_versions), [1, 1, 1, 1])
+
+    def test_dirty_subtree(self):
+        self.hier.update()
+        self.assertEqual(len(self.hier.update()), 0)
+        # Updates that change nothing aren't counted
+        self.assertEqual(self.hier.update_count, 1)
+        # In-place edits are detected
+        self.hier.scales[2] *= 2
+        self.assertEqual(list(self.hier.update()), [2, 3])
+        self.assertTrue(numpy.allclose(
+            self.hier.world_matrices[3][:3, 3], (1, 0, 3)))
+        self.assertEqual(list(self.hier.world_versions), [1, 1, 2, 2])
+
+    def test_invalid_parent(self):
+        with self.assertRaises(IndexError):
+            self.hier.add(4)
+
+    def test_remove(self):
+        with self.assertRaises(ValueError):
+            self.hier.remove(2)
+        self.hier.remove(3)
+        self.assertEqual(len(self.hier), 3)
+        with self.assertRaises(IndexError):
+            self.hier.add(3)
+        self.assertEqual(list(self.hier.update()), [0, 1, 2])
+        self.assertEqual(self.hier.add(1), 3)
+        self.assertEqual(list(self.hier.update()), [3])
+        self.assertTrue(numpy.allclose(
+            self.hier.world_matrices[3][:3, 3], (1, 1, 0)))
@@ -0,0 +1,95 @@
+# pylint: disable=missing-docstring,protected-access
+
+from unittest import TestCase
+from unittest.mock import patch
+
+import numpy
+from OpenGL.GL import GL_UNSIGNED_INT, GL_UNSIGNED_SHORT
+
+from bel import buffer_object
+from bel.buffer_object import (MAX_UPLOAD_RANGES, StreamingArrayBufferObject,
+                               StreamRing, index_array, upload_ranges)
+
+
+class TestIndexArray(TestCase):
+    def test_index_type(self):
+        indices, gltype = index_array([0, 1, 2], 3)
+        self.assertEqual(indices.dtype, numpy.uint16)
+        self.assertEqual(gltype, GL_UNSIGNED_SHORT)
+        indices, gltype = index_array([0, 1, 70000], 70001)
+        self.assertEqual(indices.dtype, numpy.uint32)
+        self.assertEqual(gltype, GL_UNSIGNED_INT)
+
+
+class TestStreamRing(TestCase):
+    def test_allocate(self):
+        ring = StreamRing(ring_size=3, alignment=256)
+        self.assertEqual(ring.allocate(100), (0, True))
+        self.assertEqual(ring.capacity, 768)
+        self.assertEqual(ring.allocate(100), (256, False))
+        self.assertEqual(ring.allocate(200), (512, False))
+        self.assertEqual(ring.offset, 512)
+        # Full, wraps around onto new storage
+        self.assertEqual(ring.allocate(100), (0, True))
+
+    def test_grow(self):
+        ring = StreamRing(ring_size=2, alignment=4)
+        ring.allocate(8)
+        self.assertEqual(ring.capacity, 16)
+        self.assertEqual(ring.allocate(20), (0, True))
+        self.assertEqual(ring.capacity, 40)
+
+
+class TestStreamingArrayBufferObject(TestCase):
+    def setUp(self):
+        # Stand-in for the GL buffer storage
+        self.storage = numpy.zeros(4096, numpy.uint8)
+
+        def map_range(kind, offset, nbytes, access):
+            # pylint: disable=unused-argument
+            return self.storage.ctypes.data + offset
+
+        patcher = patch.multiple(buffer_object,
+                                 glGenBuffers=lambda count: 1,
+                                 glBindBuffer=lambda *args: None,
+                                 glBufferData=lambda *args: None,
+                                 glMapBufferRange=map_range,
+                                 glUnmapBuffer=lambda kind: True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def region(self, buf, dtype):
+        start = buf._base_offset()
+        return self.storage[start:start + len(buf._data)].view(dtype)
+
+    def test_sub_data_writes_new_region(self):
+        buf = StreamingArrayBufferObject()
+        buf.set_data(numpy.arange(4, dtype=numpy.float32))
+        first_offset = buf._base_offset()
+        generation = buf.generation
+
+        buf.set_sub_data(numpy.array([9, 8], numpy.float32), 4)
+        self.assertNotEqual(buf._base_offset(), first_offset)
+        self.assertNotEqual(buf.generation, generation)
+        self.assertEqual(self.region(buf, numpy.float32).tolist(),
+                         [0, 9, 8, 3])
+        # The region earlier draws read from is untouched
+        self.assertEqual(self.storage[first_offset:first_offset + 16]
+                         .view(numpy.float32).tolist(), [0, 1, 2, 3])
+
+    def test_sub_data_out_of_range(self):
+        buf = StreamingArrayBufferObject()
+        buf.set_data(numpy.zeros(2, numpy.float32))
+        with self.assertRaises(ValueError):
+            buf.set_sub_data(numpy.zeros(2, numpy.float32), 4)
+
+
+class TestUploadRanges(TestCase):
+    def test_runs(self):
+        self.assertEqual(upload_ranges(numpy.array([1, 2, 3, 7, 8, 20])),
+                         [(1, 4), (7, 9), (20, 21)])
+        self.assertEqual(upload_ranges(numpy.array([], numpy.int64)), [])
+
+    def test_many_runs(self):
+        rows = numpy.arange(0, 4 * MAX_UPLOAD_RANGES, 2)
+        self.assertEqual(upload_ranges(rows), [(0, rows[-1] + 1)])
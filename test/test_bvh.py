@@ -0,0 +1,113 @@
+# pylint: disable=missing-docstring
+
+from math import inf
+from unittest import TestCase
+
+import numpy
+
+from cgmath.bvh import BVH
+
+
+def random_boxes(count, seed=0):
+    rng = numpy.random.RandomState(seed)
+    centers = rng.uniform(-10, 10, (count, 3))
+    sizes = rng.uniform(0.01, 0.5, (count, 3))
+    return centers - sizes, centers + sizes
+
+
+def ray_box_entry(origin, direction, box_min, box_max):
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        t0 = (box_min - origin) / direction
+        t1 = (box_max - origin) / direction
+    tmin = max(numpy.nanmax(numpy.minimum(t0, t1)), 0)
+    tmax = numpy.nanmin(numpy.maximum(t0, t1))
+    return tmin if tmin <= tmax else inf
+
+
+class TestBVH(TestCase):
+    def check_tree(self, bvh, box_min, box_max):
+        self.assertEqual(sorted(bvh.prim_order.tolist()),
+                         list(range(len(box_min))))
+        for node in range(bvh.num_nodes):
+            left = bvh.node_left[node]
+            if left == -1:
+                start = bvh.node_start[node]
+                prims = bvh.prim_order[start:start + bvh.node_count[node]]
+                inner_min, inner_max = box_min[prims], box_max[prims]
+            else:
+                self.assertGreater(left, node)
+                inner_min = bvh.node_min[left:left + 2]
+                inner_max = bvh.node_max[left:left + 2]
+            self.assertTrue(numpy.all(inner_min >= bvh.node_min[node]))
+            self.assertTrue(numpy.all(inner_max <= bvh.node_max[node]))
+
+    def test_empty(self):
+        bvh = BVH(numpy.empty((0, 3)), numpy.empty((0, 3)))
+        self.assertIsNone(bvh.intersect((0, 0, 0), (0, 0, 1),
+                                        lambda prims, max_t: None))
+
+    def test_build(self):
+        box_min, box_max = random_boxes(1000)
+        bvh = BVH(box_min, box_max, max_leaf_size=4)
+        self.check_tree(bvh, box_min, box_max)
+        self.assertGreater(bvh.num_nodes, 1000 // 4)
+
+    def test_coincident(self):
+        # Centroids can't be separated, the build still terminates
+        box_min = numpy.zeros((100, 3))
+        bvh = BVH(box_min, box_min + 1, max_leaf_size=4)
+        self.check_tree(bvh, box_min, box_min + 1)
+
+    def test_refit(self):
+        box_min, box_max = random_boxes(500)
+        bvh = BVH(box_min, box_max)
+        box_min = box_min * 2
+        box_max = box_max * 2
+        bvh.refit(box_min, box_max)
+        self.check_tree(bvh, box_min, box_max)
+
+    def test_intersect(self):
+        box_min, box_max = random_boxes(500)
+        bvh = BVH(box_min, box_max)
+
+        def intersect_boxes(prims, max_t):
+            best = None
+            for prim in prims:
+                t = ray_box_entry(origin, direction, box_min[prim],
+                                  box_max[prim])
+                if t < max_t:
+                    max_t = t
+                    best = (t, prim)
+            return best
+
+        rng = numpy.random.RandomState(1)
+        for _ in range(50):
+            origin = rng.uniform(-15, 15, 3)
+            direction = rng.uniform(-1, 1, 3)
+            expected = min(ray_box_entry(origin, direction, box_min[i],
+                                         box_max[i])
+                           for i in range(len(box_min)))
+            hit = bvh.intersect(origin, direction, intersect_boxes)
+            if expected == inf:
+                self.assertIsNone(hit)
+            else:
+                self.assertAlmostEqual(hit[0], expected)
+
+    def test_intersect_parallel_on_face(self):
+        # The ray runs along the top face (y = 1) of the first box with
+        # a zero y direction, and misses the second box in z
+        box_min = numpy.array([[0.0, 0.0, 0.0], [0.0, 0.0, 2.0]])
+        box_max = numpy.array([[1.0, 1.0, 1.0], [1.0, 1.0, 3.0]])
+        bvh = BVH(box_min, box_max, max_leaf_size=1)
+
+        def first_prim(prims, max_t):
+            # pylint: disable=unused-argument
+            return (0.0, int(prims[0]))
+
+        for origin in ((-1.0, 1.0, 0.5), (-1.0, 0.0, 0.5)):
+            hit = bvh.intersect(origin, (1.0, 0.0, 0.0), first_prim)
+            self.assertEqual(hit[1], 0, origin)
+        self.assertIsNone(bvh.intersect((-1.0, 1.5, 0.5), (1.0, 0.0, 0.0),
+                                        first_prim))
+        self.assertIsNone(bvh.intersect((-1.0, 0.5, 1.5), (1.0, 0.0, 0.0),
+                                        first_prim))
@@ -0,0 +1,36 @@
+# pylint: disable=missing-docstring
+
+from types import SimpleNamespace
+from unittest import TestCase
+
+from bel.draw_list import DrawStats, compile_draw_list
+
+
+def command(material_name, vao, buf, count=3, instance_count=None):
+    return SimpleNamespace(
+        material_name=material_name,
+        vao=SimpleNamespace(handle=vao),
+        index_buffer=None,
+        attributes={'vert_loc': {'buffer': buf}},
+        vert_range=(0, count),
+        instance_count=instance_count)
+
+
+class TestDrawList(TestCase):
+    def test_sorted_by_state(self):
+        commands = [command('flat', 1, 'b'),
+                    command('default', 2, 'a'),
+                    command('flat', 3, 'a'),
+                    command('default', 4, 'c', count=0),
+                    command('default', 5, 'c', instance_count=0),
+                    command('default', 0, 'b')]
+        draw_list = compile_draw_list(commands)
+        self.assertEqual([(cmd.material_name, cmd.vao.handle)
+                          for cmd in draw_list],
+                         [('default', 0), ('default', 2),
+                          ('flat', 1), ('flat', 3)])
+
+    def test_stats(self):
+        stats = DrawStats(program_binds_skipped=3, uniform_sets_skipped=4)
+        self.assertEqual(stats.state_changes_saved, 7)
+
@@ -0,0 +1,78 @@
+# pylint: disable=missing-docstring
+
+from unittest import TestCase
+
+from bel.frame_scheduler import FrameScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestFrameScheduler(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.scheduler = FrameScheduler(target_fps=10, clock=self.clock)
+
+    def draw_frame(self, duration=0.01):
+        self.scheduler.begin_frame()
+        self.clock.now += duration
+        self.scheduler.end_frame()
+
+    def test_idle(self):
+        # The first frame is always drawn
+        self.assertTrue(self.scheduler.frame_due())
+        self.draw_frame()
+        self.assertIsNone(self.scheduler.wait_timeout())
+        self.assertFalse(self.scheduler.frame_due())
+        self.assertEqual(self.scheduler.timings.skipped_wakeups, 1)
+
+    def test_coalesce(self):
+        self.draw_frame()
+        for _ in range(5):
+            self.scheduler.request_redraw()
+        # Too early for the next frame at 10 fps
+        self.assertAlmostEqual(self.scheduler.wait_timeout(), 0.09)
+        self.assertFalse(self.scheduler.frame_due())
+        self.clock.now = 0.1
+        self.assertTrue(self.scheduler.frame_due())
+        self.draw_frame()
+        self.assertFalse(self.scheduler.needs_draw())
+        self.assertEqual(self.scheduler.timings.frames, 2)
+
+    def test_continuous(self):
+        self.scheduler.continuous = True
+        for _ in range(3):
+            self.clock.now += 0.2
+            self.assertTrue(self.scheduler.frame_due())
+            self.draw_frame(0.05)
+        timings = self.scheduler.timings
+        self.assertAlmostEqual(timings.last_draw_time, 0.05)
+        self.assertAlmostEqual(timings.frame_interval, 0.25)
+        self.assertAlmostEqual(timings.fps, 4)
+
+    def test_version_source(self):
+        version = [0]
+        self.scheduler.add_version_source(lambda: version[0])
+        self.draw_frame()
+        self.clock.now = 1.0
+        self.assertFalse(self.scheduler.frame_due())
+        version[0] += 1
+        self.assertTrue(self.scheduler.frame_due())
+        # Changes made while drawing don't cause another frame
+        self.scheduler.begin_frame()
+        version[0] += 1
+        self.scheduler.end_frame()
+        self.clock.now = 2.0
+        self.assertFalse(self.scheduler.needs_draw())
+
+    def test_unlimited(self):
+        scheduler = FrameScheduler(target_fps=None, clock=self.clock)
+        scheduler.begin_frame()
+        scheduler.end_frame()
+        scheduler.request_redraw()
+        self.assertEqual(scheduler.wait_timeout(), 0)
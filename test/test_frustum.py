@@ -0,0 +1,52 @@
+# pylint: disable=missing-docstring
+
+from unittest import TestCase
+
+import numpy
+
+from cgmath.frustum import boxes_in_frustum, frustum_planes, transform_boxes
+
+
+class TestFrustum(TestCase):
+    def test_boxes_in_frustum(self):
+        # Identity clip matrix, the frustum is the cube -1..1
+        planes = frustum_planes(numpy.identity(4))
+        box_min = numpy.array(((-0.5, -0.5, -0.5),
+                               (0.9, 0.9, 0.9),
+                               (1.1, 0, 0),
+                               (-3, -3, -3),
+                               (0, 0, -5)))
+        box_max = box_min + (1, 1, 1)
+        box_max[3] = (3, 3, 3)
+        self.assertEqual(boxes_in_frustum(planes, box_min, box_max).tolist(),
+                         [True, True, False, True, False])
+
+    def test_perspective(self):
+        # Looking down -z with a 90 degree field of view
+        near, far = 1.0, 10.0
+        clip_matrix = numpy.array(
+            ((1, 0, 0, 0),
+             (0, 1, 0, 0),
+             (0, 0, -(far + near) / (far - near),
+              -2 * far * near / (far - near)),
+             (0, 0, -1, 0)))
+        planes = frustum_planes(clip_matrix)
+        box_min = numpy.array(((-0.1, -0.1, -5.1),
+                               (-0.1, -0.1, 4.9),
+                               (5.5, -0.1, -5.1),
+                               (-0.1, -0.1, -20)))
+        box_max = box_min + 0.2
+        self.assertEqual(boxes_in_frustum(planes, box_min, box_max).tolist(),
+                         [True, False, False, False])
+
+    def test_transform_boxes(self):
+        # 90 degrees around z, then translate
+        matrix = numpy.array(((0, -1, 0, 10),
+                              (1, 0, 0, 0),
+                              (0, 0, 1, 0),
+                              (0, 0, 0, 1)), numpy.float64)
+        world_min, world_max = transform_boxes(matrix[numpy.newaxis],
+                                               numpy.array([(0, 0, 0)]),
+                                               numpy.array([(2, 1, 1)]))
+        self.assertTrue(numpy.allclose(world_min, [(9, 0, 0)]))
+        self.assertTrue(numpy.allclose(world_max, [(10, 2, 1)]))
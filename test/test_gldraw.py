@@ -0,0 +1,82 @@
+# pylint: disable=missing-docstring,protected-access
+
+from collections import OrderedDict
+from types import SimpleNamespace
+from unittest import TestCase
+
+from bel.gldraw import DrawState
+
+
+class FakeMaterial:
+    handle = 1
+
+    def __init__(self):
+        self.num_binds = 0
+
+    def bind_attributes(self, buffer_objects, attribute_inputs):
+        # pylint: disable=unused-argument
+        self.num_binds += 1
+
+
+class TestRecordVAO(TestCase):
+    def test_record_once(self):
+        buf = SimpleNamespace(generation=1)
+        draw_state = DrawState(buffer_objects={'buf': buf})
+        item = SimpleNamespace(attributes={'vert_loc': {'buffer': 'buf'}},
+                               attributes_changed=True,
+                               index_buffer=None,
+                               vao=SimpleNamespace(recorded_key=None))
+        material = FakeMaterial()
+        for _ in range(3):
+            draw_state._record_vao(item, material)
+        self.assertEqual(material.num_binds, 1)
+
+        buf.generation = 2
+        draw_state._record_vao(item, material)
+        self.assertEqual(material.num_binds, 2)
+
+        item.attributes_changed = True
+        draw_state._record_vao(item, material)
+        self.assertEqual(material.num_binds, 3)
+        self.assertEqual(draw_state.stats.vao_records, 3)
+
+
+class DeletableMaterial:
+    def __init__(self):
+        self.deleted = False
+
+    def delete(self):
+        self.deleted = True
+
+
+class TestUpdateShaderProgram(TestCase):
+    def test_replace(self):
+        item = SimpleNamespace(material_name='flat', attributes_changed=False)
+        other = SimpleNamespace(material_name='default',
+                                attributes_changed=False)
+        draw_state = DrawState(draw_commands={'a': item, 'b': other},
+                               materials={})
+        old_program = DeletableMaterial()
+        draw_state.update_shader_program('flat', old_program)
+        new_program = DeletableMaterial()
+        draw_state.update_shader_program('flat', new_program)
+
+        self.assertTrue(old_program.deleted)
+        self.assertFalse(new_program.deleted)
+        self.assertIs(draw_state._materials['flat'], new_program)
+        self.assertTrue(item.attributes_changed)
+        self.assertFalse(other.attributes_changed)
+
+
+class TestUniformBindings(TestCase):
+    def test_new_uniform_name(self):
+        command = SimpleNamespace(uniform_bindings=['resolved'])
+        draw_state = DrawState(uniforms=OrderedDict(),
+                               draw_commands=OrderedDict(cmd=command))
+        draw_state.update_vector_uniform('fb_size', (800, 600))
+        self.assertIsNone(command.uniform_bindings)
+
+        # Updated in place, the bindings stay valid
+        command.uniform_bindings = ['resolved']
+        draw_state.update_vector_uniform('fb_size', (640, 480))
+        self.assertEqual(command.uniform_bindings, ['resolved'])
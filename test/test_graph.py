@@ -0,0 +1,86 @@
+# pylint: disable=missing-docstring
+
+from math import inf
+from unittest import TestCase
+
+import numpy
+
+from bel.graph import adjacency_lists, dijkstra, dijkstra_settled
+
+
+def csr(num_nodes, arcs):
+    """CSR arrays for a list of undirected (node, node, weight) arcs."""
+    adjacent = [[] for _ in range(num_nodes)]
+    for node0, node1, weight in arcs:
+        adjacent[node0].append((node1, weight))
+        adjacent[node1].append((node0, weight))
+    offsets = numpy.cumsum([0] + [len(adj) for adj in adjacent])
+    neighbors = [other for adj in adjacent for other, _ in adj]
+    weights = [weight for adj in adjacent for _, weight in adj]
+    return offsets, neighbors, weights
+
+
+def path_graph():
+    r"""
+    0 --1-- 1 --1-- 2 --1-- 3     4
+     \_______5_______/
+    """
+    return csr(5, [(0, 1, 1), (1, 2, 1), (2, 3, 1), (0, 2, 5)])
+
+
+class TestDijkstra(TestCase):
+    def test_single_source(self):
+        dist, prev = dijkstra(*path_graph(), sources=0)
+        self.assertEqual(dist.tolist(), [0, 1, 2, 3, inf])
+        self.assertEqual(prev.tolist(), [-1, 0, 1, 2, -1])
+
+    def test_multi_source(self):
+        dist, prev = dijkstra(*path_graph(), sources=[0, 3])
+        self.assertEqual(dist.tolist(), [0, 1, 1, 0, inf])
+        self.assertEqual(prev.tolist(), [-1, 0, 3, -1, -1])
+
+    def test_max_dist(self):
+        dist, prev = dijkstra(*path_graph(), sources=0, max_dist=1.5)
+        self.assertEqual(dist.tolist(), [0, 1, inf, inf, inf])
+        self.assertEqual(prev.tolist(), [-1, 0, -1, -1, -1])
+
+    def test_targets(self):
+        dist, _ = dijkstra(*path_graph(), sources=3, targets=[2])
+        self.assertEqual(dist[2], 1)
+        self.assertEqual(dist[0], inf)
+
+    def test_lists(self):
+        dist, prev = dijkstra(*adjacency_lists(*path_graph()), sources=0,
+                              max_dist=1.5)
+        self.assertEqual(dist.tolist(), [0, 1, inf, inf, inf])
+        self.assertEqual(prev.tolist(), [-1, 0, -1, -1, -1])
+
+    def test_settled_only(self):
+        dist, prev = dijkstra_settled(*adjacency_lists(*path_graph()),
+                                      sources=3, targets=[2])
+        self.assertEqual(dist, {3: 0, 2: 1})
+        self.assertEqual(prev, {3: -1, 2: 3})
+
+    def test_matches_brute_force(self):
+        rng = numpy.random.RandomState(0)
+        num_nodes = 40
+        arcs = [(int(node0), int(node1), float(weight))
+                for node0, node1, weight in zip(
+                    rng.randint(num_nodes, size=150),
+                    rng.randint(num_nodes, size=150),
+                    rng.uniform(0.1, 2, 150))]
+        dist, prev = dijkstra(*csr(num_nodes, arcs), sources=0)
+
+        # Bellman-Ford
+        expected = [inf] * num_nodes
+        expected[0] = 0
+        for _ in range(num_nodes):
+            for node0, node1, weight in arcs:
+                expected[node1] = min(expected[node1],
+                                      expected[node0] + weight)
+                expected[node0] = min(expected[node0],
+                                      expected[node1] + weight)
+        self.assertTrue(numpy.allclose(dist, expected))
+        for node in range(1, num_nodes):
+            if prev[node] != -1:
+                self.assertGreater(dist[node], dist[prev[node]])
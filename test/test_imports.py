@@ -0,0 +1,38 @@
+# pylint: disable=missing-docstring
+
+import subprocess
+import sys
+from unittest import TestCase
+
+# Modules that must stay usable without GL or a window, e.g. by
+# batch tools that only load meshes
+HEADLESS_MODULES = (
+    'bel.graph',
+    'bel.mesh',
+    'bel.mesh_cache',
+    'bel.obj',
+    'bel.pick_index',
+    'bel.shader_cache',
+    'bel.solids',
+    'cgmath.affine',
+    'cgmath.frustum',
+)
+
+GUI_PACKAGES = ('OpenGL', 'attr', 'bidict', 'cyglfw3', 'pqdict', 'pyrr',
+                'shaderdef')
+
+
+def imported_packages(module):
+    """Top-level packages imported by a fresh interpreter."""
+    output = subprocess.check_output(
+        [sys.executable, '-c',
+         'import sys, {}; print(" ".join(sys.modules))'.format(module)],
+        universal_newlines=True)
+    return set(name.split('.')[0] for name in output.split())
+
+
+class TestHeadlessImports(TestCase):
+    def test_no_gui_dependencies(self):
+        for module in HEADLESS_MODULES:
+            imported = imported_packages(module) & set(GUI_PACKAGES)
+            self.assertEqual(imported, set(), module)
@@ -0,0 +1,135 @@
+# pylint: disable=missing-docstring
+
+from math import inf
+from unittest import TestCase
+
+import numpy
+
+from bel.instanced_mesh_node import InstanceArray, InstancedMeshNode
+from bel.pick_index import PickIndex
+from bel.scene_node import SceneNode
+from bel.solids import cube_mesh
+from cgmath.ray import Ray
+from cgmath.vector import vec3
+
+
+def translation(x, y, z):
+    """Translation matrix in instance (upload) order."""
+    matrix = numpy.identity(4)
+    matrix[:3, 3] = (x, y, z)
+    return matrix.T
+
+
+class TestInstanceArray(TestCase):
+    def test_add(self):
+        instances = InstanceArray()
+        for index in range(20):
+            self.assertEqual(instances.add(numpy.identity(4) * index,
+                                           (1, 0, 0, 1)), index)
+        reallocated, rows = instances.take_changes()
+        self.assertTrue(reallocated)
+        self.assertEqual(list(rows), list(range(20)))
+        self.assertEqual(instances.array[3, 5], 3)
+        self.assertEqual(list(instances.array[3, 16:]), [1, 0, 0, 1])
+
+    def test_changes(self):
+        instances = InstanceArray()
+        for _ in range(4):
+            instances.add(numpy.identity(4), (1, 1, 1, 1))
+        instances.take_changes()
+        instances.set_color(2, (0, 1, 0, 1))
+        # Unchanged values aren't reported
+        instances.set_matrix(1, numpy.identity(4))
+        self.assertEqual(list(instances.take_changes()[1]), [2])
+        reallocated, rows = instances.take_changes()
+        self.assertFalse(reallocated)
+        self.assertEqual(len(rows), 0)
+
+    def test_remove(self):
+        instances = InstanceArray()
+        for index in range(3):
+            instances.add(numpy.identity(4), (index, 0, 0, 1))
+        instances.take_changes()
+        instances.remove(0)
+        self.assertEqual(instances.count, 2)
+        self.assertEqual(instances.array[0, 16], 2)
+        self.assertEqual(list(instances.take_changes()[1]), [0])
+        with self.assertRaises(IndexError):
+            instances.set_color(2, (0, 0, 0, 0))
+
+
+class TestInstancedMeshNode(TestCase):
+    def setUp(self):
+        self.node = InstancedMeshNode(cube_mesh())
+        self.node.add_instance(translation(10, 0, 0))
+        self.node.add_instance(translation(0, 5, 0))
+
+    def test_bounds(self):
+        box_min, box_max = self.node.bounds()
+        self.assertEqual(box_min.tolist(), [-1, -1, -1])
+        self.assertEqual(box_max.tolist(), [11, 6, 1])
+        # Unchanged instances keep the same bounds object
+        self.assertIs(self.node.bounds()[0], box_min)
+
+        self.node.set_instance_matrix(0, translation(-10, 0, 0))
+        box_min, box_max = self.node.bounds()
+        self.assertEqual(box_min.tolist(), [-11, -1, -1])
+        self.assertEqual(box_max.tolist(), [1, 6, 1])
+
+    def test_changes(self):
+        root = SceneNode()
+        root.add_child(self.node)
+        self.assertIs(self.node.changes, root.changes)
+        edits = (
+            lambda: self.node.set_instance_color(1, (1, 0, 0, 1)),
+            lambda: setattr(self.node, 'smooth_shading', True),
+            lambda: setattr(self.node.mesh.vert(0), 'loc', vec3(0, 0, 5)),
+            lambda: setattr(self.node.transform, 'loc', vec3(1, 0, 0)),
+            lambda: setattr(self.node, 'pickable', False),
+        )
+        for edit in edits:
+            latest = root.changes.latest
+            edit()
+            self.assertGreater(root.changes.latest, latest)
+
+        # Only the pickable node's edits may affect picking
+        latest = root.changes.latest
+        pick_latest = root.pick_changes.latest
+        self.node.set_instance_color(1, (0, 1, 0, 1))
+        self.assertEqual(root.pick_changes.latest, pick_latest)
+        self.node.pickable = True
+        self.node.set_instance_color(1, (1, 0, 0, 1))
+        self.assertGreater(root.pick_changes.latest, pick_latest)
+        self.assertGreater(root.changes.latest, latest)
+
+        # Edits that change nothing don't count
+        latest = root.changes.latest
+        self.node.set_instance_color(1, (1, 0, 0, 1))
+        self.node.smooth_shading = True
+        self.assertEqual(root.changes.latest, latest)
+
+    def test_bounds_without_instances(self):
+        self.assertIsNone(InstancedMeshNode(cube_mesh()).bounds())
+
+    def test_ray_intersect(self):
+        ray = Ray(origin=vec3(10, 20, 0), direction=vec3(0, -1, 0))
+        self.assertEqual(self.node.ray_intersect(ray), 19)
+        ray = Ray(origin=vec3(5, 20, 0), direction=vec3(0, -1, 0))
+        self.assertEqual(self.node.ray_intersect(ray), inf)
+
+        self.node.remove_instance(0)
+        ray = Ray(origin=vec3(0, 20, 0), direction=vec3(0, -1, 0))
+        self.assertEqual(self.node.ray_intersect(ray), 14)
+
+    def test_picked_through_index(self):
+        root = SceneNode()
+        root.add_child(self.node)
+        self.node.transform.loc = vec3(0, 0, 100)
+        hierarchy = root.transform.hierarchy
+        hierarchy.update()
+        index = PickIndex()
+        index.update([self.node], hierarchy)
+        ray = Ray(origin=vec3(10, 0, 50), direction=vec3(0, 0, 1))
+        node, dist = index.intersect(ray)
+        self.assertIs(node, self.node)
+        self.assertAlmostEqual(dist, 49)
@@ -4,7 +4,7 @@ from unittest import TestCase
 
 from numpy import allclose
 
-from cgmath.matrix import mat4, mat4_look_at
+from cgmath.matrix import mat4, mat4_look_at, mat4_perspective
 from cgmath.vector import vec3
 
 class TestMat4(TestCase):
@@ -19,3 +19,19 @@ class TestMat4(TestCase):
             0, 0, 0, 1
         )
         self.assertTrue(allclose(actual, expected))
+
+    def test_perspective(self):
+        actual = mat4_perspective(fov_y=90, aspect_ratio=2, near=1, far=3)
+        expected = mat4(
+            0.5, 0, 0, 0,
+            0, 1, 0, 0,
+            0, 0, -2, -3,
+            0, 0, -1, 0
+        )
+        self.assertTrue(allclose(actual, expected))
+
+        # Stored transposed, like |mat4|; the near and far planes map
+        # to -1 and 1
+        for dist, ndc_z in ((1, -1), (3, 1)):
+            clip = actual.T.dot((0, 0, -dist, 1))
+            self.assertAlmostEqual(clip[2] / clip[3], ndc_z)
@@ -2,7 +2,10 @@
 
 from unittest import TestCase
 
+import numpy
+
 from bel.mesh import Edge, Face, Mesh, Vert
+from cgmath.ray import Ray
 from cgmath.vector import vec3
 
 def mesh_two_adj_triangles():
@@ -70,6 +73,41 @@ class TestAdjacency(TestCase):
         self.assertEqual(set(mesh.adj_vert_vert(2)), set((0, 1, 3)))
         self.assertEqual(set(mesh.adj_vert_vert(3)), set((0, 2)))
 
+    def test_csr(self):
+        mesh = mesh_two_adj_triangles()
+
+        offsets, edge_indices = mesh.vert_edge_adjacency
+        self.assertEqual(offsets.tolist(), [0, 3, 5, 8, 10])
+        self.assertEqual(edge_indices.tolist(), [0, 2, 4, 0, 1, 1, 2, 3,
+                                                 3, 4])
+
+        offsets, face_indices = mesh.edge_face_adjacency
+        self.assertEqual(offsets.tolist(), [0, 1, 2, 4, 5, 6])
+        self.assertEqual(face_indices.tolist(), [0, 0, 0, 1, 1, 1])
+
+        self.assertEqual(mesh.corner_edge_indices.tolist(),
+                         [0, 1, 2, 2, 3, 4])
+
+    def test_edge_index_between(self):
+        mesh = mesh_two_adj_triangles()
+        self.assertEqual(mesh.edge_index_between(2, 0), 2)
+        self.assertEqual(mesh.edge_index_between(0, 2), 2)
+        self.assertIsNone(mesh.edge_index_between(1, 3))
+
+        self.assertEqual(mesh.add_edge(3, 1), 5)
+        self.assertEqual(mesh.edge_index_between(1, 3), 5)
+        self.assertEqual(set(mesh.adj_vert_vert(1)), set((0, 2, 3)))
+        self.assertEqual(list(mesh.edge(5).face_indices), [])
+        with self.assertRaises(ValueError):
+            mesh.add_edge(mesh.add_vert(), 0, [0])
+
+    def test_update_edges_repeated(self):
+        mesh = mesh_two_adj_triangles()
+        expected = list(mesh.edges)
+        mesh._update_edges()  # pylint: disable=protected-access
+        self.assertEqual(mesh.edges, expected)
+        self.assertEqual(set(mesh.adj_vert_vert(0)), set((1, 2, 3)))
+
 
 class TestMeasurement(TestCase):
     def test_edge_length(self):
@@ -82,6 +120,17 @@ class TestMeasurement(TestCase):
         self.assertEqual(mesh.edge_length(edge), 2)
 
 
+class TestBounds(TestCase):
+    def test_bounds(self):
+        mesh = mesh_two_adj_triangles()
+        box_min, box_max = mesh.bounds()
+        self.assertEqual(list(box_min), [0, 0, 0])
+        self.assertEqual(list(box_max), [2, 1, 0])
+        mesh.vert(1).loc = vec3(0, 1, -3)
+        self.assertEqual(list(mesh.bounds()[0]), [0, 0, -3])
+        self.assertIsNone(Mesh().bounds())
+
+
 class TestDijkstra(TestCase):
     def test_dijkstra_const(self):
         cls = Mesh.DijkstraResult
@@ -107,3 +156,127 @@ class TestDijkstra(TestCase):
         ])
         self.assertEqual(result[3].dist, 2)
         self.assertIn(result[3].prev, (0, 2))
+
+    def test_shortest_paths(self):
+        mesh = mesh_two_adj_triangles()
+        dist, prev = mesh.shortest_paths(1)
+        self.assertTrue(numpy.allclose(dist, (1, 0, 1, 1 + 2 ** 0.5)))
+        self.assertEqual(prev.tolist(), [1, -1, 1, 2])
+
+        dist, prev = mesh.shortest_paths([1, 3], max_dist=1.5)
+        self.assertTrue(numpy.allclose(dist, (1, 0, 1, 0)))
+
+    def test_shortest_paths_follow_edits(self):
+        mesh = mesh_two_adj_triangles()
+        self.assertEqual(mesh.shortest_paths(1)[0][0], 1)
+        mesh.vert(0).loc = vec3(0, 0, 1)
+        self.assertEqual(mesh.shortest_paths(1)[0][0], 2 ** 0.5)
+        dist, _ = mesh.shortest_paths(1, edge_weights=[3, 3, 3, 3, 3])
+        self.assertEqual(dist.tolist(), [3, 0, 3, 6])
+
+    def test_edge_lengths(self):
+        mesh = mesh_two_adj_triangles()
+        self.assertTrue(numpy.allclose(
+            mesh.edge_lengths(), (1, 1, 2 ** 0.5, 2 ** 0.5, 2)))
+        mesh.vert(0).loc = vec3(0, 0, 1)
+        self.assertEqual(mesh.edge_lengths()[0], 2 ** 0.5)
+
+
+class TestStorage(TestCase):
+    def test_from_arrays(self):
+        mesh = Mesh.from_arrays(((0, 0, 0), (0, 1, 0), (1, 1, 0), (2, 0, 0)),
+                                (0, 1, 2, 0, 2, 3), (0, 3, 6))
+        self.assertEqual(mesh.edges, mesh_two_adj_triangles().edges)
+        self.assertEqual(mesh.locs.dtype, numpy.float32)
+        self.assertEqual(list(mesh.faces[1].vert_indices), [0, 2, 3])
+
+    def test_vert_view(self):
+        mesh = mesh_two_adj_triangles()
+        vert = mesh.vert(2)
+        vert.col[0] = 0.5
+        vert.loc = vec3(4, 5, 6)
+        self.assertEqual(mesh.cols[2][0], 0.5)
+        self.assertTrue(numpy.array_equal(mesh.locs[2], (4, 5, 6)))
+
+    def test_add_vert_edge(self):
+        mesh = Mesh()
+        for _ in range(10):
+            mesh.add_vert()
+        self.assertEqual(mesh.locs.shape, (10, 3))
+        self.assertEqual(mesh.add_edge(3, 1), 0)
+        self.assertEqual(mesh.add_edge(1, 3), 0)
+        self.assertEqual(mesh.edge(0).vert_indices, (1, 3))
+        self.assertEqual(list(mesh.adj_vert_vert(3)), [1])
+
+    def test_nearest_vert(self):
+        mesh = mesh_two_adj_triangles()
+        vert_index, dist_squared = mesh.nearest_vert(vec3(1.9, 0.1, 0))
+        self.assertEqual(vert_index, 3)
+        self.assertAlmostEqual(dist_squared, 0.02)
+        self.assertEqual(Mesh().nearest_vert(vec3()), (None, float('inf')))
+
+    def test_nearest_verts(self):
+        mesh = mesh_two_adj_triangles()
+        vert_indices, dist_squared = mesh.nearest_verts(vec3(1.9, 0.1, 0),
+                                                        2)
+        self.assertEqual(list(vert_indices), [3, 2])
+        self.assertTrue(numpy.allclose(dist_squared, (0.02, 1.62)))
+        vert_indices, _ = mesh.verts_within_radius(vec3(0, 0.5, 0), 0.6)
+        self.assertEqual(list(vert_indices), [0, 1])
+
+    def test_nearest_vert_moved(self):
+        mesh = mesh_two_adj_triangles()
+        self.assertEqual(mesh.nearest_vert(vec3(3, 0, 0))[0], 3)
+        mesh.vert(1).loc = vec3(3, 0.1, 0)
+        self.assertEqual(mesh.nearest_vert(vec3(3, 0, 0))[0], 1)
+        mesh.vert(mesh.add_vert()).loc = vec3(3, 0, 0)
+        self.assertEqual(mesh.nearest_vert(vec3(3, 0, 0)), (4, 0))
+
+    def test_changed_verts_since(self):
+        mesh = mesh_two_adj_triangles()
+        count = mesh.vert_change_count
+        self.assertEqual(list(mesh.changed_verts_since(count)), [])
+        mesh.vert(3).loc = vec3(2, 1, 0)
+        mesh.cols_changed((1, 3))
+        self.assertEqual(list(mesh.changed_verts_since(count)), [1, 3])
+        count = mesh.vert_change_count
+        mesh.locs[0] = (1, 1, 1)
+        mesh.locs_changed()
+        self.assertIsNone(mesh.changed_verts_since(count))
+
+    def test_using_verts(self):
+        mesh = mesh_two_adj_triangles()
+        self.assertEqual(list(mesh.triangles_using_verts([3])), [1])
+        self.assertEqual(list(mesh.triangles_using_verts([0, 1])), [0, 1])
+        self.assertEqual(list(mesh.edges_using_verts([3])), [3, 4])
+        self.assertEqual(list(mesh.edges_using_verts([1])), [0, 1])
+
+
+class TestRayIntersect(TestCase):
+    def test_ray_hit(self):
+        mesh = mesh_two_adj_triangles()
+        ray = Ray(origin=vec3(1.5, 0.25, 2), direction=vec3(0, 0, -1))
+        hit = mesh.ray_hit(ray)
+        self.assertEqual(hit.distance, 2)
+        self.assertEqual(hit.face_index, 1)
+        self.assertEqual(hit.vert_indices, (0, 2, 3))
+        locs = mesh.locs[list(hit.vert_indices)]
+        u, v = hit.uv
+        point = (1 - u - v) * locs[0] + u * locs[1] + v * locs[2]
+        self.assertTrue(numpy.allclose(point, (1.5, 0.25, 0)))
+
+    def test_ray_miss(self):
+        mesh = mesh_two_adj_triangles()
+        ray = Ray(origin=vec3(3, 3, 2), direction=vec3(0, 0, -1))
+        self.assertIsNone(mesh.ray_hit(ray))
+        self.assertEqual(mesh.ray_intersect(ray), float('inf'))
+
+    def test_invalidate(self):
+        mesh = mesh_two_adj_triangles()
+        ray = Ray(origin=vec3(1.5, 0.25, 2), direction=vec3(0, 0, -1))
+        self.assertEqual(mesh.ray_intersect(ray), 2)
+        mesh.vert(3).loc = vec3(2, 0, 1)
+        self.assertAlmostEqual(mesh.ray_intersect(ray), 1.375)
+        mesh.locs[:, 2] = -1
+        mesh.locs_changed()
+        self.assertEqual(mesh.ray_intersect(ray), 3)
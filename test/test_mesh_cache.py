@@ -0,0 +1,73 @@
+# pylint: disable=missing-docstring
+
+import os
+from shutil import copyfile
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import patch
+
+import numpy
+
+from bel import mesh_cache
+from bel.mesh import Mesh
+
+from test.test_mesh import mesh_two_adj_triangles
+
+
+class TestMeshFile(TestCase):
+    def test_round_trip(self):
+        mesh = mesh_two_adj_triangles()
+        mesh.add_edge(1, 3)
+        with TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'mesh.belmesh')
+            mesh.save(path)
+            loaded = Mesh.load(path)
+
+            for name, array in mesh.to_arrays().items():
+                self.assertTrue(numpy.array_equal(loaded.to_arrays()[name],
+                                                  array), name)
+            self.assertEqual(loaded.edges, mesh.edges)
+            self.assertEqual(loaded.edge_index_between(3, 1), 5)
+
+            # Copy-on-write, the file is unchanged
+            loaded.vert(0).col[0] = 0.5
+            self.assertNotEqual(Mesh.load(path).cols[0][0], 0.5)
+
+    def test_bad_file(self):
+        with TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'mesh.belmesh')
+            with open(path, 'wb') as wfile:
+                wfile.write(b'not a mesh file' * 10)
+            with self.assertRaises(ValueError):
+                mesh_cache.read_mesh_file(path)
+
+
+class TestObjCache(TestCase):
+    def test_cache(self):
+        with TemporaryDirectory() as tmp_dir:
+            obj_path = os.path.join(tmp_dir, 'cube.obj')
+            copyfile('examples/rounded-cube.obj', obj_path)
+
+            parsed = Mesh.load_obj(obj_path, cache_dir=tmp_dir)
+            cache_path = mesh_cache.cache_path(obj_path, tmp_dir)
+            self.assertTrue(os.path.exists(cache_path))
+
+            cached = Mesh.load_obj(obj_path, cache_dir=tmp_dir)
+            self.assertIsInstance(cached.locs, numpy.memmap)
+            self.assertTrue(numpy.array_equal(cached.locs, parsed.locs))
+            self.assertEqual(cached.edges, parsed.edges)
+
+            # Modifying the source invalidates the entry
+            with open(obj_path, 'a') as wfile:
+                wfile.write('v 0 0 0\n')
+            reparsed = Mesh.load_obj(obj_path, cache_dir=tmp_dir)
+            self.assertEqual(reparsed.num_verts, parsed.num_verts + 1)
+
+    def test_default_cache_dir(self):
+        with patch.dict(os.environ, {'BEL_CACHE_DIR': '/tmp/bel-cache'}):
+            self.assertEqual(mesh_cache.default_cache_dir(),
+                             os.path.join('/tmp/bel-cache', 'meshes'))
+        with patch.dict(os.environ, {'BEL_CACHE_DIR': '',
+                                     'XDG_CACHE_HOME': '/tmp/xdg'}):
+            self.assertEqual(mesh_cache.default_cache_dir(),
+                             os.path.join('/tmp/xdg', 'bel', 'meshes'))
@@ -0,0 +1,55 @@
+# pylint: disable=missing-docstring
+
+from unittest import TestCase
+
+import numpy
+
+from cgmath.normal import triangle_normal, triangle_normals, vertex_normals
+
+
+class TestTriangleNormals(TestCase):
+    def test_matches_scalar(self):
+        rng = numpy.random.RandomState(0)
+        v1, v2, v3 = rng.uniform(-1, 1, (3, 20, 3))
+        normals = triangle_normals(v1, v2, v3)
+        for index in range(20):
+            self.assertTrue(numpy.allclose(
+                normals[index],
+                triangle_normal(v1[index], v2[index], v3[index])))
+
+    def test_degenerate(self):
+        line = numpy.array([[(0, 0, 0)], [(1, 0, 0)], [(2, 0, 0)]], float)
+        self.assertEqual(triangle_normals(*line).tolist(), [[0, 0, 0]])
+
+
+class TestVertexNormals(TestCase):
+    def test_flat(self):
+        locs = numpy.array([(0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 1, 0),
+                            (5, 5, 5)], float)
+        normals = vertex_normals(locs, [(0, 1, 2), (0, 2, 3)])
+        expected = triangle_normal(*locs[:3])
+        for normal in normals[:4]:
+            self.assertTrue(numpy.allclose(normal, expected))
+        # Unused vertex
+        self.assertEqual(normals[4].tolist(), [0, 0, 0])
+
+    def test_area_weighted(self):
+        # Two triangles at right angles, the larger one dominates
+        locs = numpy.array([(0, 0, 0), (1, 0, 0), (0, 1, 0),
+                            (0, 0, 2), (0, 2, 0)], float)
+        normals = vertex_normals(locs, [(0, 1, 2), (0, 3, 4)])
+        small = triangle_normal(*locs[[0, 1, 2]])
+        large = triangle_normal(*locs[[0, 3, 4]])
+        expected = small + 4 * large
+        expected /= numpy.linalg.norm(expected)
+        self.assertTrue(numpy.allclose(normals[0], expected))
+
+    def test_subset(self):
+        rng = numpy.random.RandomState(0)
+        locs = rng.uniform(-1, 1, (30, 3))
+        triangles = rng.randint(30, size=(40, 3))
+        expected = vertex_normals(locs, triangles)
+        vert_indices = numpy.array([2, 3, 11, 29])
+        uses = numpy.any(numpy.isin(triangles, vert_indices), axis=1)
+        normals = vertex_normals(locs, triangles[uses], vert_indices)
+        self.assertTrue(numpy.allclose(normals, expected[vert_indices]))
@@ -0,0 +1,66 @@
+# pylint: disable=missing-docstring
+
+from tempfile import NamedTemporaryFile
+from unittest import TestCase
+
+from numpy import allclose
+
+from bel.obj import read_obj
+
+OBJ_TEXT = b"""# comment
+o Object
+v 0 0 0 # trailing comment
+v 1 0 0
+vt 0.5 0.5
+vn 0 0 1
+v 1 1
+f 1/1/1 2/1/1 3/1/1
+s off
+f -3//1 -2//1 -1//1
+v\t2 2 2 1
+f 4/1 1 -1
+"""
+
+
+def read_obj_text(text, block_size=None):
+    with NamedTemporaryFile(suffix='.obj') as wfile:
+        wfile.write(text)
+        wfile.flush()
+        if block_size is None:
+            return read_obj(wfile.name)
+        return read_obj(wfile.name, block_size)
+
+
+class TestReadObj(TestCase):
+    def test_read(self):
+        locs, face_vert_indices, face_offsets = read_obj_text(OBJ_TEXT)
+        self.assertTrue(allclose(locs, ((0, 0, 0), (1, 0, 0), (1, 1, 0),
+                                        (2, 2, 2))))
+        self.assertEqual(face_vert_indices.tolist(),
+                         [0, 1, 2, 0, 1, 2, 3, 0, 3])
+        self.assertEqual(face_offsets.tolist(), [0, 3, 6, 9])
+
+    def test_block_sizes(self):
+        expected = read_obj_text(OBJ_TEXT)
+        for block_size in (1, 5, 16, 64):
+            actual = read_obj_text(OBJ_TEXT.rstrip(), block_size)
+            for arr0, arr1 in zip(expected, actual):
+                self.assertEqual(arr0.tolist(), arr1.tolist())
+
+    def test_indented_records(self):
+        locs, face_vert_indices, _ = read_obj_text(
+            b'  v 0 0 0\n\tv 1 0 0\n v 0 1 0\n \n   f 1 2 3\n')
+        self.assertTrue(allclose(locs, ((0, 0, 0), (1, 0, 0), (0, 1, 0))))
+        self.assertEqual(face_vert_indices.tolist(), [0, 1, 2])
+
+    def test_empty(self):
+        locs, face_vert_indices, face_offsets = read_obj_text(b'')
+        self.assertEqual(locs.shape, (0, 3))
+        self.assertEqual(len(face_vert_indices), 0)
+        self.assertEqual(face_offsets.tolist(), [0])
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            read_obj_text(b'v 0 0 0\nf 1 2 3\n')
+        with self.assertRaises(ValueError):
+            read_obj_text(b'v 0 x 0\n')
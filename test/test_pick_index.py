@@ -0,0 +1,57 @@
+# pylint: disable=missing-docstring
+
+from math import inf
+from unittest import TestCase
+
+import numpy
+
+from bel.mesh_node import MeshNode
+from bel.pick_index import PickIndex, local_ray
+from bel.scene_node import SceneNode
+from bel.solids import cube_mesh
+from cgmath.ray import Ray
+from cgmath.vector import vec3
+
+
+class TestPickIndex(TestCase):
+    def setUp(self):
+        self.root = SceneNode()
+        self.nodes = []
+        for index in range(10):
+            node = self.root.add_child(MeshNode(cube_mesh()))
+            node.transform.loc = vec3(index * 10, 0, 0)
+            node.transform.scale = vec3(0.5, 0.5, 0.5)
+            self.nodes.append(node)
+        self.hierarchy = self.root.transform.hierarchy
+        self.index = PickIndex()
+
+    def pick(self, ray):
+        self.hierarchy.update()
+        self.index.update(self.nodes, self.hierarchy)
+        return self.index.intersect(ray)
+
+    def test_nearest(self):
+        ray = Ray(origin=vec3(100, 0, 0), direction=vec3(-1, 0, 0))
+        node, dist = self.pick(ray)
+        self.assertIs(node, self.nodes[9])
+        self.assertAlmostEqual(dist, 9.5)
+
+    def test_miss(self):
+        ray = Ray(origin=vec3(100, 2, 0), direction=vec3(-1, 0, 0))
+        self.assertEqual(self.pick(ray), (None, inf))
+
+    def test_moved(self):
+        ray = Ray(origin=vec3(35, 10, 0), direction=vec3(0, -1, 0))
+        self.assertEqual(self.pick(ray), (None, inf))
+        self.nodes[2].transform.loc = vec3(35, 0, 0)
+        node, dist = self.pick(ray)
+        self.assertIs(node, self.nodes[2])
+        self.assertAlmostEqual(dist, 9.5)
+
+    def test_local_ray(self):
+        matrix = numpy.diag((2.0, 2.0, 2.0, 1.0))
+        matrix[:3, 3] = (1, 0, 0)
+        ray = local_ray(matrix, Ray(origin=vec3(3, 0, 0),
+                                    direction=vec3(0, 1, 0)))
+        self.assertTrue(numpy.allclose(ray.origin, (1, 0, 0)))
+        self.assertTrue(numpy.allclose(ray.direction, (0, 0.5, 0)))
@@ -0,0 +1,58 @@
+# pylint: disable=missing-docstring
+
+from math import inf
+from unittest import TestCase
+
+import numpy
+
+from cgmath.point_tree import PointTree
+
+
+def brute_force(points, point):
+    delta = points - point
+    return (delta * delta).sum(axis=1)
+
+
+class TestPointTree(TestCase):
+    def setUp(self):
+        rng = numpy.random.RandomState(0)
+        self.points = rng.uniform(-1, 1, (1000, 3))
+        self.queries = rng.uniform(-1.5, 1.5, (30, 3))
+        self.tree = PointTree(self.points, leaf_size=8)
+
+    def test_empty(self):
+        tree = PointTree(numpy.empty((0, 3)))
+        self.assertEqual(tree.nearest((0, 0, 0)), (None, inf))
+        self.assertEqual(len(tree.k_nearest((0, 0, 0), 3)[0]), 0)
+        self.assertEqual(len(tree.within_radius((0, 0, 0), 1)[0]), 0)
+
+    def test_duplicates(self):
+        tree = PointTree(numpy.ones((5, 3)), leaf_size=2)
+        self.assertEqual(tree.nearest((0, 0, 0)), (0, 3))
+        self.assertEqual(sorted(tree.within_radius((1, 1, 1), 0)[0]),
+                         list(range(5)))
+
+    def test_nearest(self):
+        for query in self.queries:
+            dist = brute_force(self.points, query)
+            index, dist_squared = self.tree.nearest(query)
+            self.assertEqual(index, numpy.argmin(dist))
+            self.assertAlmostEqual(dist_squared, dist.min())
+
+    def test_k_nearest(self):
+        for query in self.queries:
+            dist = brute_force(self.points, query)
+            indices, dist_squared = self.tree.k_nearest(query, 7)
+            self.assertEqual(list(indices), list(numpy.argsort(dist)[:7]))
+            self.assertTrue(numpy.allclose(dist_squared,
+                                           numpy.sort(dist)[:7]))
+        self.assertEqual(len(self.tree.k_nearest((0, 0, 0), 5000)[0]),
+                         1000)
+
+    def test_within_radius(self):
+        for query in self.queries:
+            dist = brute_force(self.points, query)
+            indices, dist_squared = self.tree.within_radius(query, 0.3)
+            self.assertEqual(sorted(indices),
+                             list(numpy.flatnonzero(dist <= 0.09)))
+            self.assertTrue(numpy.all(numpy.diff(dist_squared) >= 0))
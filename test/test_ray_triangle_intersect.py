@@ -1,9 +1,15 @@
 # pylint: disable=missing-docstring
 
+from math import inf
 from unittest import TestCase
 
+import numpy
+
 from cgmath.ray import Ray
-from cgmath.ray_triangle_intersect import ray_triangle_intersect
+from cgmath.ray_triangle_intersect import (ray_triangle_intersect,
+                                           ray_triangle_intersect_tuv,
+                                           ray_triangles_intersect,
+                                           rays_triangles_intersect)
 from cgmath.vector import vec3
 
 def xy_triangle():
@@ -23,3 +29,53 @@ class TestIntersect(TestCase):
         result = ray_triangle_intersect(ray, triangle)
 
         self.assertEqual(result, 2)
+
+
+class TestBatchIntersect(TestCase):
+    def random_triangles(self, count):
+        rng = numpy.random.RandomState(0)
+        return rng.uniform(-1, 1, (count, 3, 3))
+
+    def test_matches_scalar(self):
+        triangles = self.random_triangles(200)
+        ray = Ray(origin=vec3(0.1, 0.2, -3), direction=vec3(0.05, 0, 1))
+        t, u, v = ray_triangles_intersect(ray, triangles)
+        self.assertEqual(t.shape, (200,))
+        for index, triangle in enumerate(triangles):
+            hit = ray_triangle_intersect_tuv(ray, triangle)
+            if hit is None:
+                self.assertEqual(t[index], inf)
+                self.assertTrue(numpy.isnan(u[index]))
+            else:
+                self.assertTrue(numpy.allclose((t[index], u[index],
+                                                v[index]), hit))
+        self.assertTrue(numpy.any(numpy.isfinite(t)))
+
+    def test_barycentric(self):
+        ray = Ray(origin=vec3(1, 1, 0), direction=vec3(0, 0, 1))
+        t, u, v = ray_triangles_intersect(ray, [xy_triangle()])
+        self.assertEqual(t[0], 2)
+        self.assertAlmostEqual(u[0], 0.25)
+        self.assertAlmostEqual(v[0], 0.5)
+
+    def test_rays_triangles(self):
+        triangles = self.random_triangles(30)
+        rng = numpy.random.RandomState(1)
+        origins = rng.uniform(-1, 1, (20, 3)) - (0, 0, 3)
+        directions = rng.uniform(-0.2, 0.2, (20, 3)) + (0, 0, 1)
+        t, u, v = rays_triangles_intersect(origins, directions, triangles)
+        self.assertEqual(t.shape, (20, 30))
+        for ray_index in range(20):
+            ray = Ray(origin=origins[ray_index],
+                      direction=directions[ray_index])
+            expected = ray_triangles_intersect(ray, triangles)
+            self.assertTrue(numpy.array_equal(t[ray_index], expected[0]))
+            self.assertTrue(numpy.allclose(u[ray_index], expected[1],
+                                           equal_nan=True))
+            self.assertTrue(numpy.allclose(v[ray_index], expected[2],
+                                           equal_nan=True))
+
+    def test_empty(self):
+        ray = Ray(origin=vec3(), direction=vec3(0, 0, 1))
+        t, _, _ = ray_triangles_intersect(ray, numpy.empty((0, 3, 3)))
+        self.assertEqual(len(t), 0)
@@ -0,0 +1,97 @@
+# pylint: disable=missing-docstring,protected-access
+
+from unittest import TestCase
+from unittest.mock import patch
+
+import numpy
+
+from OpenGL.GL import (GL_BOOL, GL_FLOAT_MAT4, GL_FLOAT_VEC2, GL_INT_VEC2,
+                       GL_SAMPLER_3D)
+
+from bel import reflection
+from bel.reflection import uniform_setter
+from bel.shader import ShaderProgram
+from bel.uniform import MatrixUniform, VectorUniform
+
+
+class TestUniformSetter(TestCase):
+    def test_dispatch(self):
+        calls = []
+        with patch.dict(reflection.UNIFORM_FUNCTIONS,
+                        {GL_FLOAT_VEC2: lambda *args: calls.append(args)}):
+            uniform_setter(GL_FLOAT_VEC2)(3, (1, 2))
+        with patch.dict(reflection.UNIFORM_MATRIX_FUNCTIONS,
+                        {GL_FLOAT_MAT4: lambda *args: calls.append(args)}):
+            uniform_setter(GL_FLOAT_MAT4, size=2)(5, 'mats')
+        self.assertEqual(calls, [(3, 1, (1, 2)), (5, 2, False, 'mats')])
+
+    def test_integer_values(self):
+        calls = []
+        with patch.dict(reflection.UNIFORM_FUNCTIONS,
+                        {GL_INT_VEC2: lambda *args: calls.append(args),
+                         GL_BOOL: lambda *args: calls.append(args)}):
+            uniform_setter(GL_INT_VEC2)(3, VectorUniform((1, 2)).value)
+            uniform_setter(GL_BOOL)(4, VectorUniform(1).value)
+        self.assertEqual([value.dtype for _, _, value in calls],
+                         [numpy.int32, numpy.int32])
+        self.assertEqual(calls[0][2].tolist(), [1, 2])
+
+    def test_unsupported_type(self):
+        self.assertIsNone(uniform_setter(GL_SAMPLER_3D))
+
+    def test_base_name(self):
+        self.assertEqual(reflection._base_name('lights[0]'), 'lights')
+        self.assertEqual(reflection._base_name('model'), 'model')
+
+
+class TestBindUniforms(TestCase):
+    def setUp(self):
+        self.locations = []
+
+        def setter(location, value):
+            # pylint: disable=unused-argument
+            self.locations.append(location)
+
+        self.program = ShaderProgram.__new__(ShaderProgram)
+        self.program._hnd = 1
+        self.program._uniform_table = [('model', 0, setter),
+                                       ('fb_size', 1, setter)]
+        self.program._uniform_values = [None, None]
+        self.program._unresolved = set()
+
+    def test_table(self):
+        program = self.program
+        model = MatrixUniform(numpy.identity(4))
+        fb_size = VectorUniform((800, 600))
+        bindings = program.resolve_uniforms({'fb_size': fb_size},
+                                            {'model': model})
+
+        self.assertEqual(program.bind_uniforms(bindings), (2, 0, 0))
+        self.assertEqual(self.locations, [0, 1])
+
+        # Same versions, skipped without comparing
+        self.assertEqual(program.bind_uniforms(bindings), (0, 2, 0))
+        model.set(numpy.identity(4))
+        self.assertEqual(program.bind_uniforms(bindings), (0, 2, 0))
+
+        # Updated in place, the bindings see the new value
+        model.set(2 * numpy.identity(4))
+        self.assertEqual(program.bind_uniforms(bindings), (1, 1, 1))
+        self.assertEqual(self.locations, [0, 1, 0])
+
+        # A new uniform with an equal value is compared and skipped
+        self.assertEqual(program.bind_uniforms(program.resolve_uniforms(
+            {'fb_size': VectorUniform([800.0, 600.0]), 'model': model})),
+                         (0, 2, 1))
+
+    def test_unresolved(self):
+        program = self.program
+        model = MatrixUniform(numpy.identity(4))
+        with self.assertLogs(level='WARNING'):
+            bindings = program.resolve_uniforms({'model': model})
+        self.assertEqual([binding[0] for binding in bindings], [0])
+        self.assertEqual(program.bind_uniforms(bindings), (1, 0, 0))
+        # Only reported once
+        with self.assertRaises(AssertionError):
+            with self.assertLogs(level='WARNING'):
+                program.resolve_uniforms({'model': model})
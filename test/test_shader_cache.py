@@ -0,0 +1,134 @@
+# pylint: disable=missing-docstring
+
+import os
+import sys
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import patch
+
+from bel import shader_cache
+
+
+class FakeShaderDef:
+    def __init__(self):
+        self.vert_shader = 'void main() { /* vert */ }'
+        self.geom_shader = 'void main() { /* geom */ }'
+        self.frag_shader = 'void main() { /* frag */ }'
+
+
+class TestDefaultCacheDir(TestCase):
+    def test_separate_from_meshes(self):
+        with patch.dict(os.environ, {'BEL_CACHE_DIR': '/tmp/bel-cache'}):
+            self.assertEqual(shader_cache.default_cache_dir(),
+                             os.path.join('/tmp/bel-cache', 'shaders'))
+
+
+class TestContentKey(TestCase):
+    def test_parts_are_separated(self):
+        self.assertNotEqual(shader_cache.content_key('ab', 'c'),
+                            shader_cache.content_key('a', 'bc'))
+        self.assertEqual(shader_cache.content_key('ab', 'c'),
+                         shader_cache.content_key('ab', 'c'))
+
+    def test_program_key_includes_driver(self):
+        sources = ['vert', 'frag']
+        self.assertNotEqual(shader_cache.program_key(sources, 'mesa 1'),
+                            shader_cache.program_key(sources, 'mesa 2'))
+
+
+class TestCachedTranslation(TestCase):
+    def test_translates_once(self):
+        calls = []
+
+        def translate():
+            calls.append(None)
+            return FakeShaderDef()
+
+        with TemporaryDirectory() as tmp_dir:
+            first = shader_cache.cached_translation('key', translate, tmp_dir)
+            second = shader_cache.cached_translation('key', translate,
+                                                     tmp_dir)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(first, second)
+        self.assertEqual(second.geom_shader, FakeShaderDef().geom_shader)
+
+    def test_bad_entry_is_retranslated(self):
+        with TemporaryDirectory() as tmp_dir:
+            with open(os.path.join(tmp_dir, 'key.glsl.json'), 'w') as wfile:
+                wfile.write('{"vert_shader": ')
+            with self.assertLogs(shader_cache.LOG, 'WARNING'):
+                material = shader_cache.cached_translation(
+                    'key', FakeShaderDef, tmp_dir)
+            self.assertEqual(material.vert_shader,
+                             FakeShaderDef().vert_shader)
+            # The entry was replaced by a good one
+            shader_cache.cached_translation(
+                'key', lambda: self.fail('translated again'), tmp_dir)
+
+
+class TestProgramBinary(TestCase):
+    def test_round_trip(self):
+        with TemporaryDirectory() as tmp_dir:
+            self.assertIsNone(shader_cache.load_program_binary('key',
+                                                               tmp_dir))
+            shader_cache.store_program_binary('key', 0x8e21, b'\0binary',
+                                              tmp_dir)
+            self.assertEqual(shader_cache.load_program_binary('key',
+                                                              tmp_dir),
+                             (0x8e21, b'\0binary'))
+
+            shader_cache.discard_program_binary('key', tmp_dir)
+            self.assertIsNone(shader_cache.load_program_binary('key',
+                                                               tmp_dir))
+
+    def test_bad_entry(self):
+        with TemporaryDirectory() as tmp_dir:
+            with open(os.path.join(tmp_dir, 'key.belprog'), 'wb') as wfile:
+                wfile.write(b'not a program binary')
+            with self.assertLogs(shader_cache.LOG, 'WARNING'):
+                self.assertIsNone(shader_cache.load_program_binary('key',
+                                                                   tmp_dir))
+
+    def test_store_failure_is_logged(self):
+        with TemporaryDirectory() as tmp_dir:
+            not_a_dir = os.path.join(tmp_dir, 'file')
+            with open(not_a_dir, 'w'):
+                pass
+            with self.assertLogs(shader_cache.LOG, 'WARNING'):
+                shader_cache.store_program_binary('key', 1, b'', not_a_dir)
+
+
+FAKE_MATERIAL = """
+TRANSLATIONS = []
+
+def translate():
+    TRANSLATIONS.append(None)
+    return TranslatedShaders()
+
+class TranslatedShaders:
+    vert_shader = 'vert'
+    geom_shader = 'geom'
+    frag_shader = 'frag'
+"""
+
+
+class TestCachedMaterial(TestCase):
+    def test_module_only_imported_on_miss(self):
+        with TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'fake_material.py')
+            with open(path, 'w') as wfile:
+                wfile.write(FAKE_MATERIAL)
+            sys.path.insert(0, tmp_dir)
+            try:
+                material = shader_cache.cached_material('fake_material',
+                                                        tmp_dir)
+                module = sys.modules['fake_material']
+                self.assertEqual(len(module.TRANSLATIONS), 1)
+                del sys.modules['fake_material']
+
+                self.assertEqual(shader_cache.cached_material(
+                    'fake_material', tmp_dir), material)
+                self.assertNotIn('fake_material', sys.modules)
+            finally:
+                sys.path.remove(tmp_dir)
+                sys.modules.pop('fake_material', None)
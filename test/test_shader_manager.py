@@ -0,0 +1,140 @@
+# pylint: disable=missing-docstring,protected-access
+
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from bel import shader_manager
+from bel.shader_manager import ShaderManager
+
+
+class FakeProgram:
+    def __init__(self, vert_source, frag_source):
+        self.sources = (vert_source, frag_source)
+        self.ready = False
+        self.deleted = False
+
+    @classmethod
+    def start(cls, vert_source, frag_source, geom_source, cache_dir):
+        # pylint: disable=unused-argument
+        return cls(vert_source, frag_source)
+
+    def is_ready(self):
+        return self.ready
+
+    def finish(self):
+        if 'error' in self.sources[0]:
+            raise RuntimeError('shader failed to compile')
+
+    def delete(self):
+        self.deleted = True
+
+
+class FakeDrawState:
+    def __init__(self):
+        self.materials = {}
+
+    def update_shader_program(self, uid, program):
+        self.materials[uid] = program
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestShaderManager(TestCase):
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.draw_state = FakeDrawState()
+        self.clock = FakeClock()
+        self.manager = ShaderManager(self.draw_state,
+                                     program_class=FakeProgram,
+                                     clock=self.clock)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_shaders(self, vert_source, mtime):
+        paths = []
+        for name, source in (('vert', vert_source), ('frag', 'frag')):
+            path = os.path.join(self.tmp_dir.name, name)
+            with open(path, 'w') as wfile:
+                wfile.write(source)
+            os.utime(path, (mtime, mtime))
+            paths.append(path)
+        return paths
+
+    def test_install_when_ready(self):
+        self.manager.add_files('flat', *self.write_shaders('vert', 1))
+        self.assertEqual(self.manager.num_pending, 1)
+        self.assertFalse(self.manager.poll())
+        self.assertEqual(self.draw_state.materials, {})
+
+        program = self.manager._pending['flat']
+        program.ready = True
+        self.assertTrue(self.manager.poll())
+        self.assertIs(self.draw_state.materials['flat'], program)
+        self.assertEqual(self.manager.num_pending, 0)
+        self.assertIsNone(self.manager.wait_timeout())
+
+    def test_finish_all(self):
+        self.manager.add_files('a', *self.write_shaders('vert', 1))
+        self.manager.add_files('b', *self.write_shaders('error', 1))
+        with self.assertLogs(shader_manager.LOG, 'ERROR'):
+            self.manager.finish_all()
+        self.assertEqual(list(self.draw_state.materials), ['a'])
+
+    def test_reload_changed_files(self):
+        self.manager.watch = True
+        paths = self.write_shaders('vert', 1)
+        self.manager.add_files('flat', *paths)
+        self.manager.finish_all()
+        old_program = self.draw_state.materials['flat']
+        self.assertEqual(self.manager.wait_timeout(),
+                         shader_manager.POLL_INTERVAL)
+
+        self.assertFalse(self.manager.poll())
+        self.assertEqual(self.manager.num_pending, 0)
+
+        # Changes are only looked for once per interval
+        self.write_shaders('vert 2', 2)
+        self.manager.poll()
+        self.assertEqual(self.manager.num_pending, 0)
+
+        self.clock.now += shader_manager.POLL_INTERVAL
+        self.manager.poll()
+        self.assertEqual(self.manager.num_pending, 1)
+        # The old program draws until the new one is ready
+        self.assertIs(self.draw_state.materials['flat'], old_program)
+
+        self.manager._pending['flat'].ready = True
+        self.assertTrue(self.manager.poll())
+        self.assertEqual(self.draw_state.materials['flat'].sources,
+                         ('vert 2', 'frag'))
+
+    def test_failed_reload_keeps_old_program(self):
+        self.manager.watch = True
+        self.manager.add_files('flat', *self.write_shaders('vert', 1))
+        self.manager.finish_all()
+        old_program = self.draw_state.materials['flat']
+
+        self.write_shaders('error', 2)
+        self.manager.poll()
+        new_program = self.manager._pending['flat']
+        new_program.ready = True
+        with self.assertLogs(shader_manager.LOG, 'ERROR'):
+            self.assertFalse(self.manager.poll())
+        self.assertTrue(new_program.deleted)
+        self.assertIs(self.draw_state.materials['flat'], old_program)
+
+    def test_superseded_program_deleted(self):
+        paths = self.write_shaders('vert', 1)
+        self.manager.add_files('flat', *paths)
+        first = self.manager._pending['flat']
+        self.manager.add_files('flat', *paths)
+        self.assertTrue(first.deleted)
+        self.assertEqual(self.manager.num_pending, 1)
@@ -0,0 +1,81 @@
+# pylint: disable=missing-docstring
+
+from unittest import TestCase
+
+import numpy
+
+from bel.uniform import MatrixUniform, UniformBlock, VectorUniform
+
+SOURCE = '''#version 330 core
+
+uniform mat4 projection;
+uniform vec4 camera;
+uniform mat4 model;
+
+void main() {}
+'''
+
+
+class TestUniform(TestCase):
+    def test_value_key(self):
+        self.assertEqual(VectorUniform((1, 2)).value_key(),
+                         VectorUniform([1.0, 2.0]).value_key())
+        self.assertNotEqual(VectorUniform((1, 2)).value_key(),
+                            VectorUniform((1, 3)).value_key())
+        self.assertEqual(len(MatrixUniform([[0] * 4] * 4).value_key()), 64)
+
+    def test_version(self):
+        first = VectorUniform((1, 2))
+        second = VectorUniform((1, 2))
+        self.assertNotEqual(first.version, second.version)
+
+        version = first.version
+        first.set([1.0, 2.0])
+        self.assertEqual(first.version, version)
+        first.set((1, 3))
+        self.assertNotEqual(first.version, version)
+        self.assertEqual(first.value_key(), VectorUniform((1, 3)).value_key())
+
+    def test_value_is_copied(self):
+        matrix = numpy.identity(4)
+        uniform = MatrixUniform(matrix)
+        matrix[0, 0] = 2
+        self.assertEqual(uniform.value[0, 0], 1)
+
+
+class TestUniformBlock(TestCase):
+    def setUp(self):
+        self.block = UniformBlock('View', 0, (('vec2', 'fb_size'),
+                                              ('mat4', 'projection'),
+                                              ('float', 'scale'),
+                                              ('mat4', 'camera')))
+
+    def test_std140_layout(self):
+        self.assertEqual(self.block.offsets, {'fb_size': 0,
+                                              'projection': 16,
+                                              'scale': 80,
+                                              'camera': 96})
+        self.assertEqual(self.block.size, 160)
+
+    def test_pack(self):
+        matrix = numpy.arange(16).reshape(4, 4)
+        data = self.block.pack({'fb_size': (640, 480),
+                                'projection': matrix})
+        self.assertEqual(data.nbytes, 160)
+        self.assertEqual(list(data[:4]), [640, 480, 0, 0])
+        self.assertEqual(list(data[4:20]), list(range(16)))
+        self.assertFalse(data[20:].any())
+
+    def test_rewrite_source(self):
+        source = self.block.rewrite_source(SOURCE)
+        lines = source.splitlines()
+        self.assertEqual(lines[0], '#version 330 core')
+        self.assertEqual(lines[1], 'layout(std140) uniform View {')
+        self.assertNotIn('uniform mat4 projection;', source)
+        # Type doesn't match the block member
+        self.assertIn('uniform vec4 camera;', source)
+        self.assertIn('uniform mat4 model;', source)
+
+    def test_rewrite_unused(self):
+        source = 'uniform mat4 model;\n'
+        self.assertEqual(self.block.rewrite_source(source), source)